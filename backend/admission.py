@@ -0,0 +1,199 @@
+"""Admission control for upstream LLM calls.
+
+At most ``max_in_flight`` completions run at once. Further callers wait in a
+bounded queue that is served round-robin across users, so one student retrying
+rapidly can't starve the rest of the class. A caller that can't be queued, or
+whose deadline passes while queued, gets AdmissionRejected with a retry hint
+instead of a 60 s timeout.
+
+The controller is thread-safe and serves both threaded callers (``slot``) and
+coroutines (``slot_async``) from the same budget.
+"""
+import asyncio
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager, contextmanager
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class _Waiter:
+    __slots__ = ("user", "enqueued_at", "granted", "abandoned", "_notify")
+
+    def __init__(self, user, notify):
+        self.user = user
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.abandoned = False
+        self._notify = notify
+
+
+class AdmissionController:
+    def __init__(self, max_in_flight=8, max_queue=64, queue_timeout=20.0):
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+
+        self._lock = threading.Lock()
+        self._queues = OrderedDict()  # user -> deque of waiters, in round-robin order
+        self._queued = 0
+        self._in_flight = 0
+
+        # Counters
+        self.admitted = 0
+        self.rejected_full = 0
+        self.timed_out = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.service_seconds = 5.0  # EWMA of slot hold time, seeds the retry hint
+
+    # --- core (call with the lock held) ---
+
+    def _retry_after(self):
+        backlog = (self._queued + 1) / max(self.max_in_flight, 1)
+        return max(1, math.ceil(self.service_seconds * backlog))
+
+    def _admit_now(self, user):
+        """Take a slot immediately if possible, else raise if the queue is full."""
+        if self._in_flight < self.max_in_flight and self._queued == 0:
+            self._in_flight += 1
+            self.admitted += 1
+            return True
+        if self._queued >= self.max_queue:
+            self.rejected_full += 1
+            raise AdmissionRejected(
+                "Feedback service is busy, please try again shortly.", self._retry_after()
+            )
+        return False
+
+    def _enqueue(self, waiter):
+        self._queues.setdefault(waiter.user, deque()).append(waiter)
+        self._queued += 1
+
+    def _remove(self, waiter):
+        queue = self._queues.get(waiter.user)
+        if queue is not None and waiter in queue:
+            queue.remove(waiter)
+            self._queued -= 1
+            if not queue:
+                del self._queues[waiter.user]
+
+    def _grant_next(self):
+        while self._in_flight < self.max_in_flight and self._queues:
+            user, queue = self._queues.popitem(last=False)
+            waiter = queue.popleft()
+            self._queued -= 1
+            if queue:
+                self._queues[user] = queue  # back of the rotation
+            if waiter.abandoned:
+                continue
+            waiter.granted = True
+            self._in_flight += 1
+            self.admitted += 1
+            wait_seconds = time.monotonic() - waiter.enqueued_at
+            self.total_wait_seconds += wait_seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+            waiter._notify()
+
+    def _record_service(self, held_seconds):
+        self.service_seconds = 0.8 * self.service_seconds + 0.2 * held_seconds
+
+    def _timeout(self, waiter):
+        """Give up on a queued waiter; returns True if it was granted in the meantime."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            waiter.abandoned = True
+            self._remove(waiter)
+            self.timed_out += 1
+            retry_after = self._retry_after()
+        raise AdmissionRejected("Timed out waiting for the feedback service, please try again.", retry_after)
+
+    # --- threaded callers ---
+
+    def acquire(self, user=None, timeout=None):
+        timeout = self.queue_timeout if timeout is None else timeout
+        event = threading.Event()
+        with self._lock:
+            if self._admit_now(user):
+                return
+            waiter = _Waiter(user, event.set)
+            self._enqueue(waiter)
+        if not event.wait(timeout):
+            self._timeout(waiter)
+
+    def release(self, held_seconds=None):
+        with self._lock:
+            self._in_flight -= 1
+            if held_seconds is not None:
+                self._record_service(held_seconds)
+            self._grant_next()
+
+    @contextmanager
+    def slot(self, user=None, timeout=None):
+        self.acquire(user, timeout)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    # --- coroutines ---
+
+    async def acquire_async(self, user=None, timeout=None):
+        timeout = self.queue_timeout if timeout is None else timeout
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+
+        def notify():
+            loop.call_soon_threadsafe(lambda: future.done() or future.set_result(None))
+
+        with self._lock:
+            if self._admit_now(user):
+                return
+            waiter = _Waiter(user, notify)
+            self._enqueue(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self._timeout(waiter)
+        except asyncio.CancelledError:
+            with self._lock:
+                granted = waiter.granted
+                if not granted:
+                    waiter.abandoned = True
+                    self._remove(waiter)
+            if granted:
+                self.release()
+            raise
+
+    @asynccontextmanager
+    async def slot_async(self, user=None, timeout=None):
+        await self.acquire_async(user, timeout)
+        started = time.monotonic()
+        try:
+            yield
+        finally:
+            self.release(time.monotonic() - started)
+
+    def stats(self):
+        with self._lock:
+            return {
+                "in_flight": self._in_flight,
+                "max_in_flight": self.max_in_flight,
+                "queue_depth": self._queued,
+                "max_queue": self.max_queue,
+                "queued_users": len(self._queues),
+                "admitted": self.admitted,
+                "rejected_full": self.rejected_full,
+                "timed_out": self.timed_out,
+                "avg_wait_ms": round(1000 * self.total_wait_seconds / self.admitted, 3) if self.admitted else 0.0,
+                "max_wait_ms": round(1000 * self.max_wait_seconds, 3),
+                "avg_service_ms": round(1000 * self.service_seconds, 1),
+            }
@@ -1,17 +1,38 @@
-from flask import Flask, request, jsonify, send_from_directory
+from flask import Flask, request, jsonify, g, Response, stream_with_context
 from flask_cors import CORS
 import os
 import re
-import requests
+import json
 import time
-import random
-import pandas as pd
-import spacy 
-from difflib import SequenceMatcher
-import os
+import threading
+import gc
+import secrets
+import uuid
+from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
-import psycopg2
 from psycopg2 import OperationalError
+from db_pool import ConnectionPool
+from question_bank import QuestionBank, QuestionBankError
+import question_store
+from question_store import PostgresQuestionBank
+from think_filter import ThinkFilter
+from feedback_cache import create_feedback_cache, feedback_cache_key
+from singleflight import SingleFlight
+from admission import AdmissionController, AdmissionRejected
+from llm_client import CircuitBreaker, LLMClient, LLMError, RetryPolicy
+from model_router import ModelRouter, ModelSpec
+from feedback_batch import build_packed_prompt, pack_items, split_packed_response
+import scoring_engine
+from scoring_engine import AnswerContext, score_batch
+from keyword_extractor import KeywordExtractor
+from keyword_index import KeywordEntry, PackedKeywordIndex, get_keyword_index
+from memstats import process_memory
+from static_assets import StaticAssets
+import attempt_store
+from attempt_store import WriteBehindWriter
+from auth import RevocationCache, SessionError, SessionTokens, hash_password, verify_password
+from metrics import REGISTRY, STAGE_SECONDS, debug_sampled, log_enabled
 
 load_dotenv()
 
@@ -19,26 +40,50 @@ BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 FRONTEND_DIR = os.path.abspath(os.path.join(BASE_DIR, '..', 'frontend'))
 
 
-# Create Flask app with proper static folder configuration
-app = Flask(__name__, 
-           static_folder=FRONTEND_DIR if os.path.exists(FRONTEND_DIR) else None,
-           static_url_path='')
+# Create Flask app; the frontend is served from the STATIC_ASSETS manifest below
+app = Flask(__name__, static_folder=None)
+
+# Fingerprinted, precompressed frontend files with ETags, built once on first use
+FRONTEND_AVAILABLE = os.path.exists(FRONTEND_DIR)
+STATIC_ASSETS = StaticAssets(FRONTEND_DIR)
 
 # Enable CORS for all routes
 CORS(app, resources={r"/*": {"origins": "*"}})
 
-# Load spaCy model
-try:
-    nlp = spacy.load("en_core_web_sm")
-    print("✓ spaCy model loaded successfully")
-except Exception as e:
-    print(f"❌ Error loading spaCy model: {e}")
-    nlp = None
+# spaCy (trimmed to the components noun chunks need) loads on first use or during warm-up
+KEYWORD_EXTRACTOR = KeywordExtractor()
+
+# Every built-in ideal answer is parsed once so spaCy stays off the request path;
+# loaded on first use (see keyword_index())
+KEYWORD_INDEX = None
+KEYWORD_INDEX_LOCK = threading.Lock()
+
+# "lexical" (SequenceMatcher + keywords) or "blended" (plus embedding cosine, see embedding_store.py)
+SCORING_MODE = os.getenv("SCORING_MODE", "lexical")
+SEMANTIC_ENCODER = os.getenv("SEMANTIC_ENCODER", "hashing")
+SEMANTIC_WEIGHT = float(os.getenv("SEMANTIC_WEIGHT", 0.5))
+SEMANTIC_SCORER = None
+SEMANTIC_SCORER_LOCK = threading.Lock()
 
 # API Configuration
-TOGETHER_API_URL = "https://api.together.xyz/v1/chat/completions"
+TOGETHER_API_URL = os.getenv("LLM_API_URL", "https://api.together.xyz/v1/chat/completions")
 TOGETHER_API_KEY = os.getenv("API_KEY")
-MODEL_NAME = "deepseek-ai/DeepSeek-R1-Distill-Llama-70B-free"
+MODEL_NAME = os.getenv("MODEL_NAME", "deepseek-ai/DeepSeek-R1-Distill-Llama-70B-free")
+# Non-reasoning model for short hints and for degrading when MODEL_NAME is slow
+# or failing (see model_router.py); empty keeps every request on MODEL_NAME
+FAST_MODEL_NAME = os.getenv("FAST_MODEL_NAME", "meta-llama/Llama-3.3-70B-Instruct-Turbo-Free")
+# Seconds a feedback request may spend waiting on the model; clients can ask for less with deadline_ms
+FEEDBACK_DEADLINE = float(os.getenv("FEEDBACK_DEADLINE", 30))
+
+MODEL_ROUTER = ModelRouter(
+    ModelSpec(MODEL_NAME, reasoning=True, expected_latency=float(os.getenv("MODEL_EXPECTED_LATENCY", 15)),
+              budgets={"Easy": 1000, "Medium": 1200, "default": 1500}),
+    ModelSpec(FAST_MODEL_NAME, reasoning=False, expected_latency=float(os.getenv("FAST_MODEL_EXPECTED_LATENCY", 3)),
+              budgets={"short": 150, "default": 300}) if FAST_MODEL_NAME else None,
+    window=int(os.getenv("ROUTER_WINDOW", 50)),
+    max_age=float(os.getenv("ROUTER_MAX_AGE", 120)),
+    max_error_rate=float(os.getenv("ROUTER_MAX_ERROR_RATE", 0.3)),
+)
 
 HEADERS = {
     "Authorization": f"Bearer {TOGETHER_API_KEY}",
@@ -54,37 +99,206 @@ DB_CONFIG = {
     'port': int(os.getenv("DB_PORT", 5432))
 }
 
-print("=== Environment Check ===")
-print(f"BASE_DIR: {BASE_DIR}")
-print(f"FRONTEND_DIR: {FRONTEND_DIR}")
-print(f"Frontend exists: {os.path.exists(FRONTEND_DIR)}")
-print(f"API_KEY set: {'Yes' if TOGETHER_API_KEY else 'No'}")
-print(f"DB_HOST set: {'Yes' if os.getenv('DB_HOST') else 'No'}")
-print(f"DB_USER: {os.getenv('DB_USER')}")
-print(f"DB_NAME: {os.getenv('DB_NAME')}")
-print(f"DB_PORT: {os.getenv('DB_PORT')}")
-
-if os.path.exists(FRONTEND_DIR):
-    frontend_files = os.listdir(FRONTEND_DIR)
-    print(f"Frontend files: {frontend_files}")
+# Connections are borrowed per request and returned on teardown instead of closed
+DB_POOL = ConnectionPool(
+    DB_CONFIG,
+    minconn=int(os.getenv("DB_POOL_MIN", 0)),
+    maxconn=int(os.getenv("DB_POOL_MAX", 10)),
+    timeout=float(os.getenv("DB_POOL_TIMEOUT", 10)),
+)
+
+# "csv": grade banks are loaded once, partitioned by difficulty, and reloaded on
+# mtime change. "postgres": the indexed questions table (see question_store.py)
+QUESTION_BANK_BACKEND = os.getenv("QUESTION_BANK_BACKEND", "csv")
+if QUESTION_BANK_BACKEND == "postgres":
+    QUESTION_BANK = PostgresQuestionBank(DB_POOL, subject=os.getenv("QUESTION_SUBJECT", ""),
+                                         counts_ttl=float(os.getenv("QUESTION_COUNTS_TTL", 60)))
 else:
-    print("❌ Frontend directory not found")
+    QUESTION_BANK = QuestionBank([
+        os.path.join(BASE_DIR, "data"),
+        os.path.join(os.path.dirname(BASE_DIR), "data"),
+        os.path.join("/app", "data"),
+        os.path.join("/app/backend", "data"),
+    ])
 
-def get_db_connection():
+# Signed session tokens (see auth.py). Set SESSION_SECRET in production: the
+# random fallback is only shared by workers forked from this process, so tokens
+# fail on other instances and after a restart
+SESSION_SECRET = os.getenv("SESSION_SECRET")
+if not SESSION_SECRET:
+    print("⚠️ SESSION_SECRET not set, using a random per-process secret; "
+          "sessions won't survive restarts or work across instances")
+    SESSION_SECRET = secrets.token_hex(32)
+PASSWORD_HASH_METHOD = os.getenv("PASSWORD_HASH_METHOD")
+
+def load_revoked_sessions():
+    # The first verification in a worker can come before anything else created the schema
+    if DB_AUTO_INIT:
+        ensure_database()
+    conn = DB_POOL.getconn()
+    close = False
     try:
-        print("Attempting to connect to PostgreSQL...")
-        conn = psycopg2.connect(**DB_CONFIG)
-        print("✓ PostgreSQL connection successful")
-        return conn
-    except OperationalError as e:
-        print(f"❌ PostgreSQL connection error: {e}")
+        with conn.cursor() as cursor:
+            cursor.execute("SELECT jti FROM revoked_sessions WHERE expires_at > %s", (time.time(),))
+            return [row[0] for row in cursor.fetchall()]
+    except Exception:
+        close = True  # don't hand an aborted transaction back to the pool
         raise
+    finally:
+        DB_POOL.putconn(conn, close=close)
+
+SESSION_REVOCATIONS = RevocationCache(load_revoked_sessions, ttl=float(os.getenv("SESSION_REVOCATION_TTL", 30)))
+SESSION_TOKENS = SessionTokens(
+    SESSION_SECRET,
+    max_age=int(os.getenv("SESSION_MAX_AGE", 12 * 3600)),
+    revocations=SESSION_REVOCATIONS,
+)
+
+# Scores and feedback are queued and written in batches off the request path
+# (see attempt_store.py); ATTEMPTS_PERSIST=0 turns history off
+ATTEMPT_WRITER = None
+if os.getenv("ATTEMPTS_PERSIST", "1") == "1":
+    ATTEMPT_WRITER = WriteBehindWriter(
+        DB_POOL,
+        spool_path=os.getenv("ATTEMPTS_SPOOL_PATH", os.path.join(BASE_DIR, "attempts.spool.jsonl")),
+        maxsize=int(os.getenv("ATTEMPTS_QUEUE_SIZE", 10000)),
+        batch_size=int(os.getenv("ATTEMPTS_BATCH_SIZE", 200)),
+        flush_interval=float(os.getenv("ATTEMPTS_FLUSH_INTERVAL", 1.0)),
+    ).register_atexit()
+
+def print_environment():
+    print("=== Environment Check ===")
+    print(f"BASE_DIR: {BASE_DIR}")
+    print(f"FRONTEND_DIR: {FRONTEND_DIR}")
+    print(f"Frontend exists: {os.path.exists(FRONTEND_DIR)}")
+    print(f"API_KEY set: {'Yes' if TOGETHER_API_KEY else 'No'}")
+    print(f"DB_HOST set: {'Yes' if os.getenv('DB_HOST') else 'No'}")
+    print(f"DB_USER: {os.getenv('DB_USER')}")
+    print(f"DB_NAME: {os.getenv('DB_NAME')}")
+    print(f"DB_PORT: {os.getenv('DB_PORT')}")
+    print(f"Models: {MODEL_NAME} (fast: {FAST_MODEL_NAME or 'disabled'}), deadline {FEEDBACK_DEADLINE:g}s")
+    print(f"SESSION_SECRET set: {'Yes' if os.getenv('SESSION_SECRET') else 'No (random per-process secret)'}")
+
+    if os.path.exists(FRONTEND_DIR):
+        frontend_files = os.listdir(FRONTEND_DIR)
+        print(f"Frontend files: {frontend_files}")
+    else:
+        print("❌ Frontend directory not found")
+
+# Identical (normalized) answers to the same question reuse one LLM completion
+FEEDBACK_CACHE = create_feedback_cache(
+    os.getenv("FEEDBACK_CACHE_BACKEND", "memory"),
+    pool=DB_POOL,
+    maxsize=int(os.getenv("FEEDBACK_CACHE_SIZE", 2048)),
+    ttl=float(os.getenv("FEEDBACK_CACHE_TTL", 7 * 24 * 3600)),
+    path=os.getenv("FEEDBACK_CACHE_PATH"),
+)
+
+# Pooled, retrying upstream client; the breaker is shared with the async client
+LLM_CLIENT = LLMClient(
+    TOGETHER_API_URL,
+    HEADERS,
+    retry_policy=RetryPolicy(
+        max_attempts=int(os.getenv("LLM_MAX_ATTEMPTS", 3)),
+        deadline=float(os.getenv("LLM_TIMEOUT", 60)),
+    ),
+    breaker=CircuitBreaker(
+        failure_threshold=int(os.getenv("LLM_BREAKER_THRESHOLD", 5)),
+        reset_timeout=float(os.getenv("LLM_BREAKER_RESET", 30)),
+    ),
+)
+
+# The fast model gets its own breaker, so timeouts from a struggling reasoning
+# model can't cut off the fallback meant to absorb them
+FAST_LLM_CLIENT = LLMClient(
+    TOGETHER_API_URL,
+    HEADERS,
+    retry_policy=LLM_CLIENT.retry_policy,
+    breaker=CircuitBreaker(
+        failure_threshold=LLM_CLIENT.breaker.failure_threshold,
+        reset_timeout=LLM_CLIENT.breaker.reset_timeout,
+    ),
+) if FAST_MODEL_NAME and FAST_MODEL_NAME != MODEL_NAME else None
+
+def llm_client_for(model):
+    return FAST_LLM_CLIENT if FAST_LLM_CLIENT is not None and model == FAST_MODEL_NAME else LLM_CLIENT
+
+# Bounded, fair admission in front of the Together API
+ADMISSION = AdmissionController(
+    max_in_flight=int(os.getenv("LLM_MAX_IN_FLIGHT", 8)),
+    max_queue=int(os.getenv("LLM_MAX_QUEUE", 64)),
+    queue_timeout=float(os.getenv("LLM_QUEUE_TIMEOUT", 20)),
+)
+
+# Concurrent identical feedback requests share one upstream call
+FEEDBACK_FLIGHTS = SingleFlight()
+
+# Batch feedback fans out on this pool; upstream concurrency is still capped by ADMISSION
+FEEDBACK_BATCH_MAX_ITEMS = int(os.getenv("FEEDBACK_BATCH_MAX_ITEMS", 50))
+FEEDBACK_BATCH_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("FEEDBACK_BATCH_WORKERS", ADMISSION.max_in_flight)),
+    thread_name_prefix="feedback-batch",
+)
+FEEDBACK_PACK_TOKEN_BUDGET = int(os.getenv("FEEDBACK_PACK_TOKEN_BUDGET", 1200))
+FEEDBACK_PACK_MAX_ITEMS = int(os.getenv("FEEDBACK_PACK_MAX_ITEMS", 5))
+# Extra max_tokens per packed item beyond the first, on top of the route's own budget
+FEEDBACK_PACK_ITEM_TOKENS = int(os.getenv("FEEDBACK_PACK_ITEM_TOKENS", 200))
+
+def get_db_connection():
+    """Borrow the current request's pooled connection (one checkout per request)"""
+    if "db_conn" not in g:
+        if DB_AUTO_INIT:
+            ensure_database()
+        try:
+            with STAGE_SECONDS.time(stage="db_checkout"):
+                g.db_conn = DB_POOL.getconn()
+        except OperationalError as e:
+            print(f"❌ PostgreSQL connection error: {e}")
+            raise
+    return g.db_conn
+
+# Per-route latency plus gauges read from the existing stats() snapshots at scrape time
+HTTP_REQUEST_SECONDS = REGISTRY.histogram(
+    "feedback_http_request_seconds", "Handler latency by route and status.", ("method", "route", "status")
+)
+REGISTRY.gauge("feedback_llm_in_flight", "Upstream LLM calls holding an admission slot.",
+               lambda: ADMISSION.stats()["in_flight"])
+REGISTRY.gauge("feedback_llm_queue_depth", "Requests waiting for an admission slot.",
+               lambda: ADMISSION.stats()["queue_depth"])
+REGISTRY.gauge("feedback_llm_circuit_open", "1 while the LLM circuit breaker is open or probing.",
+               lambda: int(LLM_CLIENT.breaker.state != "closed"))
+REGISTRY.gauge("feedback_db_pool_connections", "Pooled PostgreSQL connections by state.",
+               lambda: {state: DB_POOL.stats()[state] for state in ("in_use", "idle")}, labelname="state")
+REGISTRY.gauge("feedback_model_routes", "Feedback requests routed, by model and reason.",
+               lambda: MODEL_ROUTER.stats()["routes"], labelname="route")
+REGISTRY.gauge("feedback_model_error_rate", "Recent upstream error rate per model.",
+               lambda: {name: m["error_rate"] for name, m in MODEL_ROUTER.stats()["models"].items()},
+               labelname="model")
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_latency(response):
+    started = g.pop("request_started", None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+        HTTP_REQUEST_SECONDS.observe(time.perf_counter() - started, method=request.method,
+                                     route=route, status=response.status_code)
+    return response
+
+@app.teardown_appcontext
+def release_db_connection(exception=None):
+    conn = g.pop("db_conn", None)
+    if conn is not None:
+        DB_POOL.putconn(conn)
 
 
 def init_database():
-    """Initialize database tables"""
+    """Initialize database tables; returns True on success"""
     try:
-        conn = get_db_connection()
+        conn = DB_POOL.getconn()
         cursor = conn.cursor()
         
         # Create users table if it doesn't exist
@@ -100,6 +314,15 @@ def init_database():
 
         
         cursor.execute(create_users_table)
+        # Logged-out session token ids, kept until the token would have expired anyway
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS revoked_sessions (
+            jti VARCHAR(64) PRIMARY KEY,
+            expires_at DOUBLE PRECISION NOT NULL
+        );
+        """)
+        cursor.execute(attempt_store.SCHEMA)
+        cursor.execute(question_store.SCHEMA)
         conn.commit()
         print("✓ Database tables initialized successfully")
         
@@ -111,38 +334,126 @@ def init_database():
         """)
         columns = cursor.fetchall()
         print(f"Users table structure: {columns}")
-
-        
-        cursor.execute("""
-            SELECT column_name, data_type 
-            FROM information_schema.columns 
-            WHERE table_name = 'users';
-        """)
-        columns = cursor.fetchall()
-        print(f"Users table structure: {columns}")
-
+        return True
         
     except Exception as e:
         print(f"❌ Database initialization error: {e}")
+        return False
     finally:
         if 'cursor' in locals(): 
             cursor.close()
         if 'conn' in locals(): 
-            conn.close()
+            DB_POOL.putconn(conn)
+
+# The schema is created once per process, on the first request that needs the
+# database; set DB_AUTO_INIT=0 when it's managed by `python backend/app.py init-db`
+DB_AUTO_INIT = os.getenv("DB_AUTO_INIT", "1") == "1"
+SCHEMA_READY = False
+SCHEMA_LOCK = threading.Lock()
+# After a failed init, requests skip the DDL until this (monotonic) time rather than retrying it each time
+SCHEMA_RETRY_AT = 0.0
+SCHEMA_RETRY_INTERVAL = float(os.getenv("DB_INIT_RETRY_INTERVAL", 5.0))
+
+def ensure_database():
+    global SCHEMA_READY, SCHEMA_RETRY_AT
+    if SCHEMA_READY or time.monotonic() < SCHEMA_RETRY_AT:
+        return
+    with SCHEMA_LOCK:
+        # Threads that waited on a failed attempt return here instead of retrying it
+        if not SCHEMA_READY and time.monotonic() >= SCHEMA_RETRY_AT:
+            SCHEMA_READY = init_database()
+            if not SCHEMA_READY:
+                SCHEMA_RETRY_AT = time.monotonic() + SCHEMA_RETRY_INTERVAL
 
-# Initialize database on startup
-init_database()
+def keyword_index():
+    """The precompiled keyword index, loaded (or built) on first use"""
+    global KEYWORD_INDEX
+    if KEYWORD_INDEX is None:
+        with KEYWORD_INDEX_LOCK:
+            if KEYWORD_INDEX is None:
+                KEYWORD_INDEX = get_keyword_index(KEYWORD_EXTRACTOR)
+                print(f"✓ Keyword index ready ({len(KEYWORD_INDEX)} ideal answers)")
+    return KEYWORD_INDEX
+
+def semantic_scorer():
+    """The embedding-backed scorer in blended mode (None otherwise), loaded on first use"""
+    global SEMANTIC_SCORER
+    if SCORING_MODE != "blended":
+        return None
+    if SEMANTIC_SCORER is None:
+        with SEMANTIC_SCORER_LOCK:
+            if SEMANTIC_SCORER is None:
+                from embedding_store import EmbeddingStore, SemanticScorer, get_encoder
+
+                store = EmbeddingStore(get_encoder(SEMANTIC_ENCODER)).load()
+                SEMANTIC_SCORER = SemanticScorer(store, weight=SEMANTIC_WEIGHT)
+                print(f"✓ Embedding store ready ({len(store)} ideal answers, {store.encoder.name})")
+    return SEMANTIC_SCORER
+
+def warm_up(include_db=True):
+    """Load everything the first requests would otherwise wait for"""
+    started = time.perf_counter()
+    keyword_index()
+    semantic_scorer()
+    if KEYWORD_EXTRACTOR.available:
+        print("✓ spaCy model loaded successfully")
+    else:
+        print(f"❌ Error loading spaCy model: {KEYWORD_EXTRACTOR.load_error}")
+    if FRONTEND_AVAILABLE:
+        STATIC_ASSETS.build()
+    if isinstance(QUESTION_BANK, QuestionBank):
+        for grade in (5, 6, 7):
+            try:
+                QUESTION_BANK.get(grade)
+            except QuestionBankError as e:
+                print(f"❌ {e}")
+    if include_db and os.getenv("DB_HOST"):
+        DB_POOL.warm_up()
+        if DB_AUTO_INIT:
+            ensure_database()
+    print(f"✓ Warm-up finished in {time.perf_counter() - started:.2f}s")
+
+def prepare_for_fork():
+    """Load the shared read-only data in a preforking parent (see gunicorn.conf.py).
+
+    No DB connections are opened here: sockets must not be shared with workers.
+    """
+    global KEYWORD_INDEX
+    warm_up(include_db=False)
+    if not isinstance(KEYWORD_INDEX, PackedKeywordIndex):
+        KEYWORD_INDEX = PackedKeywordIndex(keyword_index())
+    # Move everything loaded so far out of the collector's reach, so GC passes
+    # in the workers don't write to (and copy) the shared pages
+    gc.collect()
+    gc.freeze()
+
+WARM_UP_THREAD = None
+
+def start_warm_up():
+    """Warm up once, on a background thread, so /health answers immediately"""
+    global WARM_UP_THREAD
+    if WARM_UP_THREAD is None:
+        WARM_UP_THREAD = threading.Thread(target=warm_up, name="warm-up", daemon=True)
+        WARM_UP_THREAD.start()
+    return WARM_UP_THREAD
 
 # Keep all your existing utility functions exactly as they are
 def clean_response(text):
-    return re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL).strip()
+    # A <think> block cut off by max_tokens has no closing tag; drop it to the end like ThinkFilter does
+    return re.sub(r"<think>.*?(?:</think>|$)", "", text, flags=re.DOTALL).strip()
 
 def extract_keywords(text, top_k=5):
-    if not nlp:
-        return text.split()[:top_k]  # Fallback if spaCy not loaded
-    doc = nlp(text)
-    keywords = list(set([chunk.text.lower() for chunk in doc.noun_chunks if len(chunk.text.strip()) > 2]))
-    return keywords[:top_k]
+    entry = keyword_index().get(text)
+    if entry is not None:
+        return entry.top(top_k)
+    return KEYWORD_EXTRACTOR.extract(text, top_k=top_k)
+
+def get_keyword_entry(ideal_answer, top_k=10):
+    """Indexed keywords for an ideal answer, parsing only answers outside the banks"""
+    entry = keyword_index().get(ideal_answer)
+    if entry is None:
+        entry = KeywordEntry(ideal_answer, extract_keywords(ideal_answer, top_k=top_k))
+    return entry
 
 def find_missing_keywords(keywords, student_answer):
     student_answer = student_answer.lower()
@@ -150,126 +461,19 @@ def find_missing_keywords(keywords, student_answer):
 
 def calculate_keyword_score(ideal_answer, student_answer):
     """Calculate score based on keyword coverage (0-1 marks)"""
-    keywords = extract_keywords(ideal_answer, top_k=10)
-    if not keywords:
-        return 1.0 
-    
-    student_answer_lower = student_answer.lower()
-    ideal_answer_lower = ideal_answer.lower()
-    
-    if student_answer_lower.strip() == ideal_answer_lower.strip():
-        return 1.0
-    
-    similarity = SequenceMatcher(None, ideal_answer_lower, student_answer_lower).ratio()
-    if similarity >= 0.8:  
-        return 1.0
-    
-    matched_keywords = 0
-    
-    for keyword in keywords:
-        if keyword in student_answer_lower:
-            matched_keywords += 1
-            continue
-            
-        keyword_words = keyword.split()
-        if len(keyword_words) > 1:
-            found_words = sum(1 for word in keyword_words if word in student_answer_lower)
-            if found_words >= len(keyword_words) * 0.7:  
-                matched_keywords += 1
-        else:
-            student_words = student_answer_lower.split()
-            for student_word in student_words:
-                word_similarity = SequenceMatcher(None, keyword, student_word).ratio()
-                if word_similarity >= 0.8:  
-                    matched_keywords += 1
-                    break
-    
-    coverage_ratio = matched_keywords / len(keywords)
-    
-    if coverage_ratio >= 0.6: 
-        return 1.0
-    elif coverage_ratio >= 0.3:  
-        return 0.5
-    else:
-        return 0.0
+    return scoring_engine.keyword_score(AnswerContext(ideal_answer, student_answer, get_keyword_entry))
 
 def calculate_spelling_score(ideal_answer, student_answer):
     """Calculate score based on spelling accuracy (0-1 marks)"""
-    keywords = extract_keywords(ideal_answer, top_k=10)
-    if not keywords:
-        return 1.0  
-    
-    student_answer_lower = student_answer.lower()
-    ideal_answer_lower = ideal_answer.lower()
-    
-    if student_answer_lower.strip() == ideal_answer_lower.strip():
-        return 1.0
-    
-    similarity = SequenceMatcher(None, ideal_answer_lower, student_answer_lower).ratio()
-    if similarity >= 0.85:  
-        return 1.0
-    
-    student_words = set(student_answer_lower.split())
-    spelling_errors = 0
-    total_important_words = 0
-    
-    for keyword in keywords:
-        keyword_words = keyword.split()
-        for word in keyword_words:
-            if len(word) < 3:  
-                continue
-                
-            total_important_words += 1
-            
-            if word in student_words:
-                continue
-            
-            best_similarity = 0
-            for student_word in student_words:
-                if len(student_word) < 3:  
-                    continue
-                similarity = SequenceMatcher(None, word, student_word).ratio()
-                best_similarity = max(best_similarity, similarity)
-            
-            if best_similarity < 0.75:  
-                spelling_errors += 1
-    
-    if total_important_words == 0:
-        return 1.0
-    
-    error_ratio = spelling_errors / total_important_words
-    
-    if error_ratio <= 0.15:  
-        return 1.0
-    elif error_ratio <= 0.4:  
-        return 0.5
-    else:
-        return 0.0
+    return scoring_engine.spelling_score(AnswerContext(ideal_answer, student_answer, get_keyword_entry))
+
+def precheck_answer(ideal_answer, student_answer):
+    """Rule-based verdict shared by scoring and feedback: ("empty" | "correct" | None, similarity)"""
+    return scoring_engine.precheck(AnswerContext(ideal_answer, student_answer, get_keyword_entry))
 
 def calculate_question_score(ideal_answer, student_answer):
     """Calculate total score for a question (0-2 marks)"""
-    if not student_answer or student_answer.strip().lower() in ["i don't know", "dont know", "no idea", ""]:
-        return 0.0
-    
-    ideal_clean = ideal_answer.strip().lower()
-    student_clean = student_answer.strip().lower()
-    
-    if ideal_clean == student_clean:
-        return 2.0
-    
-    overall_similarity = SequenceMatcher(None, ideal_clean, student_clean).ratio()
-    if overall_similarity >= 0.9: 
-        return 2.0
-    elif overall_similarity >= 0.8:  
-        return 1.8
-    elif overall_similarity >= 0.7:  
-        return 1.5
-    
-    keyword_score = calculate_keyword_score(ideal_answer, student_answer)
-    spelling_score = calculate_spelling_score(ideal_answer, student_answer)
-    
-    total_score = keyword_score + spelling_score
-    return round(total_score, 1)  
+    return scoring_engine.question_score(AnswerContext(ideal_answer, student_answer, get_keyword_entry))
 
 def build_prompt(question, ideal_answer, student_answer, missing_keywords):
     hint = ""
@@ -292,14 +496,15 @@ def build_prompt(question, ideal_answer, student_answer, missing_keywords):
         f"- Be friendly and encouraging."
     )
 
-def generate_feedback(question, ideal_answer, student_answer):
+def build_feedback_prompt(question, ideal_answer, student_answer):
     keywords = extract_keywords(ideal_answer)
     missing = find_missing_keywords(keywords, student_answer)
-    prompt = build_prompt(question, ideal_answer, student_answer, missing)
+    return build_prompt(question, ideal_answer, student_answer, missing)
 
+def completion_payload(prompt, max_tokens=1500, stream=False, model=None):
     payload = {
-        "model": MODEL_NAME,
-        "max_tokens": 1500,
+        "model": model or MODEL_NAME,
+        "max_tokens": max_tokens,
         "temperature": 0.7,
         "top_p": 0.9,
         "messages": [
@@ -307,15 +512,362 @@ def generate_feedback(question, ideal_answer, student_answer):
             {"role": "user", "content": prompt}
         ]
     }
+    if stream:
+        payload["stream"] = True
+    return payload
+
+FAST_PATH_FEEDBACK = {
+    "correct": "Great job! Your answer is correct.",
+    "empty": "That's completely fine — not knowing an answer is part of learning. Let's move on to the next question!",
+}
+
+FAST_PATH_STATS = {"short_circuited": 0, "escalated": 0}
+FAST_PATH_LOCK = threading.Lock()
+
+def fast_path_feedback(ideal_answer, student_answer):
+    """Templated feedback for unambiguous answers, or None to escalate to the LLM"""
+    verdict, _ = precheck_answer(ideal_answer, student_answer)
+    with FAST_PATH_LOCK:
+        FAST_PATH_STATS["short_circuited" if verdict else "escalated"] += 1
+    return FAST_PATH_FEEDBACK.get(verdict)
+
+def deterministic_feedback(ideal_answer, student_answer):
+    """Rule-based feedback used when the LLM is unavailable; never reveals keywords"""
+    templated = FAST_PATH_FEEDBACK.get(precheck_answer(ideal_answer, student_answer)[0])
+    if templated is not None:
+        return templated
 
+    hints = []
+    if calculate_keyword_score(ideal_answer, student_answer) < 1.0:
+        hints.append("You're on the right track, but your answer is missing some important ideas. "
+                     "Re-read the question and think about which parts of the process you haven't explained yet.")
+    if calculate_spelling_score(ideal_answer, student_answer) < 1.0:
+        hints.append("Also double-check the spelling of the key science words in your answer.")
+    if not hints:
+        hints.append("Good answer! You've covered the main ideas — try to explain them a little more precisely.")
+    return " ".join(hints)
+
+def fast_path_stats():
+    with FAST_PATH_LOCK:
+        total = FAST_PATH_STATS["short_circuited"] + FAST_PATH_STATS["escalated"]
+        return {
+            **FAST_PATH_STATS,
+            "short_circuit_ratio": round(FAST_PATH_STATS["short_circuited"] / total, 3) if total else 0.0
+        }
+
+def request_deadline(data):
+    """Absolute (monotonic) deadline for a request: deadline_ms from the body, capped at FEEDBACK_DEADLINE"""
     try:
-        response = requests.post(TOGETHER_API_URL, headers=HEADERS, json=payload, timeout=60)
-        response.raise_for_status()
-        raw = response.json()["choices"][0]["message"]["content"]
-        return clean_response(raw)
+        seconds = min(float(data.get("deadline_ms")) / 1000, FEEDBACK_DEADLINE)
+    except (TypeError, ValueError):
+        seconds = FEEDBACK_DEADLINE
+    return time.monotonic() + max(seconds, 0.5)
+
+def route_feedback(ideal_answer, student_answer, difficulty=None, deadline_at=None):
+    """Model and token budget for one request, from its pre-score band, difficulty and deadline"""
+    remaining = deadline_at - time.monotonic() if deadline_at is not None else FEEDBACK_DEADLINE
+    return MODEL_ROUTER.route(calculate_question_score(ideal_answer, student_answer), difficulty, remaining)
+
+def route_budget(route, deadline_at):
+    """Seconds the call on ``route`` may take, keeping time back for its fallback"""
+    remaining = (deadline_at - time.monotonic()) if deadline_at is not None else FEEDBACK_DEADLINE
+    if remaining <= 0:
+        raise LLMError("Feedback deadline exceeded")
+    # The preferred model always gets at least half of what's left
+    return max(remaining - MODEL_ROUTER.reserve(route), remaining / 2)
+
+def request_feedback(question, ideal_answer, student_answer, difficulty=None, deadline_at=None):
+    """One upstream completion, on the routed model; raises on failure and caches on success"""
+    prompt = build_feedback_prompt(question, ideal_answer, student_answer)
+    route = route_feedback(ideal_answer, student_answer, difficulty, deadline_at)
+    while True:
+        budget = route_budget(route, deadline_at)
+        started = time.monotonic()
+        try:
+            raw = llm_client_for(route.model).chat(completion_payload(prompt, route.max_tokens, model=route.model),
+                                                   deadline=budget)
+        except LLMError:
+            MODEL_ROUTER.record(route.model, time.monotonic() - started, ok=False)
+            route = route.fallback
+            if route is None:
+                raise
+            continue
+        MODEL_ROUTER.record(route.model, time.monotonic() - started, ok=True)
+        feedback = clean_response(raw)
+        if not feedback:
+            # Nothing visible, e.g. the <think> trace used up max_tokens
+            route = route.fallback
+            if route is None:
+                raise LLMError("Completion had no visible feedback")
+            continue
+        FEEDBACK_CACHE.set(question, ideal_answer, student_answer, feedback)
+        return feedback
+
+def lookup_feedback(question, ideal_answer, student_answer):
+    """Feedback that needs no upstream call (fast path or cache), or None"""
+    templated = fast_path_feedback(ideal_answer, student_answer)
+    if templated is not None:
+        return templated
+    return FEEDBACK_CACHE.get(question, ideal_answer, student_answer)
+
+def generate_feedback(question, ideal_answer, student_answer, user=None, difficulty=None, deadline_at=None):
+    """Feedback text; raises AdmissionRejected when the upstream is saturated"""
+    known = lookup_feedback(question, ideal_answer, student_answer)
+    if known is not None:
+        return known
+    return generate_new_feedback(question, ideal_answer, student_answer, user, difficulty, deadline_at)
+
+def generate_new_feedback(question, ideal_answer, student_answer, user=None, difficulty=None, deadline_at=None):
+    """generate_feedback for an answer lookup_feedback already missed"""
+    if deadline_at is None:
+        deadline_at = time.monotonic() + FEEDBACK_DEADLINE
+
+    def admitted_request():
+        with ADMISSION.slot(user):
+            return request_feedback(question, ideal_answer, student_answer, difficulty, deadline_at)
+
+    key = feedback_cache_key(question, ideal_answer, student_answer)
+    try:
+        return FEEDBACK_FLIGHTS.do(key, admitted_request)
+    except AdmissionRejected:
+        raise
+    except LLMError as e:
+        print(f"❌ LLM unavailable, using rule-based feedback: {e}")
+        return deterministic_feedback(ideal_answer, student_answer)
     except Exception as e:
         return f"Error generating feedback: {str(e)}"
 
+DIFFICULTY_RANK = {"Easy": 0, "Medium": 1}  # anything else (Hard, unknown) ranks highest
+
+def route_pack(items, deadline_at):
+    """One route for a pack, chosen for its lowest-scoring answer and hardest question"""
+    score = min(calculate_question_score(item["ideal_answer"], item["student_answer"]) for item in items)
+    difficulty = max((item.get("difficulty") for item in items), key=lambda d: DIFFICULTY_RANK.get(d, 2))
+    remaining = deadline_at - time.monotonic()
+    return MODEL_ROUTER.route(score, difficulty, remaining)
+
+def request_packed_feedback(items, deadline_at):
+    """One upstream completion for several items on the routed model; None where the reply couldn't be split"""
+    missing = [
+        find_missing_keywords(extract_keywords(item["ideal_answer"]), item["student_answer"])
+        for item in items
+    ]
+    route = route_pack(items, deadline_at)
+    # Any reasoning happens once for the whole pack, so each extra item only adds its visible reply
+    max_tokens = route.max_tokens + FEEDBACK_PACK_ITEM_TOKENS * (len(items) - 1)
+    payload = completion_payload(build_packed_prompt(items, missing), max_tokens, model=route.model)
+    started = time.monotonic()
+    try:
+        raw = llm_client_for(route.model).chat(payload, deadline=route_budget(route, deadline_at))
+    except LLMError:
+        MODEL_ROUTER.record(route.model, time.monotonic() - started, ok=False)
+        raise
+    MODEL_ROUTER.record(route.model, time.monotonic() - started, ok=True)
+    sections = split_packed_response(clean_response(raw), len(items))
+    for item, feedback in zip(items, sections):
+        if feedback:
+            FEEDBACK_CACHE.set(item["question"], item["ideal_answer"], item["student_answer"], feedback)
+    return sections
+
+def batch_error(error):
+    if isinstance(error, AdmissionRejected):
+        return {"error": str(error), "retry_after": error.retry_after}
+    return {"error": f"Error generating feedback: {str(error)}"}
+
+def single_batch_result(item, user, deadline_at):
+    try:
+        return {"feedback": generate_new_feedback(item["question"], item["ideal_answer"], item["student_answer"],
+                                                  user=user, difficulty=item.get("difficulty"), deadline_at=deadline_at)}
+    except AdmissionRejected as e:
+        return batch_error(e)
+
+def pack_batch_results(items, user, deadline_at):
+    """Results for one pack; items the packed reply missed are generated on their own"""
+    if len(items) == 1:
+        return [single_batch_result(items[0], user, deadline_at)]
+    try:
+        with ADMISSION.slot(user):
+            sections = request_packed_feedback(items, deadline_at)
+    except LLMError as e:
+        # Each item gets its own route (and its fallbacks) in whatever time is left
+        print(f"❌ Packed feedback failed, generating items one by one: {e}")
+        sections = [None] * len(items)
+    except Exception as e:
+        return [batch_error(e)] * len(items)
+    return [
+        {"feedback": feedback} if feedback else single_batch_result(item, user, deadline_at)
+        for item, feedback in zip(items, sections)
+    ]
+
+def generate_feedback_batch(items, user=None, pack=False, deadline_at=None):
+    """Per-item results in input order: {"feedback": ...} or {"error": ...}
+
+    Each item is looked up (fast path, cache) once here; only misses reach the model.
+    """
+    if deadline_at is None:
+        deadline_at = time.monotonic() + FEEDBACK_DEADLINE
+    results = [None] * len(items)
+    pending = {}  # cache key -> (item, indices); identical items share one generation
+    for index, item in enumerate(items):
+        if not isinstance(item, dict) or not all(item.get(field) for field in ("question", "ideal_answer", "student_answer")):
+            results[index] = {"error": "Missing input fields"}
+            continue
+        known = lookup_feedback(item["question"], item["ideal_answer"], item["student_answer"])
+        if known is not None:
+            results[index] = {"feedback": known}
+            continue
+        key = feedback_cache_key(item["question"], item["ideal_answer"], item["student_answer"])
+        pending.setdefault(key, (item, []))[1].append(index)
+
+    unique = [item for item, _ in pending.values()]
+    if pack:
+        groups = pack_items(unique, FEEDBACK_PACK_TOKEN_BUDGET, FEEDBACK_PACK_MAX_ITEMS)
+    else:
+        groups = [[item] for item in unique]
+    futures = [FEEDBACK_BATCH_EXECUTOR.submit(pack_batch_results, group, user, deadline_at) for group in groups]
+    outcomes = [result for future in futures for result in future.result()]
+
+    for (_, indices), outcome in zip(pending.values(), outcomes):
+        for index in indices:
+            results[index] = outcome
+    return results
+
+def sse_event(data, event=None):
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {json.dumps(data)}\n\n"
+
+def stream_text(text):
+    yield sse_event({"token": text})
+    yield sse_event({}, event="done")
+
+def stream_feedback(question, ideal_answer, student_answer, on_complete=None, difficulty=None, deadline_at=None):
+    """Stream visible feedback tokens as SSE, dropping the <think> section on the fly.
+
+    The caller must hold an admission slot. ``on_complete`` gets the full text
+    once the stream finishes. A route that fails before its first token falls
+    back to the next one.
+    """
+    prompt = build_feedback_prompt(question, ideal_answer, student_answer)
+    if deadline_at is None:
+        deadline_at = time.monotonic() + FEEDBACK_DEADLINE
+    route = route_feedback(ideal_answer, student_answer, difficulty, deadline_at)
+    think_filter = ThinkFilter()
+    parts = []
+
+    try:
+        while True:
+            budget = route_budget(route, deadline_at)
+            payload = completion_payload(prompt, route.max_tokens, stream=True, model=route.model)
+            started = time.monotonic()
+            try:
+                for token in llm_client_for(route.model).stream_chat(payload, deadline=budget):
+                    visible = think_filter.feed(token)
+                    if visible:
+                        parts.append(visible)
+                        yield sse_event({"token": visible})
+            except LLMError:
+                MODEL_ROUTER.record(route.model, time.monotonic() - started, ok=False)
+                route = None if parts else route.fallback
+                if route is None:
+                    raise
+                think_filter = ThinkFilter()
+                continue
+            MODEL_ROUTER.record(route.model, time.monotonic() - started, ok=True)
+            visible = think_filter.flush()
+            if visible:
+                parts.append(visible)
+                yield sse_event({"token": visible})
+            if parts:
+                break
+            # Nothing visible, e.g. the <think> trace used up max_tokens
+            route = route.fallback
+            if route is None:
+                raise LLMError("Completion had no visible feedback")
+            think_filter = ThinkFilter()
+        feedback = "".join(parts).strip()
+        if feedback:
+            FEEDBACK_CACHE.set(question, ideal_answer, student_answer, feedback)
+            if on_complete is not None:
+                on_complete(feedback)
+        yield sse_event({}, event="done")
+    except LLMError as e:
+        if parts:
+            yield sse_event({"error": f"Error generating feedback: {str(e)}"}, event="error")
+        else:
+            # Nothing shown yet, so fall back to rule-based feedback
+            feedback = deterministic_feedback(ideal_answer, student_answer)
+            if on_complete is not None:
+                on_complete(feedback)
+            yield from stream_text(feedback)
+    except Exception as e:
+        yield sse_event({"error": f"Error generating feedback: {str(e)}"}, event="error")
+
+def busy_response(rejection):
+    return jsonify({"error": str(rejection), "retry_after": rejection.retry_after}), 429, {
+        "Retry-After": str(rejection.retry_after)
+    }
+
+def session_token(data):
+    """Bearer token from the Authorization header, else a "token" field in the body"""
+    header = request.headers.get("Authorization", "")
+    if header.startswith("Bearer "):
+        return header[len("Bearer "):].strip()
+    return data.get("token")
+
+def token_identity(token):
+    """(username, grade) from a valid session token, else (None, None)"""
+    if token:
+        try:
+            claims = SESSION_TOKENS.verify(token)
+            return claims["u"], claims["g"]
+        except SessionError:
+            pass
+    return None, None
+
+def request_identity(data):
+    """(username, grade) from a valid session token, else (the body's username, None)"""
+    token = session_token(data)
+    if token:
+        username, grade = token_identity(token)
+        if username is not None:
+            return username, grade
+    return data.get("username"), None
+
+def utc_now():
+    return datetime.now(timezone.utc).isoformat()
+
+def record_feedback(username, question, student_answer, feedback):
+    """Queue generated feedback for the history tables (never blocks on the database)"""
+    if ATTEMPT_WRITER is None or not feedback:
+        return
+    ATTEMPT_WRITER.submit("attempt_answers", {
+        "username": username, "source": "feedback", "question": question,
+        "student_answer": student_answer, "feedback": feedback, "created_at": utc_now(),
+    })
+
+def record_attempt(username, grade, questions, answers, results, total_score, max_score, percentage, letter_grade):
+    """Queue a scored test and its per-question scores; returns the attempt id"""
+    if ATTEMPT_WRITER is None:
+        return None
+    attempt_id = uuid.uuid4().hex
+    created_at = utc_now()
+    ATTEMPT_WRITER.submit("attempts", {
+        "attempt_id": attempt_id, "username": username, "grade": grade,
+        "total_score": total_score, "max_score": max_score, "percentage": percentage,
+        "letter_grade": letter_grade, "created_at": created_at,
+    })
+    for question_obj, student_answer, result in zip(questions, answers, results):
+        ATTEMPT_WRITER.submit("attempt_answers", {
+            "attempt_id": attempt_id, "username": username, "source": "score",
+            "question": question_obj.get("Question"), "student_answer": student_answer,
+            "score": result.score, "created_at": created_at,
+        })
+    return attempt_id
+
+def request_user(data):
+    """Identity used for fair queueing: the username if sent, else the client address"""
+    return data.get("username") or request.remote_addr
+
 def get_letter_grade(percentage):
     """Convert percentage to letter grade"""
     if percentage >= 90:
@@ -334,22 +886,48 @@ def get_letter_grade(percentage):
 # Health check endpoint
 @app.route("/health", methods=["GET"])
 def health_check():
-    try:
-        # Test database connection
-        conn = get_db_connection()
-        conn.close()
-        db_status = "connected"
-    except:
+    # Report pool state instead of opening a probe connection
+    pool_stats = DB_POOL.stats()
+    if pool_stats["last_error"]:
         db_status = "disconnected"
+    elif pool_stats["size"] > 0:
+        db_status = "connected"
+    else:
+        db_status = "idle"
     
     return jsonify({
         "status": "healthy",
         "frontend_available": os.path.exists(FRONTEND_DIR),
         "api_key_configured": bool(TOGETHER_API_KEY),
         "db_configured": bool(os.getenv("DB_HOST")),
-        "db_status": db_status
+        "db_status": db_status,
+        "db_pool": pool_stats,
+        "feedback_cache": FEEDBACK_CACHE.stats(),
+        "feedback_coalescing": FEEDBACK_FLIGHTS.stats(),
+        "feedback_fast_path": fast_path_stats(),
+        "llm_admission": ADMISSION.stats(),
+        "llm_client": LLM_CLIENT.stats(),
+        "llm_client_fast": FAST_LLM_CLIENT.stats() if FAST_LLM_CLIENT is not None else None,
+        "model_router": MODEL_ROUTER.stats(),
+        "static_assets": STATIC_ASSETS.stats(),
+        "pid": os.getpid(),
+        "memory": process_memory(),
+        "warm": {
+            "keyword_index": KEYWORD_INDEX is not None,
+            "spacy": KEYWORD_EXTRACTOR.loaded,
+            "schema": SCHEMA_READY,
+            "embeddings": SEMANTIC_SCORER is not None
+        },
+        "scoring_mode": SCORING_MODE,
+        "question_bank": QUESTION_BANK_BACKEND,
+        "sessions": SESSION_REVOCATIONS.stats(),
+        "attempt_writer": ATTEMPT_WRITER.stats() if ATTEMPT_WRITER is not None else None
     })
 
+@app.route("/metrics", methods=["GET"])
+def metrics_endpoint():
+    return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
 @app.route("/generate-feedback", methods=["POST"])
 def feedback_api():
     data = request.get_json()
@@ -360,9 +938,72 @@ def feedback_api():
     if not all([question, ideal_answer, student_answer]):
         return jsonify({"error": "Missing input fields"}), 400
 
-    feedback = generate_feedback(question, ideal_answer, student_answer)
+    try:
+        feedback = generate_feedback(question, ideal_answer, student_answer, user=request_user(data),
+                                     difficulty=data.get("difficulty"), deadline_at=request_deadline(data))
+    except AdmissionRejected as e:
+        return busy_response(e)
+    record_feedback(request_identity(data)[0], question, student_answer, feedback)
     return jsonify({"feedback": feedback})
 
+@app.route("/generate-feedback/stream", methods=["POST"])
+def feedback_stream_api():
+    data = request.get_json()
+    question = data.get("question")
+    ideal_answer = data.get("ideal_answer")
+    student_answer = data.get("student_answer")
+
+    if not all([question, ideal_answer, student_answer]):
+        return jsonify({"error": "Missing input fields"}), 400
+
+    username = request_identity(data)[0]
+    known = lookup_feedback(question, ideal_answer, student_answer)
+    admitted_at = None
+    if known is not None:
+        record_feedback(username, question, student_answer, known)
+        events = stream_text(known)
+    else:
+        try:
+            ADMISSION.acquire(request_user(data))
+        except AdmissionRejected as e:
+            return busy_response(e)
+        admitted_at = time.monotonic()
+        events = stream_feedback(question, ideal_answer, student_answer,
+                                 on_complete=lambda text: record_feedback(username, question, student_answer, text),
+                                 difficulty=data.get("difficulty"), deadline_at=request_deadline(data))
+
+    response = Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+    if admitted_at is not None:
+        # Released when the response is closed, even if the client disconnects early
+        response.call_on_close(lambda: ADMISSION.release(time.monotonic() - admitted_at))
+    return response
+
+@app.route("/generate-feedback/batch", methods=["POST"])
+def feedback_batch_api():
+    data = request.get_json()
+    items = data.get("items") if isinstance(data, dict) else None
+
+    if not isinstance(items, list) or not items:
+        return jsonify({"error": "Missing items"}), 400
+    if len(items) > FEEDBACK_BATCH_MAX_ITEMS:
+        return jsonify({"error": f"Too many items (max {FEEDBACK_BATCH_MAX_ITEMS})"}), 400
+
+    results = generate_feedback_batch(items, user=request_user(data), pack=bool(data.get("pack")),
+                                      deadline_at=request_deadline(data))
+    username = request_identity(data)[0]
+    for item, result in zip(items, results):
+        if "feedback" in result:
+            record_feedback(username, item["question"], item["student_answer"], result["feedback"])
+    return jsonify({
+        "results": results,
+        "count": len(results),
+        "errors": sum(1 for result in results if "error" in result)
+    })
+
 @app.route("/calculate-score", methods=["POST"])
 def calculate_score():
     data = request.get_json()
@@ -375,14 +1016,16 @@ def calculate_score():
     if len(questions) != len(answers):
         return jsonify({"error": "Mismatch in number of questions and answers"}), 400
     
+    ideal_answers = [question_obj.get("Answer", "") for question_obj in questions]
+    with STAGE_SECONDS.time(stage="similarity"):
+        results = score_batch(zip(ideal_answers, answers), get_keyword_entry, semantic_scorer())
+
     total_score = 0
     question_scores = []
     debug_info = []
     
-    for i, (question_obj, student_answer) in enumerate(zip(questions, answers)):
-        ideal_answer = question_obj.get("Answer", "")
-        
-        question_score = calculate_question_score(ideal_answer, student_answer)
+    for i, (ideal_answer, student_answer, result) in enumerate(zip(ideal_answers, answers, results)):
+        question_score = result.score
         total_score += question_score
         
         debug_info.append({
@@ -390,7 +1033,8 @@ def calculate_score():
             "ideal_answer": ideal_answer,
             "student_answer": student_answer,
             "score": question_score,
-            "similarity": round(SequenceMatcher(None, ideal_answer.lower(), student_answer.lower()).ratio(), 3)
+            "similarity": result.similarity,
+            "semantic_similarity": result.semantic
         })
         
         question_scores.append({
@@ -401,20 +1045,27 @@ def calculate_score():
     
     max_total_score = len(questions) * 2.0
     percentage = (total_score / max_total_score) * 100 if max_total_score > 0 else 0
+    letter_grade = get_letter_grade(percentage)
+    attempt_id = record_attempt(*request_identity(data), questions, answers, results,
+                                round(total_score, 1), max_total_score, round(percentage, 1), letter_grade)
     
-    print("=== SCORING DEBUG INFO ===")
-    for debug in debug_info:
-        print(f"Q{debug['question_num']}: Score={debug['score']}/2.0, Similarity={debug['similarity']}")
-        print(f"  Ideal: {debug['ideal_answer'][:100]}...")
-        print(f"  Student: {debug['student_answer'][:100]}...")
-        print()
+    # Verbose, so only with LOG_LEVEL=DEBUG and for a DEBUG_LOG_SAMPLE_RATE share of requests
+    if debug_sampled():
+        print("=== SCORING DEBUG INFO ===")
+        for debug in debug_info:
+            print(f"Q{debug['question_num']}: Score={debug['score']}/2.0, Similarity={debug['similarity']}, "
+                  f"Semantic={debug['semantic_similarity']}")
+            print(f"  Ideal: {debug['ideal_answer'][:100]}...")
+            print(f"  Student: {debug['student_answer'][:100]}...")
+            print()
     
     return jsonify({
         "total_score": round(total_score, 1),
         "max_score": max_total_score,
         "percentage": round(percentage, 1),
         "question_scores": question_scores,
-        "grade": get_letter_grade(percentage),
+        "grade": letter_grade,
+        "attempt_id": attempt_id,
         "debug_info": debug_info  
     })
 
@@ -429,7 +1080,8 @@ def register():
         password = data.get("password")
         grade = data.get("grade")
 
-        print(f"Registration attempt: username={username}, grade={grade}")
+        if log_enabled("DEBUG"):
+            print(f"Registration attempt: username={username}, grade={grade}")
 
         if not all([username, password, grade]):
             return jsonify({"error": "Missing required fields: username, password, or grade"}), 400
@@ -446,16 +1098,19 @@ def register():
         cursor = conn.cursor()
         
         # Check if username already exists
-        cursor.execute("SELECT username FROM users WHERE username = %s", (username,))
-        if cursor.fetchone():
+        with STAGE_SECONDS.time(stage="db_query"):
+            cursor.execute("SELECT username FROM users WHERE username = %s", (username,))
+            exists = cursor.fetchone()
+        if exists:
             return jsonify({"error": "Username already exists."}), 400
 
         # Insert new user
-        cursor.execute(
-            "INSERT INTO users (username, password, grade) VALUES (%s, %s, %s)", 
-            (username, password, grade)
-        )
-        conn.commit()
+        with STAGE_SECONDS.time(stage="db_query"):
+            cursor.execute(
+                "INSERT INTO users (username, password, grade) VALUES (%s, %s, %s)", 
+                (username, hash_password(password, PASSWORD_HASH_METHOD), grade)
+            )
+            conn.commit()
         print(f"✓ User {username} registered successfully")
         
         return jsonify({"message": "User registered successfully!"})
@@ -469,8 +1124,6 @@ def register():
     finally:
         if 'cursor' in locals(): 
             cursor.close()
-        if 'conn' in locals(): 
-            conn.close()
 
 @app.route("/login", methods=["POST"])
 def login():
@@ -487,13 +1140,28 @@ def login():
 
         conn = get_db_connection()
         cursor = conn.cursor()
-        cursor.execute("SELECT grade FROM users WHERE username=%s AND password=%s", (username, password))
-        result = cursor.fetchone()
-        
-        if result:
-            return jsonify({"message": "Login successful!", "grade": result[0]})
-        else:
+        with STAGE_SECONDS.time(stage="db_query"):
+            cursor.execute("SELECT id, password, grade FROM users WHERE username=%s", (username,))
+            result = cursor.fetchone()
+
+        matches, needs_rehash = verify_password(result[1], password) if result else (False, False)
+        if not matches:
             return jsonify({"error": "Invalid username or password"}), 401
+
+        user_id, _, grade = result
+        if needs_rehash:
+            # Rows from before password hashing are upgraded on their first login
+            with STAGE_SECONDS.time(stage="db_query"):
+                cursor.execute("UPDATE users SET password=%s WHERE id=%s",
+                               (hash_password(password, PASSWORD_HASH_METHOD), user_id))
+                conn.commit()
+
+        return jsonify({
+            "message": "Login successful!",
+            "grade": grade,
+            "token": SESSION_TOKENS.issue(user_id, username, grade),
+            "expires_in": SESSION_TOKENS.max_age
+        })
             
     except Exception as e:
         print(f"❌ Database error during login: {e}")
@@ -504,127 +1172,67 @@ def login():
     finally:
         if 'cursor' in locals(): 
             cursor.close()
-        if 'conn' in locals(): 
-            conn.close()
+
+@app.route("/logout", methods=["POST"])
+def logout():
+    token = session_token(request.get_json(silent=True) or {})
+    try:
+        claims = SESSION_TOKENS.verify(token)
+    except SessionError:
+        return jsonify({"message": "Logged out"})
+
+    SESSION_REVOCATIONS.add(claims["jti"])
+    try:
+        conn = get_db_connection()
+        with conn.cursor() as cursor:
+            with STAGE_SECONDS.time(stage="db_query"):
+                cursor.execute("DELETE FROM revoked_sessions WHERE expires_at <= %s", (time.time(),))
+                cursor.execute(
+                    "INSERT INTO revoked_sessions (jti, expires_at) VALUES (%s, %s) ON CONFLICT (jti) DO NOTHING",
+                    (claims["jti"], SESSION_TOKENS.expires_at(token))
+                )
+        conn.commit()
+    except Exception as e:
+        print(f"❌ Database error during logout: {e}")
+        return jsonify({"error": f"Database error: {str(e)}"}), 500
+    return jsonify({"message": "Logged out"})
 
 @app.route("/get-questions", methods=["POST"])
 def get_questions():
-    data = request.get_json()
+    data = request.get_json() or {}
+    token = session_token(data)
     username = data.get("username")
-    if not username:
-        return jsonify({"error": "Username is required"}), 400
+    if not token and not username:
+        return jsonify({"error": "Session token or username is required"}), 400
 
     try:
-        conn = get_db_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT grade FROM users WHERE username = %s", (username,))
-        result = cursor.fetchone()
-        if not result:
-            return jsonify({"error": "User not found"}), 404
-
-        grade = result[0]
-        
-        # Updated paths for Railway deployment
-        possible_paths = [
-            os.path.join(BASE_DIR, "data", f"grade{grade}_v2.csv"),
-            os.path.join(os.path.dirname(BASE_DIR), "data", f"grade{grade}_v2.csv"),
-            os.path.join("/app", "data", f"grade{grade}_v2.csv"),
-            os.path.join("/app/backend", "data", f"grade{grade}_v2.csv"),
-        ]
-        
-        file_path = None
-        for path in possible_paths:
-            print(f"Trying path: {path}")
-            if os.path.exists(path):
-                file_path = path
-                print(f"✓ Found file at: {path}")
-                break
-        
-        if not file_path:
-            print(f"BASE_DIR: {BASE_DIR}")
-            print(f"Looking for grade: {grade}")
-            
-            data_dirs_to_check = [
-                os.path.join(BASE_DIR, "data"),
-                os.path.join(os.path.dirname(BASE_DIR), "data"),
-                os.path.join("/app", "data"),
-                os.path.join("/app/backend", "data")
-            ]
-            
-            for data_dir in data_dirs_to_check:
-                if os.path.exists(data_dir):
-                    available_files = os.listdir(data_dir)
-                    print(f"Files in {data_dir}: {available_files}")
-                    return jsonify({
-                        "error": f"Question file not found for grade {grade}. Available files in {data_dir}: {available_files}"
-                    }), 500
-            
-            return jsonify({"error": f"No data directory found. Searched paths: {data_dirs_to_check}"}), 500
+        if token:
+            # The grade is signed into the token, so starting a test needs no DB round trip
+            try:
+                grade = SESSION_TOKENS.verify(token)["g"]
+            except SessionError as e:
+                return jsonify({"error": str(e)}), 401
+        else:
+            conn = get_db_connection()
+            cursor = conn.cursor()
+            with STAGE_SECONDS.time(stage="db_query"):
+                cursor.execute("SELECT grade FROM users WHERE username = %s", (username,))
+                result = cursor.fetchone()
+            if not result:
+                return jsonify({"error": "User not found"}), 404
+            grade = result[0]
 
         try:
-            df = pd.read_csv(file_path)
-        except Exception as csv_error:
-            print(f"Error reading CSV: {csv_error}")
-            return jsonify({"error": f"Error reading CSV file: {str(csv_error)}"}), 500
-        
-        required_columns = ["Difficulty", "Question", "Answer"]
-        missing_columns = [col for col in required_columns if col not in df.columns]
-        if missing_columns:
-            available_columns = list(df.columns)
-            print(f"Available columns: {available_columns}")
-            return jsonify({
-                "error": f"Missing columns in CSV: {missing_columns}. Available columns: {available_columns}"
-            }), 500
-
-        difficulty_counts = df['Difficulty'].value_counts().to_dict()
-        print(f"Question counts by difficulty: {difficulty_counts}")
-
-        def sample_questions(level, n):
-            level_questions = df[df["Difficulty"] == level]
-            available_count = len(level_questions)
-            
-            if available_count == 0:
-                print(f"Warning: No {level} questions available")
-                return []
-            
-            sample_size = min(n, available_count)
-            if available_count < n:
-                print(f"Warning: Only {available_count} {level} questions available, requested {n}")
-            
-            return level_questions.sample(sample_size, replace=False).to_dict(orient="records")
-
-        easy = sample_questions("Easy", 2)
-        medium = sample_questions("Medium", 2)
-        difficult = sample_questions("Difficult", 1)
-
-        selected = easy + medium + difficult
-        
-        seen_questions = set()
-        unique_selected = []
-        for q in selected:
-            if q["Question"] not in seen_questions:
-                seen_questions.add(q["Question"])
-                unique_selected.append(q)
-        
-        if len(unique_selected) < 5:
-            used_questions = {q["Question"] for q in unique_selected}
-            remaining_questions = df[~df["Question"].isin(used_questions)]
-            
-            needed = 5 - len(unique_selected)
-            if len(remaining_questions) >= needed:
-                additional = remaining_questions.sample(needed).to_dict(orient="records")
-                unique_selected.extend(additional)
+            if QUESTION_BANK_BACKEND == "postgres" and DB_AUTO_INIT:
+                ensure_database()
+            unique_selected = QUESTION_BANK.sample(grade)
+        except QuestionBankError as e:
+            print(f"Error loading questions for grade {grade}: {e}")
+            return jsonify({"error": str(e)}), 500
 
         if len(unique_selected) == 0:
             return jsonify({"error": "No questions found"}), 500
 
-        random.shuffle(unique_selected)
-
-        print(f"Successfully loaded {len(unique_selected)} unique questions")
-        
-        question_titles = [q["Question"][:50] + "..." if len(q["Question"]) > 50 else q["Question"] for q in unique_selected]
-        print(f"Selected questions: {question_titles}")
-        
         return jsonify({"questions": unique_selected})
 
     except Exception as e:
@@ -635,58 +1243,71 @@ def get_questions():
     finally:
         if 'cursor' in locals(): 
             cursor.close()
-        if 'conn' in locals(): 
-            conn.close()
+
+def serve_asset(path):
+    """Frontend file from the asset manifest (304 when unchanged), or None if unknown"""
+    if not FRONTEND_AVAILABLE:
+        return None
+    result = STATIC_ASSETS.respond(path, request.headers.get("Accept-Encoding"), request.if_none_match.contains)
+    if result is None:
+        return None
+    status, headers, body = result
+    return Response(body, status=status, headers=headers)
 
 # Serve main frontend pages
 @app.route("/")
 def serve_root():
-    if os.path.exists(FRONTEND_DIR):
-        try:
-            return send_from_directory(FRONTEND_DIR, "login.html")
-        except:
-            pass
+    response = serve_asset("login.html")
+    if response is not None:
+        return response
     return jsonify({"message": "Smart Feedback Generator API", "status": "running"})
 
 @app.route("/login")
 def serve_login():
-    if os.path.exists(FRONTEND_DIR):
-        try:
-            return send_from_directory(FRONTEND_DIR, "login.html")
-        except:
-            pass
+    response = serve_asset("login.html")
+    if response is not None:
+        return response
     return jsonify({"error": "Frontend not available"})
 
 @app.route("/register")
 def serve_register():
-    if os.path.exists(FRONTEND_DIR):
-        try:
-            return send_from_directory(FRONTEND_DIR, "register.html")
-        except:
-            pass
+    response = serve_asset("register.html")
+    if response is not None:
+        return response
     return jsonify({"error": "Frontend not available"})
 
 @app.route("/question")
 def serve_question():
-    if os.path.exists(FRONTEND_DIR):
-        try:
-            return send_from_directory(FRONTEND_DIR, "question.html")
-        except:
-            pass
+    response = serve_asset("question.html")
+    if response is not None:
+        return response
     return jsonify({"error": "Frontend not available"})
 
-# Serve static files (CSS, JS, etc.)
+# Serve static files (CSS, JS, images), fingerprinted names cached as immutable
 @app.route("/<path:filename>")
 def static_proxy(filename):
-    if os.path.exists(FRONTEND_DIR):
-        try:
-            return send_from_directory(FRONTEND_DIR, filename)
-        except:
-            pass
+    response = serve_asset(filename)
+    if response is not None:
+        return response
     return jsonify({"error": f"File {filename} not found"}), 404
 
 if __name__ == "__main__":
+    import sys
+    if sys.argv[1:] == ["init-db"]:
+        # Explicit, run-once schema setup (e.g. a release/pre-deploy step)
+        sys.exit(0 if init_database() else 1)
+
+    print_environment()
+    if os.getenv("WARM_UP", "1") == "1":
+        start_warm_up()
+
     port = int(os.environ.get("PORT", 8080))
     print(f"Starting server on port {port}")
     print(f"Environment: {os.environ.get('RAILWAY_ENVIRONMENT', 'local')}")
-    app.run(host="0.0.0.0", port=port, debug=False)
\ No newline at end of file
+    if os.environ.get("SERVER_MODE", "wsgi") == "asgi":
+        import uvicorn
+        # asgi.py imports "app"; reuse this module instead of loading everything twice
+        sys.modules.setdefault("app", sys.modules[__name__])
+        uvicorn.run("asgi:application", host="0.0.0.0", port=port, app_dir=BASE_DIR)
+    else:
+        app.run(host="0.0.0.0", port=port, debug=False)
\ No newline at end of file
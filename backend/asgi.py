@@ -0,0 +1,369 @@
+"""Asyncio serving mode.
+
+The feedback endpoints are implemented natively on the event loop with an
+async HTTP client, so a student waiting up to a minute for the model holds a
+coroutine rather than a worker thread. Every other route (login, questions,
+scoring, static files) is the unchanged Flask app, bridged through asgiref's
+WsgiToAsgi onto a sized thread pool (ASGI_WSGI_THREADS); those handlers are
+short, so a small pool serves them while hundreds of feedback requests stay
+open.
+
+Run with:
+
+    SERVER_MODE=asgi python backend/app.py
+    # or
+    uvicorn asgi:application --app-dir backend --host 0.0.0.0 --port $PORT
+"""
+import asyncio
+import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgi, WsgiToAsgiInstance
+
+import app as flask_app
+from admission import AdmissionRejected
+from llm_client import AsyncLLMClient, LLMError
+from singleflight import AsyncSingleFlight
+from think_filter import ThinkFilter
+
+# asgiref runs WSGI apps thread-sensitively, i.e. every bridged request on one
+# shared thread; this pool lets login hashing, scoring and static files overlap
+WSGI_EXECUTOR = ThreadPoolExecutor(max_workers=int(os.getenv("ASGI_WSGI_THREADS", 16)), thread_name_prefix="wsgi")
+_run_wsgi_app = WsgiToAsgiInstance.__dict__["run_wsgi_app"].func
+
+
+class PooledWsgiToAsgiInstance(WsgiToAsgiInstance):
+    async def run_wsgi_app(self, body):
+        await sync_to_async(_run_wsgi_app, thread_sensitive=False, executor=WSGI_EXECUTOR)(self, body)
+
+
+class PooledWsgiToAsgi(WsgiToAsgi):
+    async def __call__(self, scope, receive, send):
+        await PooledWsgiToAsgiInstance(self.wsgi_application, self.duplicate_header_limit)(scope, receive, send)
+
+
+wsgi_application = PooledWsgiToAsgi(flask_app.app)
+
+FEEDBACK_FLIGHTS = AsyncSingleFlight()
+
+# Same endpoint, retry policy and circuit breaker as the threaded client
+LLM_CLIENT = AsyncLLMClient(
+    flask_app.TOGETHER_API_URL,
+    flask_app.HEADERS,
+    retry_policy=flask_app.LLM_CLIENT.retry_policy,
+    breaker=flask_app.LLM_CLIENT.breaker,
+    max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", 100)),
+)
+FAST_LLM_CLIENT = AsyncLLMClient(
+    flask_app.TOGETHER_API_URL,
+    flask_app.HEADERS,
+    retry_policy=flask_app.FAST_LLM_CLIENT.retry_policy,
+    breaker=flask_app.FAST_LLM_CLIENT.breaker,
+    max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", 100)),
+) if flask_app.FAST_LLM_CLIENT is not None else None
+# Latency and error samples from both serving modes feed one router
+MODEL_ROUTER = flask_app.MODEL_ROUTER
+
+
+def llm_client_for(model):
+    return FAST_LLM_CLIENT if FAST_LLM_CLIENT is not None and model == flask_app.FAST_MODEL_NAME else LLM_CLIENT
+
+
+async def run_blocking(fn, *args):
+    """Run a blocking call (shared cache tier, DB, keyword parsing, scoring) off the event loop."""
+    return await asyncio.to_thread(fn, *args)
+
+
+def prepare_request(question, ideal_answer, student_answer, difficulty, deadline_at):
+    """Prompt and route for one request; parses keywords and pre-scores, so run it via run_blocking."""
+    prompt = flask_app.build_feedback_prompt(question, ideal_answer, student_answer)
+    return prompt, flask_app.route_feedback(ideal_answer, student_answer, difficulty, deadline_at)
+
+
+async def cache_get(question, ideal_answer, student_answer):
+    if flask_app.FEEDBACK_CACHE.shared is None:
+        return flask_app.FEEDBACK_CACHE.get(question, ideal_answer, student_answer)
+    return await run_blocking(flask_app.FEEDBACK_CACHE.get, question, ideal_answer, student_answer)
+
+
+async def cache_set(question, ideal_answer, student_answer, feedback):
+    if flask_app.FEEDBACK_CACHE.shared is None:
+        flask_app.FEEDBACK_CACHE.set(question, ideal_answer, student_answer, feedback)
+    else:
+        await run_blocking(flask_app.FEEDBACK_CACHE.set, question, ideal_answer, student_answer, feedback)
+
+
+async def request_feedback(question, ideal_answer, student_answer, difficulty=None, deadline_at=None):
+    prompt, route = await run_blocking(prepare_request, question, ideal_answer, student_answer, difficulty, deadline_at)
+    while True:
+        budget = flask_app.route_budget(route, deadline_at)
+        started = time.monotonic()
+        try:
+            raw = await llm_client_for(route.model).chat(
+                flask_app.completion_payload(prompt, route.max_tokens, model=route.model), deadline=budget)
+        except LLMError:
+            MODEL_ROUTER.record(route.model, time.monotonic() - started, ok=False)
+            route = route.fallback
+            if route is None:
+                raise
+            continue
+        MODEL_ROUTER.record(route.model, time.monotonic() - started, ok=True)
+        feedback = flask_app.clean_response(raw)
+        if not feedback:
+            route = route.fallback
+            if route is None:
+                raise LLMError("Completion had no visible feedback")
+            continue
+        await cache_set(question, ideal_answer, student_answer, feedback)
+        return feedback
+
+
+async def lookup_feedback(question, ideal_answer, student_answer):
+    templated = await run_blocking(flask_app.fast_path_feedback, ideal_answer, student_answer)
+    if templated is not None:
+        return templated
+    return await cache_get(question, ideal_answer, student_answer)
+
+
+async def generate_feedback(question, ideal_answer, student_answer, user=None, difficulty=None, deadline_at=None):
+    known = await lookup_feedback(question, ideal_answer, student_answer)
+    if known is not None:
+        return known
+    if deadline_at is None:
+        deadline_at = time.monotonic() + flask_app.FEEDBACK_DEADLINE
+
+    async def admitted_request():
+        async with flask_app.ADMISSION.slot_async(user):
+            return await request_feedback(question, ideal_answer, student_answer, difficulty, deadline_at)
+
+    key = flask_app.feedback_cache_key(question, ideal_answer, student_answer)
+    try:
+        return await FEEDBACK_FLIGHTS.do(key, admitted_request)
+    except AdmissionRejected:
+        raise
+    except LLMError as e:
+        print(f"❌ LLM unavailable, using rule-based feedback: {e}")
+        return await run_blocking(flask_app.deterministic_feedback, ideal_answer, student_answer)
+    except Exception as e:
+        return f"Error generating feedback: {str(e)}"
+
+
+async def stream_feedback(question, ideal_answer, student_answer, on_complete=None, difficulty=None, deadline_at=None):
+    """Upstream token stream; the caller must hold an admission slot. ``on_complete`` is awaited."""
+    sse_event = flask_app.sse_event
+    if deadline_at is None:
+        deadline_at = time.monotonic() + flask_app.FEEDBACK_DEADLINE
+    think_filter = ThinkFilter()
+    parts = []
+
+    try:
+        prompt, route = await run_blocking(prepare_request, question, ideal_answer, student_answer,
+                                           difficulty, deadline_at)
+        while True:
+            budget = flask_app.route_budget(route, deadline_at)
+            payload = flask_app.completion_payload(prompt, route.max_tokens, stream=True, model=route.model)
+            started = time.monotonic()
+            try:
+                async for token in llm_client_for(route.model).stream_chat(payload, deadline=budget):
+                    visible = think_filter.feed(token)
+                    if visible:
+                        parts.append(visible)
+                        yield sse_event({"token": visible})
+            except LLMError:
+                MODEL_ROUTER.record(route.model, time.monotonic() - started, ok=False)
+                route = None if parts else route.fallback
+                if route is None:
+                    raise
+                think_filter = ThinkFilter()
+                continue
+            MODEL_ROUTER.record(route.model, time.monotonic() - started, ok=True)
+            visible = think_filter.flush()
+            if visible:
+                parts.append(visible)
+                yield sse_event({"token": visible})
+            if parts:
+                break
+            route = route.fallback
+            if route is None:
+                raise LLMError("Completion had no visible feedback")
+            think_filter = ThinkFilter()
+        feedback = "".join(parts).strip()
+        if feedback:
+            await cache_set(question, ideal_answer, student_answer, feedback)
+            if on_complete is not None:
+                await on_complete(feedback)
+        yield sse_event({}, event="done")
+    except LLMError as e:
+        if parts:
+            yield sse_event({"error": f"Error generating feedback: {str(e)}"}, event="error")
+        else:
+            feedback = await run_blocking(flask_app.deterministic_feedback, ideal_answer, student_answer)
+            if on_complete is not None:
+                await on_complete(feedback)
+            async for event in stream_text(feedback):
+                yield event
+    except Exception as e:
+        yield sse_event({"error": f"Error generating feedback: {str(e)}"}, event="error")
+
+
+async def stream_text(text):
+    for event in flask_app.stream_text(text):
+        yield event
+
+
+# --- Minimal ASGI plumbing -------------------------------------------------
+
+async def read_json(receive):
+    body = b""
+    while True:
+        message = await receive()
+        body += message.get("body", b"")
+        if not message.get("more_body"):
+            break
+    try:
+        return json.loads(body or b"null")
+    except ValueError:
+        return None
+
+
+def _headers(content_type, extra=None):
+    headers = [
+        (b"content-type", content_type.encode()),
+        (b"access-control-allow-origin", b"*"),
+    ]
+    for name, value in (extra or {}).items():
+        headers.append((name.lower().encode(), str(value).encode()))
+    return headers
+
+
+async def send_json(send, status, payload, extra_headers=None):
+    body = json.dumps(payload).encode()
+    await send({"type": "http.response.start", "status": status,
+                "headers": _headers("application/json", extra_headers)})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def send_busy(send, rejection):
+    await send_json(send, 429, {"error": str(rejection), "retry_after": rejection.retry_after},
+                    {"Retry-After": rejection.retry_after})
+
+
+def feedback_fields(data):
+    if not isinstance(data, dict):
+        return None
+    fields = (data.get("question"), data.get("ideal_answer"), data.get("student_answer"))
+    return fields if all(fields) else None
+
+
+def request_user(scope, data):
+    client = scope.get("client")
+    return data.get("username") or (client[0] if client else None)
+
+
+def session_token(scope, data):
+    """Bearer token from the Authorization header, else a "token" field in the body."""
+    for name, value in scope.get("headers", []):
+        if name == b"authorization":
+            header = value.decode("latin1")
+            if header.startswith("Bearer "):
+                return header[len("Bearer "):].strip()
+    return data.get("token")
+
+
+async def history_user(scope, data):
+    """Username for the history tables: only from a valid session token, else None."""
+    # Verifying may reload the revocation list from the database
+    return (await run_blocking(flask_app.token_identity, session_token(scope, data)))[0]
+
+
+async def record_feedback(username, question, student_answer, feedback):
+    # submit() can wait on a full queue and then spool to disk
+    await run_blocking(flask_app.record_feedback, username, question, student_answer, feedback)
+
+
+async def feedback_endpoint(scope, receive, send):
+    data = await read_json(receive)
+    fields = feedback_fields(data)
+    if fields is None:
+        return await send_json(send, 400, {"error": "Missing input fields"})
+    try:
+        feedback = await generate_feedback(*fields, user=request_user(scope, data), difficulty=data.get("difficulty"),
+                                           deadline_at=flask_app.request_deadline(data))
+    except AdmissionRejected as e:
+        return await send_busy(send, e)
+    await record_feedback(await history_user(scope, data), fields[0], fields[2], feedback)
+    await send_json(send, 200, {"feedback": feedback})
+
+
+async def feedback_stream_endpoint(scope, receive, send):
+    data = await read_json(receive)
+    fields = feedback_fields(data)
+    if fields is None:
+        return await send_json(send, 400, {"error": "Missing input fields"})
+
+    question, _, student_answer = fields
+    username = await history_user(scope, data)
+    known = await lookup_feedback(*fields)
+    admitted_at = None
+    if known is not None:
+        await record_feedback(username, question, student_answer, known)
+        events = stream_text(known)
+    else:
+        try:
+            await flask_app.ADMISSION.acquire_async(request_user(scope, data))
+        except AdmissionRejected as e:
+            return await send_busy(send, e)
+        admitted_at = time.monotonic()
+        events = stream_feedback(*fields, on_complete=lambda text: record_feedback(
+            username, question, student_answer, text), difficulty=data.get("difficulty"),
+            deadline_at=flask_app.request_deadline(data))
+
+    try:
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": _headers("text/event-stream", {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})})
+        async for event in events:
+            await send({"type": "http.response.body", "body": event.encode(), "more_body": True})
+        await send({"type": "http.response.body", "body": b""})
+    finally:
+        # Runs on client disconnect too, so the slot can't leak
+        await events.aclose()
+        if admitted_at is not None:
+            flask_app.ADMISSION.release(time.monotonic() - admitted_at)
+
+
+ASYNC_ROUTES = {
+    ("POST", "/generate-feedback"): feedback_endpoint,
+    ("POST", "/generate-feedback/stream"): feedback_stream_endpoint,
+}
+
+
+async def lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            if os.getenv("WARM_UP", "1") == "1":
+                flask_app.start_warm_up()
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            await LLM_CLIENT.aclose()
+            if FAST_LLM_CLIENT is not None:
+                await FAST_LLM_CLIENT.aclose()
+            if flask_app.ATTEMPT_WRITER is not None:
+                await asyncio.to_thread(flask_app.ATTEMPT_WRITER.close)
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    if scope["type"] == "lifespan":
+        return await lifespan(receive, send)
+
+    if scope["type"] == "http":
+        handler = ASYNC_ROUTES.get((scope["method"], scope["path"]))
+        if handler is not None:
+            return await handler(scope, receive, send)
+
+    return await wsgi_application(scope, receive, send)
@@ -0,0 +1,353 @@
+"""Write-behind persistence for test attempts, per-answer scores and feedback.
+
+Request handlers only call ``writer.submit(table, row)``, which puts the row on
+a bounded in-process queue. A background thread drains that queue into one
+transaction per batch: a multi-row INSERT per table via ``execute_values``.
+Either ATTEMPTS_BATCH_SIZE rows or ATTEMPTS_FLUSH_INTERVAL seconds triggers a
+flush, whichever comes first.
+
+* Backpressure: when the queue is full, ``submit`` waits up to
+  ``put_timeout``. After that the row is appended straight to the spool file
+  instead of being dropped.
+* Durability: a batch that can't be written is appended to a local JSON-lines
+  spool file. The spool is replayed in order once the database accepts writes
+  again.
+* Workers share one spool. Appends and the rename that starts a replay take an
+  ``fcntl.flock`` on ``<spool>.lock``, and a replay file stays flocked while it
+  is replayed. A replay file left unlocked by a worker that crashed mid-replay
+  is picked up by the next replay.
+* Shutdown: ``close()`` drains the queue and flushes. It is registered with
+  atexit and also called from gunicorn's worker_exit hook.
+
+The writer thread is started lazily in the process that first submits, so a
+preforking parent never owns it.
+"""
+import atexit
+import glob
+import json
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # not on Windows; the spool is then only locked within this process
+    fcntl = None
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS attempts (
+    attempt_id VARCHAR(32) PRIMARY KEY,
+    username VARCHAR(50),
+    grade INT,
+    total_score REAL NOT NULL,
+    max_score REAL NOT NULL,
+    percentage REAL NOT NULL,
+    letter_grade VARCHAR(2),
+    created_at TIMESTAMPTZ NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attempt_answers (
+    id SERIAL PRIMARY KEY,
+    attempt_id VARCHAR(32),
+    username VARCHAR(50),
+    source VARCHAR(16) NOT NULL,
+    question TEXT,
+    student_answer TEXT,
+    score REAL,
+    feedback TEXT,
+    created_at TIMESTAMPTZ NOT NULL
+);
+CREATE INDEX IF NOT EXISTS attempts_username_idx ON attempts (username, created_at);
+CREATE INDEX IF NOT EXISTS attempt_answers_attempt_idx ON attempt_answers (attempt_id);
+"""
+
+TABLES = {
+    "attempts": ("attempt_id", "username", "grade", "total_score", "max_score",
+                 "percentage", "letter_grade", "created_at"),
+    "attempt_answers": ("attempt_id", "username", "source", "question", "student_answer",
+                        "score", "feedback", "created_at"),
+}
+
+
+def execute_values_insert(cursor, table, columns, rows):
+    """One multi-row INSERT per page of rows (psycopg2)."""
+    from psycopg2.extras import execute_values
+
+    execute_values(
+        cursor,
+        f"INSERT INTO {table} ({', '.join(columns)}) VALUES %s ON CONFLICT DO NOTHING",
+        rows,
+        page_size=500,
+    )
+
+
+class WriteBehindWriter:
+    def __init__(self, pool, spool_path, tables=TABLES, maxsize=10000, batch_size=200,
+                 flush_interval=1.0, put_timeout=0.05, retry_interval=5.0, insert=execute_values_insert):
+        self.pool = pool
+        self.spool_path = spool_path
+        self.tables = tables
+        self.maxsize = maxsize
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.retry_interval = retry_interval
+        self.insert = insert
+
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._spool_lock = threading.Lock()
+        self._start_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self._retry_at = 0.0
+        self._closed = False
+
+        # Counters
+        self.submitted = 0
+        self.written = 0
+        self.batches = 0
+        self.spilled = 0
+        self.spooled = 0
+        self.replayed = 0
+        self.failures = 0
+        self.last_error = None
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._start_lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self._pid is not None:
+                # Forked after the parent started a writer: that thread and its
+                # queued rows don't exist here
+                self._queue = queue.Queue(maxsize=self.maxsize)
+            self._pid = os.getpid()
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name="attempt-writer", daemon=True)
+            self._thread.start()
+
+    def submit(self, table, row):
+        """Queue one row (a dict keyed by column) for the next batch; never raises."""
+        if self._closed:
+            self._append_spool([(table, row)])
+            return
+        self._ensure_started()
+        self.submitted += 1
+        try:
+            self._queue.put((table, row), timeout=self.put_timeout)
+        except queue.Full:
+            self.spilled += 1
+            self._append_spool([(table, row)])
+
+    def _take_batch(self):
+        records = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(records) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                records.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return records
+
+    def _run(self):
+        while not self._stop.is_set():
+            records = self._take_batch()
+            if records:
+                self._flush(records)
+            elif time.monotonic() >= self._retry_at:
+                self._replay_spool()
+
+    def _write(self, records):
+        grouped = {}
+        for table, row in records:
+            grouped.setdefault(table, []).append(row)
+        conn = self.pool.getconn()
+        close = False
+        try:
+            with conn.cursor() as cursor:
+                for table, rows in grouped.items():
+                    columns = self.tables[table]
+                    self.insert(cursor, table, columns, [tuple(row.get(c) for c in columns) for row in rows])
+            conn.commit()
+        except Exception:
+            close = True
+            raise
+        finally:
+            self.pool.putconn(conn, close=close)
+
+    def _flush(self, records):
+        if time.monotonic() < self._retry_at:
+            self._append_spool(records)
+            return False
+        try:
+            self._write(records)
+        except Exception as e:
+            self.failures += 1
+            self.last_error = str(e)
+            self._retry_at = time.monotonic() + self.retry_interval
+            print(f"❌ Could not write {len(records)} attempt rows, spooling: {e}")
+            self._append_spool(records)
+            return False
+        self.written += len(records)
+        self.batches += 1
+        return True
+
+    @contextmanager
+    def _locked_spool(self):
+        """Exclusive access to the spool file across threads and worker processes."""
+        with self._spool_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self.spool_path + ".lock", "a") as lock:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+                yield  # closing the file releases the flock
+
+    @staticmethod
+    def _claim(f):
+        """Try to flock an open replay file; False if a live process is replaying it."""
+        if fcntl is None:
+            return True
+        try:
+            fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def _orphaned_replays(self):
+        """Open, flocked handles on replay files whose worker died mid-replay, oldest first."""
+        paths = glob.glob(glob.escape(self.spool_path) + ".*.replay")
+        orphans = []
+        for path in sorted(paths, key=lambda p: os.path.getmtime(p) if os.path.exists(p) else 0):
+            try:
+                f = open(path, "r+", encoding="utf-8")
+            except FileNotFoundError:
+                continue
+            if self._claim(f):
+                orphans.append(f)
+            else:
+                f.close()
+        return orphans
+
+    def _append_spool(self, records):
+        lines = "".join(json.dumps({"table": table, "row": row}, default=str) + "\n" for table, row in records)
+        try:
+            with self._locked_spool():
+                with open(self.spool_path, "a", encoding="utf-8") as f:
+                    f.write(lines)
+                    f.flush()
+                    os.fsync(f.fileno())
+            self.spooled += len(records)
+        except OSError as e:
+            self.last_error = str(e)
+            print(f"❌ Could not spool {len(records)} attempt rows, dropping them: {e}")
+
+    def _take_spool(self):
+        """Move the spool and any orphaned replay files into one flocked replay file.
+
+        Returns (path, open handle) or None when there is nothing to replay.
+        """
+        replaying = f"{self.spool_path}.{os.getpid()}.{time.time_ns()}.replay"
+        with self._locked_spool():
+            orphans = self._orphaned_replays()
+            if not orphans:
+                try:
+                    os.replace(self.spool_path, replaying)
+                except FileNotFoundError:
+                    return None
+                f = open(replaying, "r+", encoding="utf-8")
+                self._claim(f)
+                return replaying, f
+
+            # Orphans are older than the live spool, so they go first
+            sources = orphans
+            if os.path.exists(self.spool_path):
+                sources.append(open(self.spool_path, encoding="utf-8"))
+            f = open(replaying, "w+", encoding="utf-8")
+            self._claim(f)
+            for source in sources:
+                with source:
+                    text = source.read()
+                    if text and not text.endswith("\n"):
+                        text += "\n"  # keep a line cut short by a crash from swallowing the next one
+                    f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+            for source in sources:
+                os.remove(source.name)
+            return replaying, f
+
+    def _replay_spool(self):
+        """Write spooled rows back once the database is reachable again."""
+        if not os.path.exists(self.spool_path) and not glob.glob(glob.escape(self.spool_path) + ".*.replay"):
+            return
+        taken = self._take_spool()
+        if taken is None:
+            return
+        replaying, f = taken
+        with f:
+            f.seek(0)
+            records = []
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except ValueError:
+                    continue  # a line cut short by a crash mid-append
+                if entry.get("table") in self.tables:
+                    records.append((entry["table"], entry["row"]))
+            for start in range(0, len(records), self.batch_size):
+                batch = records[start:start + self.batch_size]
+                if not self._flush(batch):
+                    # _flush spooled this batch; put the rest back behind it
+                    self._append_spool(records[start + self.batch_size:])
+                    break
+                self.replayed += len(batch)
+            # Removed while still flocked, so no other worker can claim it meanwhile
+            os.remove(replaying)
+
+    def flush(self):
+        """Write everything queued so far from the calling thread."""
+        records = []
+        while True:
+            try:
+                records.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        for start in range(0, len(records), self.batch_size):
+            self._flush(records[start:start + self.batch_size])
+
+    def close(self, timeout=10.0):
+        """Stop the writer thread and flush what's left; rows that can't be written are spooled."""
+        if self._closed:
+            return
+        self._closed = True
+        self._stop.set()
+        if self._thread is not None and self._pid == os.getpid():
+            self._thread.join(timeout)
+        self._retry_at = 0.0
+        self.flush()
+
+    def register_atexit(self):
+        atexit.register(self.close)
+        return self
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "maxsize": self.maxsize,
+            "submitted": self.submitted,
+            "written": self.written,
+            "batches": self.batches,
+            "spilled": self.spilled,
+            "spooled": self.spooled,
+            "replayed": self.replayed,
+            "failures": self.failures,
+            "spool_bytes": os.path.getsize(self.spool_path) if os.path.exists(self.spool_path) else 0,
+            "last_error": self.last_error,
+        }
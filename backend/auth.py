@@ -0,0 +1,135 @@
+"""Password hashing and signed, stateless session tokens.
+
+/login issues a token that carries the user id, username and grade, signed
+with SESSION_SECRET. Later calls such as /get-questions check the signature
+and age in memory instead of looking the user up again. Each token also has a
+random id. /logout writes that id to the revoked_sessions table. Every worker
+keeps the set of revoked ids in a RevocationCache refreshed at most once per
+TTL, so revocation costs one query per worker per TTL, not one per request.
+
+Passwords are hashed with werkzeug. Rows created before hashing still hold
+plaintext; they are accepted once and rehashed on that login.
+"""
+import hmac
+import secrets
+import threading
+import time
+
+from itsdangerous import BadSignature, SignatureExpired, URLSafeTimedSerializer
+from werkzeug.security import check_password_hash, generate_password_hash
+
+HASH_METHODS = ("scrypt", "pbkdf2")
+HEX_DIGITS = frozenset("0123456789abcdef")
+
+
+def hash_password(password, method=None):
+    if method:
+        return generate_password_hash(password, method=method)
+    return generate_password_hash(password)
+
+
+def is_password_hash(stored):
+    """True if ``stored`` parses as a werkzeug hash ("method:params$salt$hexdigest")."""
+    parts = stored.split("$", 2)
+    if len(parts) != 3 or not parts[1] or not parts[2]:
+        return False
+    method, digest = parts[0], parts[2]
+    return method.split(":", 1)[0] in HASH_METHODS and set(digest) <= HEX_DIGITS
+
+
+def verify_password(stored, password):
+    """(matches, needs_rehash); legacy plaintext rows match once and need a rehash."""
+    if is_password_hash(stored):
+        try:
+            return check_password_hash(stored, password), False
+        except ValueError:
+            pass  # e.g. unsupported hash parameters; treat the row as plaintext
+    matches = hmac.compare_digest(stored.encode("utf-8"), password.encode("utf-8"))
+    return matches, matches
+
+
+class SessionError(Exception):
+    """Missing, malformed, expired or revoked session token."""
+
+
+class RevocationCache:
+    """Revoked token ids from ``loader()``, reloaded at most every ``ttl`` seconds.
+
+    Ids revoked in this process apply immediately; other workers see them after
+    their next reload. If a reload fails, the previous set is kept.
+    """
+
+    def __init__(self, loader, ttl=30.0):
+        self.loader = loader
+        self.ttl = ttl
+        self._revoked = frozenset()
+        self._local = set()
+        self._loaded_at = None
+        self._lock = threading.Lock()
+        self.reloads = 0
+        self.reload_errors = 0
+
+    def _refresh(self):
+        if not self._lock.acquire(blocking=self._loaded_at is None):
+            return  # another thread is reloading; use the current set meanwhile
+        try:
+            if self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl:
+                return
+            try:
+                self._revoked = frozenset(self.loader())
+                self.reloads += 1
+            except Exception as e:
+                self.reload_errors += 1
+                print(f"❌ Could not load revoked sessions: {e}")
+            self._loaded_at = time.monotonic()
+        finally:
+            self._lock.release()
+
+    def is_revoked(self, token_id):
+        if token_id in self._local:
+            return True
+        if self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl:
+            self._refresh()
+        return token_id in self._revoked
+
+    def add(self, token_id):
+        self._local.add(token_id)
+
+    def stats(self):
+        return {
+            "revoked": len(self._revoked | self._local),
+            "ttl": self.ttl,
+            "reloads": self.reloads,
+            "reload_errors": self.reload_errors,
+        }
+
+
+class SessionTokens:
+    def __init__(self, secret, max_age=12 * 3600, revocations=None):
+        self.max_age = max_age
+        self.revocations = revocations
+        self._serializer = URLSafeTimedSerializer(secret, salt="session")
+
+    def issue(self, user_id, username, grade):
+        return self._serializer.dumps({
+            "uid": user_id, "u": username, "g": grade, "jti": secrets.token_urlsafe(12),
+        })
+
+    def verify(self, token):
+        """The token's claims ({"uid", "u", "g", "jti"}); raises SessionError."""
+        if not token:
+            raise SessionError("Missing session token")
+        try:
+            claims = self._serializer.loads(token, max_age=self.max_age)
+        except SignatureExpired:
+            raise SessionError("Session expired, please log in again")
+        except BadSignature:
+            raise SessionError("Invalid session token")
+        if self.revocations is not None and self.revocations.is_revoked(claims.get("jti")):
+            raise SessionError("Session has been logged out")
+        return claims
+
+    def expires_at(self, token):
+        """Epoch seconds when a valid token stops being accepted."""
+        _, issued = self._serializer.loads(token, max_age=self.max_age, return_timestamp=True)
+        return issued.timestamp() + self.max_age
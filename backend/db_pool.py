@@ -0,0 +1,229 @@
+"""Bounded, thread-safe PostgreSQL connection pool.
+
+Connections are opened lazily up to ``maxconn`` and handed back to the pool
+instead of being closed, so a request only pays the TCP/auth handshake when the
+pool has to grow. Callers that find the pool exhausted wait (up to ``timeout``
+seconds) for a connection to be returned.
+"""
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import OperationalError
+
+
+class PoolTimeout(OperationalError):
+    """Raised when no connection became available within the checkout timeout."""
+
+
+class ConnectionPool:
+    def __init__(self, db_config, minconn=0, maxconn=10, timeout=10.0,
+                 health_check_interval=30.0, connect=None):
+        self.db_config = db_config
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.health_check_interval = health_check_interval
+        self._connect = connect or (lambda: psycopg2.connect(**self.db_config))
+
+        self._lock = threading.Condition()
+        self._idle = deque()  # (conn, returned_at)
+        self._in_use = set()
+        self._opening = 0
+
+        # Counters
+        self.checkouts = 0
+        self.waits = 0
+        self.timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        self.connections_opened = 0
+        self.connections_discarded = 0
+        self.last_error = None
+
+    @property
+    def size(self):
+        return len(self._idle) + len(self._in_use) + self._opening
+
+    def _open(self):
+        try:
+            conn = self._connect()
+        except Exception as e:
+            self.last_error = str(e)
+            raise
+        self.last_error = None
+        self.connections_opened += 1
+        return conn
+
+    def _discard(self, conn):
+        self.connections_discarded += 1
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _is_healthy(self, conn, returned_at):
+        if conn.closed:
+            return False
+        if time.monotonic() - returned_at < self.health_check_interval:
+            return True
+        try:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except Exception:
+            return False
+
+    def warm_up(self):
+        """Open ``minconn`` connections ahead of the first request."""
+        with self._lock:
+            missing = self.minconn - self.size
+            self._opening += max(missing, 0)
+        for _ in range(max(missing, 0)):
+            try:
+                conn = self._open()
+            except Exception:
+                with self._lock:
+                    self._opening -= 1
+                    self._lock.notify()
+                raise
+            with self._lock:
+                self._opening -= 1
+                self._idle.append((conn, time.monotonic()))
+                self._lock.notify()
+
+    def getconn(self, timeout=None):
+        """Borrow a connection, waiting for one to be returned if the pool is full."""
+        timeout = self.timeout if timeout is None else timeout
+        started = time.monotonic()
+        deadline = started + timeout
+        waited = False
+
+        with self._lock:
+            while True:
+                if self._idle:
+                    conn, returned_at = self._idle.pop()
+                    self._in_use.add(conn)
+                    break
+                if self.size < self.maxconn:
+                    self._opening += 1
+                    conn = None
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.timeouts += 1
+                    raise PoolTimeout(
+                        f"No database connection available after {timeout:.1f}s "
+                        f"({len(self._in_use)}/{self.maxconn} in use)"
+                    )
+                waited = True
+                self._lock.wait(remaining)
+
+            wait_seconds = time.monotonic() - started
+            self.checkouts += 1
+            if waited:
+                self.waits += 1
+            self.total_wait_seconds += wait_seconds
+            self.max_wait_seconds = max(self.max_wait_seconds, wait_seconds)
+
+        if conn is None:
+            try:
+                conn = self._open()
+            except Exception:
+                with self._lock:
+                    self._opening -= 1
+                    self._lock.notify()
+                raise
+            with self._lock:
+                self._opening -= 1
+                self._in_use.add(conn)
+            return conn
+
+        # Health check outside the lock; replace a dead connection transparently
+        if not self._is_healthy(conn, returned_at):
+            with self._lock:
+                self._in_use.discard(conn)
+                self.connections_discarded += 1
+            try:
+                conn.close()
+            except Exception:
+                pass
+            try:
+                fresh = self._open()
+            except Exception:
+                with self._lock:
+                    self._lock.notify()
+                raise
+            with self._lock:
+                self._in_use.add(fresh)
+            return fresh
+
+        return conn
+
+    def putconn(self, conn, close=False):
+        """Return a borrowed connection to the pool."""
+        if not close and not conn.closed:
+            try:
+                # Never hand a connection with an open transaction to the next request
+                conn.rollback()
+            except Exception:
+                close = True
+
+        with self._lock:
+            self._in_use.discard(conn)
+            if close or conn.closed or self.size >= self.maxconn:
+                self.connections_discarded += 1
+                discard = True
+            else:
+                self._idle.append((conn, time.monotonic()))
+                discard = False
+            self._lock.notify()
+
+        if discard:
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+    def resize(self, maxconn, minconn=None):
+        """Change the pool bounds; surplus idle connections are closed immediately."""
+        surplus = []
+        with self._lock:
+            self.maxconn = maxconn
+            if minconn is not None:
+                self.minconn = minconn
+            while self._idle and self.size > self.maxconn:
+                surplus.append(self._idle.popleft()[0])
+            self._lock.notify_all()
+        for conn in surplus:
+            self._discard(conn)
+
+    def closeall(self):
+        with self._lock:
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+        for conn in idle:
+            self._discard(conn)
+
+    def stats(self):
+        """Snapshot of pool state; never opens a connection."""
+        with self._lock:
+            in_use = len(self._in_use)
+            return {
+                "size": self.size,
+                "in_use": in_use,
+                "idle": len(self._idle),
+                "minconn": self.minconn,
+                "maxconn": self.maxconn,
+                "utilization": round(in_use / self.maxconn, 3) if self.maxconn else 0.0,
+                "checkouts": self.checkouts,
+                "waits": self.waits,
+                "timeouts": self.timeouts,
+                "avg_wait_ms": round(1000 * self.total_wait_seconds / self.checkouts, 3) if self.checkouts else 0.0,
+                "max_wait_ms": round(1000 * self.max_wait_seconds, 3),
+                "connections_opened": self.connections_opened,
+                "connections_discarded": self.connections_discarded,
+                "last_error": self.last_error,
+            }
@@ -0,0 +1,231 @@
+"""Answer embeddings for the semantic scoring mode (SCORING_MODE=blended).
+
+Ideal-answer vectors are precomputed per grade bank into
+data/embeddings/grade<N>.<encoder>.npy, with a JSON sidecar that maps answer
+text to row. The matrices are opened with ``mmap_mode="r"``, so every worker
+shares the same page-cache copy. Student answers for a test are encoded in one
+batch and compared with a single vectorized row-wise dot product (vectors are
+L2-normalized, so that is the cosine).
+
+Encoders are pluggable through get_encoder():
+
+* "hashing" (default) - hashed character 3-5-grams, dependency-free and
+  deterministic, robust to word order and small spelling changes;
+* "sentence-transformers:<model>" - a real sentence embedding model, when that
+  optional package is installed.
+
+Build the store ahead of time with:
+
+    python backend/embedding_store.py [--encoder hashing]
+"""
+import json
+import math
+import os
+import re
+import zlib
+
+import numpy as np
+
+from keyword_index import DEFAULT_DATA_DIR, bank_files
+
+EMBEDDINGS_DIRNAME = "embeddings"
+STORE_VERSION = 1
+_NON_WORD_RE = re.compile(r"[^a-z0-9]+")
+
+
+class HashingEncoder:
+    """Signed feature hashing of character n-grams, sublinear TF, L2-normalized."""
+
+    def __init__(self, dim=1024, ngram_range=(3, 5)):
+        self.dim = dim
+        self.ngram_range = ngram_range
+        self.name = f"hashing-{ngram_range[0]}-{ngram_range[1]}-{dim}"
+
+    def _grams(self, text):
+        text = f" {_NON_WORD_RE.sub(' ', text.lower()).strip()} "
+        counts = {}
+        low, high = self.ngram_range
+        for n in range(low, high + 1):
+            for i in range(len(text) - n + 1):
+                gram = text[i:i + n]
+                counts[gram] = counts.get(gram, 0) + 1
+        return counts
+
+    def encode(self, texts):
+        texts = list(texts)
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            vector = matrix[row]
+            for gram, count in self._grams(text).items():
+                h = zlib.crc32(gram.encode("utf-8"))
+                weight = 1.0 + math.log(count)
+                vector[h % self.dim] += weight if h & 0x80000000 else -weight
+        return normalize_rows(matrix)
+
+
+class SentenceTransformerEncoder:
+    def __init__(self, model_name="all-MiniLM-L6-v2"):
+        from sentence_transformers import SentenceTransformer
+
+        self.model = SentenceTransformer(model_name)
+        self.dim = self.model.get_sentence_embedding_dimension()
+        self.name = "st-" + model_name.replace("/", "_")
+
+    def encode(self, texts):
+        vectors = self.model.encode(list(texts), batch_size=64, convert_to_numpy=True)
+        return normalize_rows(vectors.astype(np.float32))
+
+
+def get_encoder(spec="hashing"):
+    """Encoder for a spec like "hashing", "hashing:512" or "sentence-transformers:all-MiniLM-L6-v2"."""
+    kind, _, arg = (spec or "hashing").partition(":")
+    if kind == "hashing":
+        return HashingEncoder(dim=int(arg) if arg else 1024)
+    if kind == "sentence-transformers":
+        return SentenceTransformerEncoder(arg or "all-MiniLM-L6-v2")
+    raise ValueError(f"Unknown encoder: {spec}")
+
+
+def normalize_rows(matrix):
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def bank_answers(path):
+    import csv
+
+    with open(path, newline='', encoding='utf-8') as f:
+        answers = [row.get("Answer") or "" for row in csv.DictReader(f)]
+    return list(dict.fromkeys(a for a in answers if a.strip()))
+
+
+class EmbeddingStore:
+    """Memory-mapped ideal-answer vectors for every grade bank, plus an encoder for the rest."""
+
+    def __init__(self, encoder, data_dir=DEFAULT_DATA_DIR):
+        self.encoder = encoder
+        self.data_dir = data_dir
+        self.directory = os.path.join(data_dir, EMBEDDINGS_DIRNAME)
+        self._matrices = []
+        self._rows = {}  # answer text -> (matrix number, row)
+
+    def __len__(self):
+        return len(self._rows)
+
+    def _paths(self, bank_path):
+        stem = os.path.splitext(os.path.basename(bank_path))[0].replace("_v2", "")
+        base = os.path.join(self.directory, f"{stem}.{self.encoder.name}")
+        return base + ".npy", base + ".json"
+
+    def _fresh(self, bank_path, matrix_path, meta_path):
+        if not (os.path.exists(matrix_path) and os.path.exists(meta_path)):
+            return False
+        return os.path.getmtime(bank_path) <= min(os.path.getmtime(matrix_path), os.path.getmtime(meta_path))
+
+    def build_bank(self, bank_path):
+        """Encode one bank's ideal answers and save them; returns the file paths."""
+        matrix_path, meta_path = self._paths(bank_path)
+        answers = bank_answers(bank_path)
+        matrix = self.encoder.encode(answers)
+        os.makedirs(self.directory, exist_ok=True)
+        np.save(matrix_path + ".tmp.npy", matrix)
+        os.replace(matrix_path + ".tmp.npy", matrix_path)
+        with open(meta_path + ".tmp", "w", encoding="utf-8") as f:
+            json.dump({"version": STORE_VERSION, "encoder": self.encoder.name, "dim": int(matrix.shape[1]),
+                       "source": os.path.basename(bank_path), "answers": answers}, f, ensure_ascii=False)
+        os.replace(meta_path + ".tmp", meta_path)
+        return matrix_path, meta_path
+
+    def load(self, build_missing=True):
+        """Map every bank's vectors, (re)building stale files when allowed."""
+        self._matrices, self._rows = [], {}
+        for bank_path in bank_files(self.data_dir):
+            matrix_path, meta_path = self._paths(bank_path)
+            if not self._fresh(bank_path, matrix_path, meta_path):
+                if not build_missing:
+                    continue
+                try:
+                    self.build_bank(bank_path)
+                except OSError as e:
+                    print(f"Could not save embeddings for {bank_path}: {e}")
+                    answers = bank_answers(bank_path)
+                    self._add(self.encoder.encode(answers), answers)
+                    continue
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != STORE_VERSION or meta.get("encoder") != self.encoder.name:
+                continue
+            self._add(np.load(matrix_path, mmap_mode="r"), meta["answers"])
+        return self
+
+    def _add(self, matrix, answers):
+        number = len(self._matrices)
+        self._matrices.append(matrix)
+        for row, answer in enumerate(answers):
+            self._rows.setdefault(answer, (number, row))
+
+    def ideal_vectors(self, ideal_answers):
+        """(n, dim) vectors; answers outside the banks are encoded on the fly."""
+        vectors = np.empty((len(ideal_answers), self.encoder.dim), dtype=np.float32)
+        missing = []
+        for i, answer in enumerate(ideal_answers):
+            location = self._rows.get(answer)
+            if location is None:
+                missing.append(i)
+            else:
+                number, row = location
+                vectors[i] = self._matrices[number][row]
+        if missing:
+            vectors[missing] = self.encoder.encode([ideal_answers[i] for i in missing])
+        return vectors
+
+    def similarities(self, ideal_answers, student_answers):
+        """Cosine similarity per pair, one batch encode and one vectorized product."""
+        if not ideal_answers:
+            return np.zeros(0, dtype=np.float32)
+        ideal = self.ideal_vectors(list(ideal_answers))
+        student = self.encoder.encode(student_answers)
+        return np.einsum("ij,ij->i", ideal, student)
+
+
+class SemanticScorer:
+    """Blends cosine similarity into the lexical 0-2 score.
+
+    Cosine is mapped linearly from [low, high] onto 0-2 and mixed in with
+    ``weight``; answers the lexical precheck already settles (empty, correct)
+    are left alone by the caller.
+    """
+
+    def __init__(self, store, weight=0.5, low=0.2, high=0.8):
+        self.store = store
+        self.weight = weight
+        self.low = low
+        self.high = high
+
+    def similarities(self, ideal_answers, student_answers):
+        return self.store.similarities(ideal_answers, student_answers)
+
+    def semantic_score(self, cosine):
+        scaled = (cosine - self.low) / (self.high - self.low)
+        return 2.0 * min(1.0, max(0.0, scaled))
+
+    def blend(self, lexical_score, cosine):
+        blended = (1 - self.weight) * lexical_score + self.weight * self.semantic_score(float(cosine))
+        return round(min(2.0, max(0.0, blended)), 1)
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Precompute ideal-answer embeddings for every grade bank.")
+    parser.add_argument("--encoder", default="hashing", help='"hashing", "hashing:<dim>" or "sentence-transformers:<model>"')
+    args = parser.parse_args()
+
+    store = EmbeddingStore(get_encoder(args.encoder))
+    started = time.perf_counter()
+    for bank_path in bank_files(store.data_dir):
+        matrix_path, _ = store.build_bank(bank_path)
+        print(f"✓ {os.path.basename(bank_path)} -> {matrix_path}")
+    print(f"✓ Embedded {len(store.load(build_missing=False))} ideal answers in {time.perf_counter() - started:.2f}s")
@@ -0,0 +1,87 @@
+"""Helpers for the batch feedback endpoint.
+
+Items that still need the model are de-duplicated, and short ones can be
+packed several to a prompt: the model answers each under a numbered marker
+([[1]], [[2]], ...) and the reply is split back per item. Anything the split
+can't recover is generated individually, so packing never loses an item.
+
+Token counts are estimated from characters (~4 per token), which is close
+enough to keep packed prompts inside the budget.
+"""
+import re
+
+CHARS_PER_TOKEN = 4
+MARKER_RE = re.compile(r"\[\[\s*(\d+)\s*\]\]")
+
+
+def estimate_tokens(*texts):
+    return sum(len(text) for text in texts) // CHARS_PER_TOKEN + 1
+
+
+def item_tokens(item):
+    return estimate_tokens(item["question"], item["ideal_answer"], item["student_answer"])
+
+
+def pack_items(items, token_budget=1200, max_items=5, short_item_tokens=200):
+    """Group items into packs whose estimated size fits ``token_budget``.
+
+    Long items always travel alone. Returns a list of lists, preserving order.
+    """
+    packs = []
+    current, used = [], 0
+    for item in items:
+        tokens = item_tokens(item)
+        if tokens > short_item_tokens:
+            packs.append([item])
+            continue
+        if current and (used + tokens > token_budget or len(current) >= max_items):
+            packs.append(current)
+            current, used = [], 0
+        current.append(item)
+        used += tokens
+    if current:
+        packs.append(current)
+    return packs
+
+
+def build_packed_prompt(items, missing_keywords):
+    """One prompt covering several answers; ``missing_keywords`` is parallel to ``items``."""
+    blocks = []
+    for number, (item, missing) in enumerate(zip(items, missing_keywords), start=1):
+        hint = ""
+        if missing:
+            hint = "Hint for the teacher: the student may have missed one or more important scientific ideas.\n"
+        blocks.append(
+            f"[[{number}]]\n"
+            f"Question: {item['question']}\n"
+            f"Ideal Answer: {item['ideal_answer']}\n"
+            f"Student Answer: {item['student_answer']}\n"
+            f"{hint}"
+        )
+
+    return (
+        f"You are a supportive but strict middle school science teacher and you are giving feedback to a student "
+        f"on {len(items)} answers.\n\n"
+        + "\n".join(blocks)
+        + "\nFor each answer, write helpful, constructive feedback for the student:\n"
+        "- If the answer is same as or very close to the ideal answer or it has all the keywords, say it's correct and donot give any other furthur explanation.\n"
+        "- If they missed something important, just hint at it — do not give the keyword.This is very important donot give the keyword away but at the same time try your best at hinting.\n"
+        "- If there's a spelling mistake in the important keywords only, suggest checking it without revealing it.This is important to check.\n"
+        "- Do NOT include internal thoughts or use <think> tags.\n"
+        "- If the answer is completely wrong and not even close, don't hesitate to say it.\n"
+        "- Be friendly and encouraging.\n\n"
+        "Start each feedback with its marker on its own line, exactly like [[1]], and write nothing else outside the markers."
+    )
+
+
+def split_packed_response(text, count):
+    """Feedback per item from a packed reply; missing or empty sections are None."""
+    sections = [None] * count
+    parts = MARKER_RE.split(text)
+    # parts = [preamble, number, body, number, body, ...]
+    for number, body in zip(parts[1::2], parts[2::2]):
+        index = int(number) - 1
+        body = body.strip()
+        if 0 <= index < count and body and sections[index] is None:
+            sections[index] = body
+    return sections
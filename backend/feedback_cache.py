@@ -0,0 +1,256 @@
+"""Two-tier cache for generated feedback.
+
+Keys combine the question, the ideal answer and a normalized student answer
+(case, whitespace and punctuation folded), so "Photosynthesis." and
+" photosynthesis" share one LLM completion. The first tier is an in-process
+LRU with a TTL; the optional shared tier lives in Postgres or a local SQLite
+file so that workers and restarts can reuse each other's results.
+"""
+import hashlib
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+_PUNCTUATION = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_answer(text):
+    text = _PUNCTUATION.sub(" ", (text or "").lower())
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+def feedback_cache_key(question, ideal_answer, student_answer):
+    raw = "\x1f".join([
+        (question or "").strip(),
+        (ideal_answer or "").strip(),
+        normalize_answer(student_answer),
+    ])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class LRUCache:
+    """Thread-safe LRU with a per-entry TTL."""
+
+    def __init__(self, maxsize=1024, ttl=86400):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._data)
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + self.ttl)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
+class SQLiteFeedbackStore:
+    """Shared tier in a local SQLite file (one per host/volume)."""
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, path, ttl=86400, max_rows=100000):
+        self.path = path
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._local = threading.local()
+        self._writes = 0
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS feedback_cache ("
+                "cache_key TEXT PRIMARY KEY, feedback TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS feedback_cache_created ON feedback_cache (created_at)")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, key):
+        row = self._connect().execute(
+            "SELECT feedback FROM feedback_cache WHERE cache_key = ? AND created_at >= ?",
+            (key, time.time() - self.ttl),
+        ).fetchone()
+        return row[0] if row else None
+
+    def set(self, key, value):
+        conn = self._connect()
+        with conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO feedback_cache (cache_key, feedback, created_at) VALUES (?, ?, ?)",
+                (key, value, time.time()),
+            )
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                self._prune(conn)
+
+    def _prune(self, conn):
+        conn.execute("DELETE FROM feedback_cache WHERE created_at < ?", (time.time() - self.ttl,))
+        conn.execute(
+            "DELETE FROM feedback_cache WHERE cache_key IN ("
+            "SELECT cache_key FROM feedback_cache ORDER BY created_at DESC LIMIT -1 OFFSET ?)",
+            (self.max_rows,),
+        )
+
+
+class PostgresFeedbackStore:
+    """Shared tier in the application database, borrowing from the connection pool."""
+
+    PRUNE_EVERY = 100
+
+    def __init__(self, pool, ttl=86400, max_rows=100000):
+        self.pool = pool
+        self.ttl = ttl
+        self.max_rows = max_rows
+        self._writes = 0
+        self._table_ready = False
+
+    def _execute(self, query, params=(), fetch=False):
+        conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cursor:
+                if not self._table_ready:
+                    cursor.execute("""
+                        CREATE TABLE IF NOT EXISTS feedback_cache (
+                            cache_key CHAR(64) PRIMARY KEY,
+                            feedback TEXT NOT NULL,
+                            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+                        );
+                        CREATE INDEX IF NOT EXISTS feedback_cache_created ON feedback_cache (created_at);
+                    """)
+                    # Committed on its own, so a failing query below can't roll the table back
+                    conn.commit()
+                    self._table_ready = True
+                cursor.execute(query, params)
+                result = cursor.fetchone() if fetch else None
+            conn.commit()
+            return result
+        finally:
+            self.pool.putconn(conn)
+
+    def get(self, key):
+        row = self._execute(
+            "SELECT feedback FROM feedback_cache "
+            "WHERE cache_key = %s AND created_at >= NOW() - make_interval(secs => %s)",
+            (key, self.ttl),
+            fetch=True,
+        )
+        return row[0] if row else None
+
+    def set(self, key, value):
+        self._execute(
+            "INSERT INTO feedback_cache (cache_key, feedback) VALUES (%s, %s) "
+            "ON CONFLICT (cache_key) DO UPDATE SET feedback = EXCLUDED.feedback, created_at = CURRENT_TIMESTAMP",
+            (key, value),
+        )
+        self._writes += 1
+        if self._writes % self.PRUNE_EVERY == 0:
+            self._execute(
+                "DELETE FROM feedback_cache WHERE created_at < NOW() - make_interval(secs => %s) "
+                "OR cache_key IN (SELECT cache_key FROM feedback_cache ORDER BY created_at DESC OFFSET %s)",
+                (self.ttl, self.max_rows),
+            )
+
+
+class FeedbackCache:
+    def __init__(self, maxsize=1024, ttl=86400, shared=None):
+        self.memory = LRUCache(maxsize=maxsize, ttl=ttl)
+        self.shared = shared
+        self._lock = threading.Lock()
+        self.memory_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.shared_errors = 0
+
+    def get(self, question, ideal_answer, student_answer):
+        key = feedback_cache_key(question, ideal_answer, student_answer)
+        value = self.memory.get(key)
+        if value is not None:
+            self._count("memory_hits")
+            return value
+
+        if self.shared is not None:
+            try:
+                value = self.shared.get(key)
+            except Exception as e:
+                self._count("shared_errors")
+                print(f"❌ Feedback cache read error: {e}")
+                value = None
+            if value is not None:
+                self.memory.set(key, value)
+                self._count("shared_hits")
+                return value
+
+        self._count("misses")
+        return None
+
+    def set(self, question, ideal_answer, student_answer, feedback):
+        key = feedback_cache_key(question, ideal_answer, student_answer)
+        self.memory.set(key, feedback)
+        if self.shared is not None:
+            try:
+                self.shared.set(key, feedback)
+            except Exception as e:
+                self._count("shared_errors")
+                print(f"❌ Feedback cache write error: {e}")
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def stats(self):
+        lookups = self.memory_hits + self.shared_hits + self.misses
+        return {
+            "size": len(self.memory),
+            "maxsize": self.memory.maxsize,
+            "evictions": self.memory.evictions,
+            "memory_hits": self.memory_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "shared_errors": self.shared_errors,
+            "hit_rate": round((self.memory_hits + self.shared_hits) / lookups, 3) if lookups else 0.0,
+            "shared_backend": type(self.shared).__name__ if self.shared is not None else None,
+        }
+
+
+def create_feedback_cache(backend, pool=None, maxsize=1024, ttl=86400, path=None, max_rows=100000):
+    """Build a cache for FEEDBACK_CACHE_BACKEND: "memory", "postgres" or "file"."""
+    shared = None
+    if backend == "postgres":
+        shared = PostgresFeedbackStore(pool, ttl=ttl, max_rows=max_rows)
+    elif backend == "file":
+        shared = SQLiteFeedbackStore(path or "feedback_cache.sqlite3", ttl=ttl, max_rows=max_rows)
+    elif backend not in ("memory", "", None):
+        raise ValueError(f"Unknown feedback cache backend: {backend}")
+    return FeedbackCache(maxsize=maxsize, ttl=ttl, shared=shared)
@@ -0,0 +1,245 @@
+"""Per-question fuzzy lookup over a keyword vocabulary.
+
+Keyword and spelling scoring ask, for every keyword word, whether any student
+word is at least 0.8 / 0.75 similar by SequenceMatcher.ratio(). Comparing all
+pairs is quadratic per answer. FuzzyIndex flips the question around: each
+student token is looked up once against the question's vocabulary and the
+result is memoized, so repeated tokens (very common across a class) cost a dict
+lookup.
+
+SequenceMatcher's ratio is not an edit distance, so a SymSpell delete
+neighbourhood or BK-tree could both miss and invent matches. The index instead
+prunes with exact upper bounds (length buckets, then real_quick_ratio and
+quick_ratio) and confirms with the real ratio, so results are identical to the
+pairwise loops. Check that keyword and spelling scores match the original
+nested loops on perturbed copies of the bundled grade 5-7 answers with:
+
+    python backend/fuzzy_index.py --verify
+"""
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+
+@lru_cache(maxsize=200000)
+def words_similar(a, b, threshold):
+    """True iff SequenceMatcher(None, a, b).ratio() >= threshold.
+
+    Memoized across answers and requests; cheap upper bounds reject most pairs
+    before the full ratio is computed.
+    """
+    if a == b:
+        return True
+    total = len(a) + len(b)
+    if not total:
+        return threshold <= 1.0
+    # ratio = 2*M/total and M can't exceed the shorter word
+    if 2.0 * min(len(a), len(b)) / total < threshold:
+        return False
+    matcher = SequenceMatcher(None, a, b)
+    if matcher.real_quick_ratio() < threshold or matcher.quick_ratio() < threshold:
+        return False
+    return matcher.ratio() >= threshold
+
+
+class FuzzyIndex:
+    """Vocabulary words bucketed by length, with memoized token lookups."""
+
+    MEMO_SIZE = 4096
+
+    def __init__(self, words):
+        self.words = tuple(dict.fromkeys(words))
+        self._by_length = {}
+        for word in self.words:
+            self._by_length.setdefault(len(word), []).append(word)
+        self._lengths = sorted(self._by_length)
+        self._memo = {}
+
+    def __len__(self):
+        return len(self.words)
+
+    def near(self, token, threshold):
+        """Vocabulary words w with SequenceMatcher(None, w, token).ratio() >= threshold."""
+        key = (token, threshold)
+        found = self._memo.get(key)
+        if found is not None:
+            return found
+
+        token_length = len(token)
+        matches = []
+        for length in self._lengths:
+            total = length + token_length
+            if total and 2.0 * min(length, token_length) / total < threshold:
+                continue
+            for word in self._by_length[length]:
+                if words_similar(word, token, threshold):
+                    matches.append(word)
+        found = frozenset(matches)
+
+        if len(self._memo) >= self.MEMO_SIZE:
+            self._memo.clear()
+        self._memo[key] = found
+        return found
+
+    def near_any(self, tokens, threshold):
+        """Union of near() over all tokens."""
+        matched = set()
+        for token in tokens:
+            matched |= self.near(token, threshold)
+        return matched
+
+
+def vocabulary(keyword_words):
+    """Words the scorers compare fuzzily: single-word keywords and 3+ letter keyword words."""
+    words = []
+    for words_in_keyword in keyword_words:
+        if len(words_in_keyword) == 1:
+            words.append(words_in_keyword[0])
+        words.extend(word for word in words_in_keyword if len(word) >= 3)
+    return words
+
+
+def reference_keyword_score(keywords, ideal_answer, student_answer):
+    """calculate_keyword_score as originally written, with nested SequenceMatcher loops."""
+    if not keywords:
+        return 1.0
+    student_answer_lower = student_answer.lower()
+    ideal_answer_lower = ideal_answer.lower()
+    if student_answer_lower.strip() == ideal_answer_lower.strip():
+        return 1.0
+    if SequenceMatcher(None, ideal_answer_lower, student_answer_lower).ratio() >= 0.8:
+        return 1.0
+
+    matched_keywords = 0
+    for keyword in keywords:
+        if keyword in student_answer_lower:
+            matched_keywords += 1
+            continue
+        keyword_words = keyword.split()
+        if len(keyword_words) > 1:
+            found_words = sum(1 for word in keyword_words if word in student_answer_lower)
+            if found_words >= len(keyword_words) * 0.7:
+                matched_keywords += 1
+        else:
+            for student_word in student_answer_lower.split():
+                if SequenceMatcher(None, keyword, student_word).ratio() >= 0.8:
+                    matched_keywords += 1
+                    break
+
+    coverage_ratio = matched_keywords / len(keywords)
+    if coverage_ratio >= 0.6:
+        return 1.0
+    elif coverage_ratio >= 0.3:
+        return 0.5
+    return 0.0
+
+
+def reference_spelling_score(keywords, ideal_answer, student_answer):
+    """calculate_spelling_score as originally written, with nested SequenceMatcher loops."""
+    if not keywords:
+        return 1.0
+    student_answer_lower = student_answer.lower()
+    ideal_answer_lower = ideal_answer.lower()
+    if student_answer_lower.strip() == ideal_answer_lower.strip():
+        return 1.0
+    if SequenceMatcher(None, ideal_answer_lower, student_answer_lower).ratio() >= 0.85:
+        return 1.0
+
+    student_words = set(student_answer_lower.split())
+    spelling_errors = 0
+    total_important_words = 0
+    for keyword in keywords:
+        for word in keyword.split():
+            if len(word) < 3:
+                continue
+            total_important_words += 1
+            if word in student_words:
+                continue
+            best_similarity = 0
+            for student_word in student_words:
+                if len(student_word) < 3:
+                    continue
+                best_similarity = max(best_similarity, SequenceMatcher(None, word, student_word).ratio())
+            if best_similarity < 0.75:
+                spelling_errors += 1
+
+    if total_important_words == 0:
+        return 1.0
+    error_ratio = spelling_errors / total_important_words
+    if error_ratio <= 0.15:
+        return 1.0
+    elif error_ratio <= 0.4:
+        return 0.5
+    return 0.0
+
+
+def perturbed_answers(ideal_answer, rng, count):
+    """Student-like variants of an ideal answer: dropped, reordered and misspelled words."""
+    words = ideal_answer.split()
+    variants = [ideal_answer.upper(), " ".join(words[: max(1, len(words) // 2)])]
+    while len(variants) < count:
+        kept = [word for word in words if rng.random() < 0.3 + 0.7 * rng.random()] or words[:1]
+        if rng.random() < 0.3:
+            rng.shuffle(kept)
+        tokens = []
+        for word in kept:
+            if len(word) > 3 and rng.random() < 0.4:
+                i = rng.randrange(len(word))
+                word = word[:i] + rng.choice("aeioustr") + word[i + 1:]
+            tokens.append(word)
+        variants.append(" ".join(tokens))
+    return variants
+
+
+def verify(answers, keyword_lookup, variants_per_answer=20, seed=0):
+    """Score perturbed answers with both the original loops and scoring_engine.
+
+    ``answers`` are ideal answers; ``keyword_lookup(ideal)`` returns their
+    KeywordEntry. Returns (mismatches, comparisons); each comparison is one
+    keyword or spelling score.
+    """
+    import random
+
+    from scoring_engine import KEYWORD_TOP_K, AnswerContext, keyword_score, spelling_score
+
+    rng = random.Random(seed)
+    mismatches = 0
+    checks = 0
+    for ideal_answer in answers:
+        entry = keyword_lookup(ideal_answer)
+        keywords = entry.top(KEYWORD_TOP_K)
+        for student_answer in perturbed_answers(ideal_answer, rng, variants_per_answer):
+            ctx = AnswerContext(ideal_answer, student_answer, lambda _: entry)
+            pairs = (
+                (reference_keyword_score(keywords, ideal_answer, student_answer), keyword_score(ctx)),
+                (reference_spelling_score(keywords, ideal_answer, student_answer), spelling_score(ctx)),
+            )
+            for expected, actual in pairs:
+                checks += 1
+                if expected != actual:
+                    mismatches += 1
+    return mismatches, checks
+
+
+if __name__ == "__main__":
+    import sys
+
+    from keyword_extractor import KeywordExtractor
+    from keyword_index import KeywordEntry, get_keyword_index, iter_bank_rows
+
+    if "--verify" not in sys.argv:
+        print("usage: python backend/fuzzy_index.py --verify")
+        sys.exit(2)
+
+    # spaCy is only loaded if the saved index is missing or stale; without it
+    # keywords fall back to the answer's first words, as extract_keywords does
+    extractor = KeywordExtractor()
+    index = get_keyword_index(extractor)
+
+    def lookup(ideal_answer):
+        return index.get(ideal_answer) or KeywordEntry(ideal_answer, extractor.extract(ideal_answer, top_k=10))
+
+    answers = list(dict.fromkeys(answer for _, answer in iter_bank_rows()))
+    mismatches, checks = verify(answers, lookup)
+    ok = checks > 0 and mismatches == 0
+    print(f"{'✓' if ok else '❌'} {len(answers)} answers, {checks} score comparisons, {mismatches} mismatches")
+    sys.exit(0 if ok else 1)
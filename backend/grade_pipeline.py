@@ -0,0 +1,226 @@
+"""Offline bulk grading and feedback for CSV answer files.
+
+Replaces the row-by-row notebook loops that produced feedback/*.csv:
+
+* the input is read in chunks of ``--chunk-size`` rows, so memory stays flat
+  however large the file is;
+* scores come from scoring_engine (the engine behind the app's
+  calculate_question_score), computed on a process pool;
+* feedback goes through app.generate_feedback (fast path, cache, single-flight,
+  admission and LLM failover included) with at most ``--concurrency`` requests
+  in flight;
+* every finished chunk is appended to the output and recorded in a checkpoint
+  file, so a rerun after a crash resumes at the first unfinished row.
+
+    python backend/grade_pipeline.py answers.csv -o graded.csv --feedback \\
+        --student-column student_answer_close --student-column student_answer_partial
+
+Each student column gets ``<column>_score`` and, with --feedback,
+``<column>_feedback`` output columns.
+"""
+import argparse
+import asyncio
+import csv
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import islice
+
+import scoring_engine
+from scoring_engine import AnswerContext
+
+_LOOKUP = None
+
+
+def init_worker():
+    """Load the keyword index prepared by the parent; workers never rebuild or write it."""
+    global _LOOKUP
+    if _LOOKUP is None:  # already inherited when the pool forks
+        _LOOKUP = scoring_engine.offline_keyword_lookup(build=False)
+
+
+def score_pairs(pairs):
+    """Scores for a list of (ideal_answer, student_answer) pairs; runs in a worker."""
+    if _LOOKUP is None:
+        init_worker()
+    return [scoring_engine.question_score(AnswerContext(ideal, student, _LOOKUP)) for ideal, student in pairs]
+
+
+def split(items, parts):
+    size = max(1, -(-len(items) // parts))
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+# --- checkpointing -----------------------------------------------------------
+
+def checkpoint_path(output_path):
+    return output_path + ".checkpoint"
+
+
+def input_signature(input_path):
+    stat = os.stat(input_path)
+    return {"input": os.path.abspath(input_path), "size": stat.st_size, "mtime": stat.st_mtime}
+
+
+def load_checkpoint(output_path, signature):
+    """Rows already written for this exact input, or None to start over."""
+    try:
+        with open(checkpoint_path(output_path), encoding="utf-8") as f:
+            state = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if state.get("signature") != signature or not os.path.exists(output_path):
+        return None
+    return state
+
+
+def save_checkpoint(output_path, signature, rows_done, output_bytes):
+    path = checkpoint_path(output_path)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"signature": signature, "rows_done": rows_done, "output_bytes": output_bytes}, f)
+    os.replace(tmp, path)
+
+
+# --- feedback ----------------------------------------------------------------
+
+async def feedback_for(app, semaphore, question, ideal_answer, student_answer):
+    if not student_answer:
+        return ""
+    async with semaphore:
+        while True:
+            try:
+                return await asyncio.to_thread(app.generate_feedback, question, ideal_answer, student_answer, "grade-pipeline")
+            except app.AdmissionRejected as e:
+                await asyncio.sleep(e.retry_after)
+
+
+async def chunk_feedback(app, semaphore, jobs):
+    return await asyncio.gather(*(feedback_for(app, semaphore, *job) for job in jobs))
+
+
+# --- pipeline ----------------------------------------------------------------
+
+def run(args):
+    signature = input_signature(args.input)
+    state = None if args.restart else load_checkpoint(args.output, signature)
+    rows_done = state["rows_done"] if state else 0
+
+    app = None
+    loop = semaphore = None
+    if args.feedback:
+        import app  # loads the model client, cache and keyword index
+        loop = asyncio.new_event_loop()
+        loop.set_default_executor(ThreadPoolExecutor(max_workers=args.concurrency))
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+    # Build (and save) a stale or missing keyword index once, before any worker starts
+    global _LOOKUP
+    _LOOKUP = scoring_engine.offline_keyword_lookup()
+
+    pool = None
+    if args.processes > 0:
+        pool = ProcessPoolExecutor(max_workers=args.processes, initializer=init_worker)
+
+    started = time.perf_counter()
+    processed = 0
+    try:
+        with open(args.input, newline="", encoding="utf-8") as src:
+            reader = csv.DictReader(src)
+            fieldnames = list(reader.fieldnames or [])
+            missing = [c for c in [args.ideal_column, *args.student_column] if c not in fieldnames]
+            if missing:
+                raise SystemExit(f"❌ Missing column(s) in {args.input}: {', '.join(missing)}")
+            for column in args.student_column:
+                fieldnames.append(f"{column}_score")
+                if args.feedback:
+                    fieldnames.append(f"{column}_feedback")
+
+            if state:
+                # Drop anything written after the last checkpoint, then skip finished rows
+                dst = open(args.output, "r+", newline="", encoding="utf-8")
+                dst.truncate(state["output_bytes"])
+                dst.seek(state["output_bytes"])
+                for _ in islice(reader, rows_done):
+                    pass
+                print(f"✓ Resuming {args.input} at row {rows_done}")
+            else:
+                dst = open(args.output, "w", newline="", encoding="utf-8")
+                rows_done = 0
+
+            with dst:
+                writer = csv.DictWriter(dst, fieldnames=fieldnames)
+                if not state:
+                    writer.writeheader()
+
+                while True:
+                    rows = list(islice(reader, args.chunk_size))
+                    if not rows:
+                        break
+
+                    for column in args.student_column:
+                        pairs = [(row[args.ideal_column] or "", row[column] or "") for row in rows]
+                        if pool is not None:
+                            scores = [s for part in pool.map(score_pairs, split(pairs, args.processes)) for s in part]
+                        else:
+                            scores = score_pairs(pairs)
+                        for row, score in zip(rows, scores):
+                            row[f"{column}_score"] = score
+
+                        if args.feedback:
+                            jobs = [(row.get(args.question_column) or "", row[args.ideal_column] or "", row[column] or "")
+                                    for row in rows]
+                            feedback = loop.run_until_complete(chunk_feedback(app, semaphore, jobs))
+                            for row, text in zip(rows, feedback):
+                                row[f"{column}_feedback"] = text
+
+                    writer.writerows(rows)
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                    rows_done += len(rows)
+                    processed += len(rows)
+                    save_checkpoint(args.output, signature, rows_done, dst.tell())
+
+                    elapsed = time.perf_counter() - started
+                    print(f"  {rows_done} rows done ({processed / elapsed:.1f} rows/sec)")
+    finally:
+        if pool is not None:
+            pool.shutdown()
+        if loop is not None:
+            loop.close()
+
+    elapsed = time.perf_counter() - started
+    rate = processed / elapsed if elapsed else 0.0
+    print(f"✓ Graded {processed} rows in {elapsed:.2f}s ({rate:.1f} rows/sec) -> {args.output}")
+    if not args.keep_checkpoint:
+        try:
+            os.remove(checkpoint_path(args.output))
+        except OSError:
+            pass
+    return processed
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input")
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--question-column", default="question")
+    parser.add_argument("--ideal-column", default="ideal_answer")
+    parser.add_argument("--student-column", action="append",
+                        help="column holding student answers (repeatable, default student_answer)")
+    parser.add_argument("--feedback", action="store_true", help="also generate LLM feedback")
+    parser.add_argument("--chunk-size", type=int, default=256)
+    parser.add_argument("--processes", type=int, default=os.cpu_count() or 1,
+                        help="scoring worker processes (0 scores in-process)")
+    parser.add_argument("--concurrency", type=int, default=8, help="feedback requests in flight")
+    parser.add_argument("--restart", action="store_true", help="ignore any checkpoint and start over")
+    parser.add_argument("--keep-checkpoint", action="store_true", help="keep the checkpoint after finishing")
+    args = parser.parse_args(argv)
+    args.student_column = args.student_column or ["student_answer"]
+    run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+"""Production entry point: preforked gunicorn workers sharing one loaded copy
+of the spaCy model, keyword index and question banks.
+
+    gunicorn -c backend/gunicorn.conf.py
+
+The parent imports the app and loads the read-only data once (preload_app +
+prepare_for_fork), then forks; workers share those pages copy-on-write.
+Workers are threaded because feedback requests spend most of their time
+waiting on the model.
+"""
+import multiprocessing
+import os
+
+BACKEND_DIR = os.path.abspath(os.path.dirname(__file__))
+
+chdir = BACKEND_DIR
+wsgi_app = "app:app"
+bind = f"0.0.0.0:{os.getenv('PORT', '8080')}"
+
+preload_app = True
+workers = int(os.getenv("WEB_CONCURRENCY", min(2 * multiprocessing.cpu_count() + 1, 4)))
+worker_class = "gthread"
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+# Upstream completions can take up to LLM_TIMEOUT (60 s by default)
+timeout = int(os.getenv("GUNICORN_TIMEOUT", 120))
+graceful_timeout = 30
+keepalive = 5
+
+accesslog = "-"
+errorlog = "-"
+
+
+def when_ready(server):
+    import app
+    from memstats import process_memory
+
+    app.print_environment()
+    app.prepare_for_fork()
+    server.log.info(f"✓ Shared data loaded in master, memory: {process_memory()}")
+
+
+def post_fork(server, worker):
+    import app
+
+    # Each worker opens its own pool connections after the fork
+    if os.getenv("DB_HOST"):
+        app.DB_POOL.warm_up()
+
+
+def worker_exit(server, worker):
+    import app
+
+    # Flush queued attempt rows before the worker goes away
+    if app.ATTEMPT_WRITER is not None:
+        app.ATTEMPT_WRITER.close()
+
+
+def post_worker_init(worker):
+    from memstats import process_memory
+
+    worker.log.info(f"✓ Worker {worker.pid} ready, memory: {process_memory()}")
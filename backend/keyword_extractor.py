@@ -0,0 +1,64 @@
+"""Noun-chunk keyword extraction with a trimmed spaCy pipeline.
+
+Only noun chunks are used for keywords, and those need the tagger, attribute
+ruler and dependency parser. NER and the lemmatizer are excluded at load time,
+which cuts both parse time and model memory. Texts are processed in batches
+with ``nlp.pipe``; ``n_process > 1`` fans bulk jobs (rebuilding the keyword
+index, regrading archives) out over worker processes.
+"""
+from keyword_index import keywords_from_doc
+from metrics import STAGE_SECONDS
+
+DEFAULT_MODEL = "en_core_web_sm"
+# Components noun_chunks doesn't depend on
+NOUN_CHUNK_EXCLUDE = ("ner", "lemmatizer")
+
+
+class KeywordExtractor:
+    def __init__(self, model=DEFAULT_MODEL, exclude=NOUN_CHUNK_EXCLUDE, batch_size=64, n_process=1):
+        self.model = model
+        self.exclude = list(exclude)
+        self.batch_size = batch_size
+        self.n_process = n_process
+        self._nlp = None
+        self.load_error = None
+
+    @property
+    def nlp(self):
+        if self._nlp is None and self.load_error is None:
+            try:
+                import spacy
+                self._nlp = spacy.load(self.model, exclude=self.exclude)
+            except Exception as e:
+                self.load_error = e
+        return self._nlp
+
+    @property
+    def loaded(self):
+        """True once the model has been loaded (without triggering a load)."""
+        return self._nlp is not None
+
+    @property
+    def available(self):
+        return self.nlp is not None
+
+    def extract(self, text, top_k=None):
+        nlp = self.nlp
+        if nlp is None:
+            return text.split()[:top_k]  # Fallback if spaCy not loaded
+        with STAGE_SECONDS.time(stage="spacy_parse"):
+            return keywords_from_doc(nlp(text))[:top_k]
+
+    def extract_many(self, texts, top_k=None, batch_size=None, n_process=None):
+        """Keywords for each text, in order, parsed in batches."""
+        texts = list(texts)
+        nlp = self.nlp
+        if nlp is None:
+            return [text.split()[:top_k] for text in texts]
+        with STAGE_SECONDS.time(stage="spacy_parse_batch"):
+            docs = nlp.pipe(
+                texts,
+                batch_size=batch_size or self.batch_size,
+                n_process=n_process or self.n_process,
+            )
+            return [keywords_from_doc(doc)[:top_k] for doc in docs]
@@ -0,0 +1,272 @@
+"""Precompiled keyword index for the built-in question banks.
+
+Every ideal answer in data/grade*_v2.csv is parsed with spaCy once, either at
+startup or ahead of time with:
+
+    python backend/keyword_index.py
+
+which writes data/keyword_index.json. The scoring and feedback paths look the
+keywords up here instead of parsing the same ideal answer on every request.
+"""
+import csv
+import glob
+import hashlib
+import json
+import os
+from array import array
+from bisect import bisect_left
+
+from fuzzy_index import FuzzyIndex, vocabulary
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+DEFAULT_DATA_DIR = os.path.abspath(os.path.join(BASE_DIR, '..', 'data'))
+INDEX_FILENAME = "keyword_index.json"
+INDEX_VERSION = 1
+
+
+def keywords_from_doc(doc):
+    """Noun-chunk keywords of a parsed document, de-duplicated in order."""
+    chunks = [chunk.text.lower() for chunk in doc.noun_chunks if len(chunk.text.strip()) > 2]
+    return list(dict.fromkeys(chunks))
+
+
+class KeywordEntry:
+    """Everything the scorers need to know about one ideal answer."""
+
+    __slots__ = ("ideal_answer", "ideal_lower", "keywords", "keyword_words", "_fuzzy")
+
+    def __init__(self, ideal_answer, keywords):
+        self.ideal_answer = ideal_answer
+        self.ideal_lower = ideal_answer.lower()
+        self.keywords = tuple(keywords)
+        self.keyword_words = tuple(tuple(kw.split()) for kw in self.keywords)
+        self._fuzzy = None
+
+    @property
+    def fuzzy(self):
+        """Fuzzy index over the words the scorers compare (top 10 keywords), built on first use."""
+        if self._fuzzy is None:
+            self._fuzzy = FuzzyIndex(vocabulary(self.keyword_words[:10]))
+        return self._fuzzy
+
+    def top(self, top_k):
+        return list(self.keywords[:top_k])
+
+
+class KeywordIndex:
+    """Keyword entries keyed by exact ideal answer text, and by question text."""
+
+    def __init__(self):
+        self.by_answer = {}
+        self.by_question = {}
+
+    def __len__(self):
+        return len(self.by_answer)
+
+    def add(self, question, ideal_answer, keywords):
+        entry = KeywordEntry(ideal_answer, keywords)
+        self.by_answer[ideal_answer] = entry
+        if question:
+            self.by_question[question.strip()] = entry
+        return entry
+
+    def get(self, ideal_answer):
+        if not ideal_answer:
+            return None
+        return self.by_answer.get(ideal_answer)
+
+    def get_by_question(self, question):
+        if not question:
+            return None
+        return self.by_question.get(question.strip())
+
+    def to_json(self):
+        questions = {id(entry): q for q, entry in self.by_question.items()}
+        return {
+            "version": INDEX_VERSION,
+            "entries": [
+                {
+                    "question": questions.get(id(entry), ""),
+                    "answer": entry.ideal_answer,
+                    "keywords": list(entry.keywords),
+                }
+                for entry in self.by_answer.values()
+            ],
+        }
+
+    @classmethod
+    def from_json(cls, payload):
+        if payload.get("version") != INDEX_VERSION:
+            raise ValueError(f"Unsupported keyword index version: {payload.get('version')}")
+        index = cls()
+        for item in payload["entries"]:
+            index.add(item["question"], item["answer"], item["keywords"])
+        return index
+
+
+def _key_hash(text):
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "little")
+
+
+class PackedKeywordIndex:
+    """Read-only KeywordIndex stored in a few flat buffers.
+
+    Meant to be built in a preforking parent process. Every entry is serialized
+    into one bytes blob and found through sorted 64-bit key hashes, so the shared
+    pages hold a handful of large objects instead of thousands of small ones
+    whose refcount updates would make each worker copy the pages it touches.
+    Workers decode entries on demand into a small private cache.
+    """
+
+    def __init__(self, index, cache_size=1024):
+        questions = {}
+        for question, entry in index.by_question.items():
+            questions.setdefault(id(entry), []).append(question)
+
+        blob = bytearray()
+        offsets = array("Q", [0])
+        answer_keys, question_keys = [], []
+        for number, entry in enumerate(index.by_answer.values()):
+            record = [entry.ideal_answer, list(entry.keywords), questions.get(id(entry), [])]
+            blob += json.dumps(record, ensure_ascii=False).encode("utf-8")
+            offsets.append(len(blob))
+            answer_keys.append((_key_hash(entry.ideal_answer), number))
+            question_keys.extend((_key_hash(q), number) for q in record[2])
+
+        self._blob = bytes(blob)
+        self._offsets = offsets
+        self._answer_hashes, self._answer_slots = self._sorted_keys(answer_keys)
+        self._question_hashes, self._question_slots = self._sorted_keys(question_keys)
+        self._cache_size = cache_size
+        self._cache = {}
+
+    @staticmethod
+    def _sorted_keys(keys):
+        keys.sort()
+        return array("Q", (h for h, _ in keys)), array("I", (n for _, n in keys))
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def _entry(self, number):
+        entry = self._cache.get(number)
+        if entry is None:
+            ideal_answer, keywords, questions = json.loads(
+                self._blob[self._offsets[number]:self._offsets[number + 1]].decode("utf-8"))
+            entry = (KeywordEntry(ideal_answer, keywords), questions)
+            if len(self._cache) >= self._cache_size:
+                self._cache.clear()
+            self._cache[number] = entry
+        return entry
+
+    def _find(self, hashes, slots, text, matches):
+        key = _key_hash(text)
+        position = bisect_left(hashes, key)
+        while position < len(hashes) and hashes[position] == key:
+            entry, questions = self._entry(slots[position])
+            if matches(entry, questions):
+                return entry
+            position += 1
+        return None
+
+    def get(self, ideal_answer):
+        if not ideal_answer:
+            return None
+        return self._find(self._answer_hashes, self._answer_slots, ideal_answer,
+                          lambda entry, _: entry.ideal_answer == ideal_answer)
+
+    def get_by_question(self, question):
+        if not question:
+            return None
+        question = question.strip()
+        return self._find(self._question_hashes, self._question_slots, question,
+                          lambda _, questions: question in questions)
+
+
+def bank_files(data_dir=DEFAULT_DATA_DIR):
+    return sorted(glob.glob(os.path.join(data_dir, "grade*_v2.csv")))
+
+
+def iter_bank_rows(data_dir=DEFAULT_DATA_DIR):
+    """Yield (question, answer) for every row of the built-in banks."""
+    for path in bank_files(data_dir):
+        with open(path, newline='', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                answer = row.get("Answer") or ""
+                if answer.strip():
+                    yield (row.get("Question") or "").strip(), answer
+
+
+def build_keyword_index(extractor, data_dir=DEFAULT_DATA_DIR, n_process=None):
+    """Parse every ideal answer in the banks once and index its keywords."""
+    rows = list(iter_bank_rows(data_dir))
+    unique_answers = list(dict.fromkeys(answer for _, answer in rows))
+    parsed = dict(zip(unique_answers, extractor.extract_many(unique_answers, n_process=n_process)))
+
+    index = KeywordIndex()
+    for question, answer in rows:
+        index.add(question, answer, parsed[answer])
+    return index
+
+
+def index_path(data_dir=DEFAULT_DATA_DIR):
+    return os.path.join(data_dir, INDEX_FILENAME)
+
+
+def is_index_fresh(data_dir=DEFAULT_DATA_DIR):
+    """True if the saved index exists and is newer than every bank CSV."""
+    path = index_path(data_dir)
+    if not os.path.exists(path):
+        return False
+    index_mtime = os.path.getmtime(path)
+    return all(os.path.getmtime(csv_path) <= index_mtime for csv_path in bank_files(data_dir))
+
+
+def save_keyword_index(index, data_dir=DEFAULT_DATA_DIR):
+    path = index_path(data_dir)
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(index.to_json(), f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+    return path
+
+
+def load_keyword_index(data_dir=DEFAULT_DATA_DIR):
+    with open(index_path(data_dir), encoding="utf-8") as f:
+        return KeywordIndex.from_json(json.load(f))
+
+
+def get_keyword_index(extractor, data_dir=DEFAULT_DATA_DIR):
+    """Load the saved index if it is fresh, otherwise rebuild (and try to save) it."""
+    if is_index_fresh(data_dir):
+        try:
+            return load_keyword_index(data_dir)
+        except Exception as e:
+            print(f"❌ Error loading keyword index, rebuilding: {e}")
+
+    if extractor is None or not extractor.available:
+        return KeywordIndex()
+
+    index = build_keyword_index(extractor, data_dir)
+    try:
+        save_keyword_index(index, data_dir)
+    except OSError as e:
+        print(f"Could not save keyword index: {e}")
+    return index
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from keyword_extractor import KeywordExtractor
+
+    parser = argparse.ArgumentParser(description="Build data/keyword_index.json from the question banks.")
+    parser.add_argument("--processes", type=int, default=1, help="spaCy worker processes for nlp.pipe")
+    args = parser.parse_args()
+
+    extractor = KeywordExtractor()
+    if not extractor.available:
+        raise SystemExit(f"❌ Error loading spaCy model: {extractor.load_error}")
+    index = build_keyword_index(extractor, n_process=args.processes)
+    path = save_keyword_index(index)
+    print(f"✓ Indexed {len(index)} ideal answers into {path}")
@@ -0,0 +1,466 @@
+"""HTTP client for the Together chat-completions API.
+
+* Keep-alive connection pooling (requests.Session / httpx.AsyncClient), so
+  repeated calls skip the TLS handshake.
+* Errors are classified: connection failures, timeouts, broken bodies,
+  408/425/429 and 5xx are retried; other 4xx and malformed responses are not.
+* Retries use full-jitter exponential backoff and never run past the call's
+  total deadline. A 429's Retry-After is honoured when it fits.
+* A circuit breaker shared by the sync and async clients stops calling an
+  unhealthy upstream for a cool-down period; callers get CircuitOpenError
+  immediately and can fall back to deterministic feedback. Every call that
+  gets past the breaker reports success or failure, even when it ends in an
+  unexpected exception or a cancellation. A half-open probe therefore always
+  resolves.
+
+The endpoint is configurable, so the client can be pointed at a local stub
+server for testing.
+"""
+import asyncio
+import json
+import random
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from metrics import STAGE_SECONDS
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+
+
+class LLMError(Exception):
+    def __init__(self, message, retryable=False, status=None, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.status = status
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(LLMError):
+    pass
+
+
+def _retry_after_seconds(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def status_error(status, body, retry_after=None):
+    return LLMError(
+        f"Upstream returned HTTP {status}: {body[:200]}",
+        retryable=status in RETRYABLE_STATUS,
+        status=status,
+        retry_after=_retry_after_seconds(retry_after),
+    )
+
+
+def extract_content(payload):
+    try:
+        return payload["choices"][0]["message"]["content"]
+    except (KeyError, IndexError, TypeError):
+        raise LLMError(f"Malformed completion response: {str(payload)[:200]}")
+
+
+def parse_sse_line(line):
+    """Content delta from one server-sent event line; None to skip, StopIteration at [DONE]."""
+    if not line or not line.startswith("data:"):
+        return None
+    data = line[len("data:"):].strip()
+    if data == "[DONE]":
+        raise StopIteration
+    chunk = json.loads(data)
+    choices = chunk.get("choices") or []
+    if choices:
+        return (choices[0].get("delta") or {}).get("content") or None
+    return None
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures;
+    half-open after ``reset_timeout`` lets a single probe through."""
+
+    def __init__(self, failure_threshold=5, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+        self.opened_count = 0
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state()
+
+    def _state(self):
+        if self._opened_at is None:
+            return "closed"
+        if time.monotonic() - self._opened_at >= self.reset_timeout:
+            return "half_open"
+        return "open"
+
+    def allow(self):
+        with self._lock:
+            state = self._state()
+            if state == "closed":
+                return True
+            if state == "half_open" and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.failure_threshold:
+                if self._opened_at is None or self._probing:
+                    self.opened_count += 1
+                self._opened_at = time.monotonic()
+                self._probing = False
+
+    def stats(self):
+        with self._lock:
+            return {
+                "state": self._state(),
+                "consecutive_failures": self._failures,
+                "opened_count": self.opened_count,
+            }
+
+
+class RetryPolicy:
+    def __init__(self, max_attempts=3, base_delay=0.5, max_delay=8.0, deadline=60.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+
+    def backoff(self, attempt, error):
+        """Delay before retry number ``attempt`` (1-based), full jitter."""
+        if error.retry_after is not None:
+            return min(error.retry_after, self.max_delay)
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** (attempt - 1))))
+
+
+class _ClientBase:
+    def __init__(self, api_url, headers, retry_policy=None, breaker=None):
+        self.api_url = api_url
+        self.headers = headers
+        self.retry_policy = retry_policy or RetryPolicy()
+        self.breaker = breaker or CircuitBreaker()
+        self._lock = threading.Lock()
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.failures = 0
+        self.short_circuited = 0
+
+    def _count(self, counter, amount=1):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + amount)
+
+    def _check_breaker(self):
+        if not self.breaker.allow():
+            self._count("short_circuited")
+            raise CircuitOpenError("LLM upstream is unavailable (circuit open)", retryable=True)
+
+    def _abandoned(self):
+        """Failure for a call that ended outside _fail (unexpected exception, cancellation)."""
+        self._count("failures")
+        self.breaker.record_failure()
+
+    def _fail(self, error):
+        self._count("failures")
+        if error.retryable or error.status is None or error.status >= 500:
+            self.breaker.record_failure()
+        else:
+            # Our own bad request (4xx) still proves the upstream is reachable
+            self.breaker.record_success()
+
+    def _next_delay(self, attempt, error, deadline):
+        """Seconds to sleep before retrying, or None to give up."""
+        if not error.retryable or attempt >= self.retry_policy.max_attempts:
+            return None
+        delay = self.retry_policy.backoff(attempt, error)
+        if time.monotonic() + delay >= deadline:
+            return None
+        return delay
+
+    def stats(self):
+        with self._lock:
+            counters = {
+                "calls": self.calls,
+                "attempts": self.attempts,
+                "retries": self.retries,
+                "failures": self.failures,
+                "short_circuited": self.short_circuited,
+            }
+        counters["circuit"] = self.breaker.stats()
+        return counters
+
+
+class LLMClient(_ClientBase):
+    """Blocking client with a pooled keep-alive session."""
+
+    def __init__(self, api_url, headers, retry_policy=None, breaker=None, pool_size=20):
+        super().__init__(api_url, headers, retry_policy, breaker)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self.session.headers.update(headers)
+
+    def _post(self, payload, timeout, stream=False):
+        try:
+            response = self.session.post(self.api_url, json=payload, timeout=timeout, stream=stream)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise LLMError(f"Upstream connection failed: {e}", retryable=True)
+        except requests.RequestException as e:
+            # e.g. ChunkedEncodingError / ContentDecodingError while reading the body
+            raise LLMError(f"Upstream request failed: {e}", retryable=True)
+        if response.status_code >= 400:
+            body = response.text
+            response.close()
+            raise status_error(response.status_code, body, response.headers.get("Retry-After"))
+        return response
+
+    def _attempts(self, deadline):
+        """Yield attempt numbers with the per-attempt timeout, sleeping between retries."""
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                error = LLMError("Upstream deadline exceeded", retryable=True)
+                self._fail(error)
+                raise error
+            self._count("attempts")
+            if attempt > 1:
+                self._count("retries")
+            yield attempt, remaining
+
+    def chat(self, payload, deadline=None):
+        """Completion text for a chat payload, retrying transient failures."""
+        self._count("calls")
+        self._check_breaker()
+        try:
+            with STAGE_SECONDS.time(stage="llm_request"):
+                return self._chat(payload, time.monotonic() + (deadline or self.retry_policy.deadline))
+        except LLMError:
+            raise  # already reported by _fail
+        except Exception as e:
+            self._abandoned()
+            raise LLMError(f"Upstream call failed: {e}", retryable=True) from e
+        except BaseException:
+            self._abandoned()
+            raise
+
+    def _chat(self, payload, deadline):
+        for attempt, remaining in self._attempts(deadline):
+            try:
+                response = self._post(payload, timeout=remaining)
+                try:
+                    content = extract_content(response.json())
+                except requests.RequestException as e:
+                    raise LLMError(f"Upstream response failed: {e}", retryable=True)
+                except ValueError:
+                    raise LLMError(f"Malformed completion response: {response.text[:200]}")
+                self.breaker.record_success()
+                return content
+            except LLMError as e:
+                delay = self._next_delay(attempt, e, deadline)
+                if delay is None:
+                    self._fail(e)
+                    raise
+                time.sleep(delay)
+
+    def stream_chat(self, payload, deadline=None):
+        """Yield content deltas. Retries only happen before the first token arrives."""
+        self._count("calls")
+        self._check_breaker()
+        started = time.perf_counter()
+        deadline = time.monotonic() + (deadline or self.retry_policy.deadline)
+        payload = dict(payload, stream=True)
+
+        try:
+            for attempt, remaining in self._attempts(deadline):
+                try:
+                    response = self._post(payload, timeout=remaining, stream=True)
+                    self.breaker.record_success()
+                    break
+                except LLMError as e:
+                    delay = self._next_delay(attempt, e, deadline)
+                    if delay is None:
+                        self._fail(e)
+                        raise
+                    time.sleep(delay)
+        except LLMError:
+            raise
+        except Exception as e:
+            self._abandoned()
+            raise LLMError(f"Upstream call failed: {e}", retryable=True) from e
+        except BaseException:
+            self._abandoned()
+            raise
+
+        # text/event-stream arrives without a charset, which requests would read as ISO-8859-1
+        response.encoding = "utf-8"
+        first_token = True
+        try:
+            with response:
+                for line in response.iter_lines(decode_unicode=True):
+                    try:
+                        content = parse_sse_line(line)
+                    except StopIteration:
+                        break
+                    if content:
+                        if first_token:
+                            STAGE_SECONDS.observe(time.perf_counter() - started, stage="llm_first_token")
+                            first_token = False
+                        yield content
+        except (requests.RequestException, ValueError) as e:
+            error = LLMError(f"Upstream stream failed: {e}", retryable=True)
+            self._fail(error)
+            raise error
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="llm_stream")
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncLLMClient(_ClientBase):
+    """httpx-based counterpart for the ASGI serving mode."""
+
+    def __init__(self, api_url, headers, retry_policy=None, breaker=None, max_connections=100):
+        super().__init__(api_url, headers, retry_policy, breaker)
+        self.max_connections = max_connections
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            import httpx
+            self._client = httpx.AsyncClient(
+                headers=self.headers,
+                limits=httpx.Limits(max_connections=self.max_connections,
+                                    max_keepalive_connections=self.max_connections),
+            )
+        return self._client
+
+    async def _send(self, payload, timeout, stream=False):
+        import httpx
+        request = self.client.build_request("POST", self.api_url, json=payload, timeout=timeout)
+        try:
+            response = await self.client.send(request, stream=stream)
+        except (httpx.TransportError, httpx.TimeoutException) as e:
+            raise LLMError(f"Upstream connection failed: {e}", retryable=True)
+        except httpx.HTTPError as e:
+            raise LLMError(f"Upstream request failed: {e}", retryable=True)
+        if response.status_code >= 400:
+            try:
+                body = (await response.aread()).decode(errors="replace")
+            except httpx.HTTPError as e:
+                body = f"<unreadable body: {e}>"
+            await response.aclose()
+            raise status_error(response.status_code, body, response.headers.get("Retry-After"))
+        return response
+
+    async def _with_retries(self, payload, deadline, stream):
+        attempt = 0
+        while True:
+            attempt += 1
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                error = LLMError("Upstream deadline exceeded", retryable=True)
+                self._fail(error)
+                raise error
+            self._count("attempts")
+            if attempt > 1:
+                self._count("retries")
+            try:
+                return await self._send(payload, remaining, stream=stream)
+            except LLMError as e:
+                delay = self._next_delay(attempt, e, deadline)
+                if delay is None:
+                    self._fail(e)
+                    raise
+                await asyncio.sleep(delay)
+
+    async def chat(self, payload, deadline=None):
+        self._count("calls")
+        self._check_breaker()
+        try:
+            return await self._chat(payload, deadline)
+        except LLMError:
+            raise  # already reported by _fail
+        except Exception as e:
+            self._abandoned()
+            raise LLMError(f"Upstream call failed: {e}", retryable=True) from e
+        except BaseException:
+            self._abandoned()  # e.g. the request was cancelled mid-probe
+            raise
+
+    async def _chat(self, payload, deadline):
+        started = time.perf_counter()
+        deadline = time.monotonic() + (deadline or self.retry_policy.deadline)
+        response = await self._with_retries(payload, deadline, stream=False)
+        try:
+            content = extract_content(response.json())
+        except ValueError:
+            error = LLMError(f"Malformed completion response: {response.text[:200]}")
+            self._fail(error)
+            raise error
+        self.breaker.record_success()
+        STAGE_SECONDS.observe(time.perf_counter() - started, stage="llm_request")
+        return content
+
+    async def stream_chat(self, payload, deadline=None):
+        import httpx
+        self._count("calls")
+        self._check_breaker()
+        started = time.perf_counter()
+        deadline = time.monotonic() + (deadline or self.retry_policy.deadline)
+        try:
+            response = await self._with_retries(dict(payload, stream=True), deadline, stream=True)
+        except LLMError:
+            raise
+        except Exception as e:
+            self._abandoned()
+            raise LLMError(f"Upstream call failed: {e}", retryable=True) from e
+        except BaseException:
+            self._abandoned()
+            raise
+        self.breaker.record_success()
+        first_token = True
+        try:
+            async for line in response.aiter_lines():
+                try:
+                    content = parse_sse_line(line)
+                except StopIteration:
+                    break
+                if content:
+                    if first_token:
+                        STAGE_SECONDS.observe(time.perf_counter() - started, stage="llm_first_token")
+                        first_token = False
+                    yield content
+            STAGE_SECONDS.observe(time.perf_counter() - started, stage="llm_stream")
+        except (httpx.HTTPError, ValueError) as e:
+            error = LLMError(f"Upstream stream failed: {e}", retryable=True)
+            self._fail(error)
+            raise error
+        finally:
+            await response.aclose()
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
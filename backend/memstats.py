@@ -0,0 +1,71 @@
+"""Per-process memory from /proc/<pid>/smaps_rollup (Linux).
+
+RSS counts shared pages in full for every process, so it overstates what each
+preforked worker costs. PSS splits shared pages between the processes mapping
+them, and Private_* is what a worker holds on its own, which is the number
+that grows when copy-on-write pages get copied.
+
+    python backend/memstats.py <gunicorn master pid>
+"""
+import os
+import sys
+
+FIELDS = ("Rss", "Pss", "Shared_Clean", "Shared_Dirty", "Private_Clean", "Private_Dirty")
+
+
+def smaps_rollup(pid="self"):
+    """kB per smaps field, or None where /proc/<pid>/smaps_rollup isn't available."""
+    try:
+        with open(f"/proc/{pid}/smaps_rollup", encoding="ascii") as f:
+            lines = f.readlines()
+    except OSError:
+        return None
+    values = {}
+    for line in lines:
+        name, _, rest = line.partition(":")
+        if name in FIELDS:
+            values[name] = int(rest.split()[0])
+    return values
+
+
+def process_memory(pid="self"):
+    """RSS, PSS, shared and private memory in MB for one process."""
+    values = smaps_rollup(pid)
+    if values is None:
+        return None
+    mb = lambda kb: round(kb / 1024, 1)
+    return {
+        "rss_mb": mb(values.get("Rss", 0)),
+        "pss_mb": mb(values.get("Pss", 0)),
+        "shared_mb": mb(values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0)),
+        "private_mb": mb(values.get("Private_Clean", 0) + values.get("Private_Dirty", 0)),
+    }
+
+
+def child_pids(pid):
+    children = []
+    try:
+        for task in os.listdir(f"/proc/{pid}/task"):
+            with open(f"/proc/{pid}/task/{task}/children", encoding="ascii") as f:
+                children.extend(int(child) for child in f.read().split())
+    except OSError:
+        pass
+    return children
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        raise SystemExit("usage: python backend/memstats.py <master pid>")
+    master = int(sys.argv[1])
+
+    print(f"{'pid':>8}  {'role':<8}{'RSS MB':>10}{'PSS MB':>10}{'shared MB':>11}{'private MB':>12}")
+    total_pss = 0.0
+    for pid, role in [(master, "master")] + [(child, "worker") for child in child_pids(master)]:
+        memory = process_memory(pid)
+        if memory is None:
+            print(f"{pid:>8}  {role:<8}  (smaps_rollup unavailable)")
+            continue
+        total_pss += memory["pss_mb"]
+        print(f"{pid:>8}  {role:<8}{memory['rss_mb']:>10}{memory['pss_mb']:>10}"
+              f"{memory['shared_mb']:>11}{memory['private_mb']:>12}")
+    print(f"Total PSS: {total_pss:.1f} MB")
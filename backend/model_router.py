@@ -0,0 +1,166 @@
+"""Per-request model and token-budget selection for feedback.
+
+The reasoning model writes a long hidden <think> trace before every reply,
+which only pays off for answers that need a careful hint. Routes are chosen
+from three inputs:
+
+* the answer's pre-score band (calculate_question_score, 0-2 marks):
+  "high" answers (>= 1.5) need a short confirmation or nudge;
+* the question's difficulty: budgets grow from Easy to Hard;
+* the request's latency deadline.
+
+    band   difficulty     preferred route
+    high   any            fast model, short budget
+    low    Easy           fast model
+    low    other/unknown  reasoning model
+    mid    any            reasoning model, budget by difficulty
+
+Every call's latency and outcome is recorded per model. Only calls from the
+last ``max_age`` seconds count, up to ``window`` of them. The reasoning route
+is degraded to the fast model in two cases: its recent p90 latency (times
+``headroom``) wouldn't fit the deadline, or its error rate is above
+``max_error_rate``. Until a model has ``min_samples`` recent calls, its
+configured expected latency stands in for the p90. Old samples expire, so a
+degraded model is tried again once its bad period ages out.
+
+A reasoning route that isn't degraded carries a fast-model fallback for when
+the call fails; ``reserve()`` is the time to keep back from the deadline for it.
+"""
+import math
+import threading
+import time
+from collections import deque
+
+class ModelSpec:
+    __slots__ = ("name", "reasoning", "expected_latency", "budgets")
+
+    def __init__(self, name, reasoning, expected_latency, budgets):
+        self.name = name
+        self.reasoning = reasoning
+        self.expected_latency = expected_latency
+        self.budgets = budgets  # difficulty (or "default") -> max_tokens
+
+    def budget(self, difficulty):
+        return self.budgets.get(difficulty, self.budgets["default"])
+
+
+class Route:
+    __slots__ = ("model", "max_tokens", "reason", "fallback")
+
+    def __init__(self, model, max_tokens, reason, fallback=None):
+        self.model = model
+        self.max_tokens = max_tokens
+        self.reason = reason
+        self.fallback = fallback
+
+
+class ModelStats:
+    """Recent (timestamp, latency, ok) samples for one model."""
+
+    def __init__(self, window=50, max_age=120.0):
+        self.max_age = max_age
+        self._samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, latency, ok):
+        with self._lock:
+            self._samples.append((time.monotonic(), latency, ok))
+
+    def recent(self):
+        cutoff = time.monotonic() - self.max_age
+        with self._lock:
+            while self._samples and self._samples[0][0] < cutoff:
+                self._samples.popleft()
+            return list(self._samples)
+
+    def snapshot(self):
+        samples = self.recent()
+        latencies = sorted(latency for _, latency, ok in samples if ok)
+        errors = sum(1 for _, _, ok in samples if not ok)
+        p90 = latencies[max(0, math.ceil(0.9 * len(latencies)) - 1)] if latencies else None
+        return {
+            "calls": len(samples),
+            "errors": errors,
+            "error_rate": errors / len(samples) if samples else 0.0,
+            "p90": p90,
+        }
+
+
+def score_band(score):
+    if score >= 1.5:
+        return "high"
+    if score < 0.5:
+        return "low"
+    return "mid"
+
+
+class ModelRouter:
+    def __init__(self, reasoning, fast=None, window=50, max_age=120.0, min_samples=5,
+                 max_error_rate=0.3, headroom=1.2):
+        self.reasoning = reasoning
+        self.fast = fast
+        self.min_samples = min_samples
+        self.max_error_rate = max_error_rate
+        self.headroom = headroom
+        self._stats = {spec.name: ModelStats(window, max_age) for spec in (reasoning, fast) if spec is not None}
+        self._routes = {}
+        self._lock = threading.Lock()
+
+    def _health(self, spec):
+        """(predicted latency, error rate) from recent calls, or the configured guess."""
+        snapshot = self._stats[spec.name].snapshot()
+        if snapshot["calls"] < self.min_samples or snapshot["p90"] is None:
+            return spec.expected_latency, snapshot["error_rate"] if snapshot["calls"] >= self.min_samples else 0.0
+        return snapshot["p90"], snapshot["error_rate"]
+
+    def _fast_route(self, difficulty, reason, short=False):
+        max_tokens = self.fast.budgets["short"] if short else self.fast.budget(difficulty)
+        return Route(self.fast.name, max_tokens, reason)
+
+    def route(self, score, difficulty=None, deadline=None):
+        """Route for one request; ``deadline`` is the seconds left for the LLM call."""
+        band = score_band(score)
+        if self.fast is not None:
+            if band == "high":
+                return self._count(self._fast_route(difficulty, "near-correct", short=True))
+            if band == "low" and difficulty == "Easy":
+                return self._count(self._fast_route(difficulty, "easy-question"))
+
+        route = Route(self.reasoning.name, self.reasoning.budget(difficulty), f"{band}-band")
+        if self.fast is None:
+            return self._count(route)
+
+        latency, error_rate = self._health(self.reasoning)
+        fast_latency, fast_error_rate = self._health(self.fast)
+        if error_rate > self.max_error_rate and fast_error_rate <= error_rate:
+            return self._count(self._fast_route(difficulty, "degraded-errors"))
+        if deadline is not None and latency * self.headroom > deadline and fast_latency < latency:
+            return self._count(self._fast_route(difficulty, "degraded-latency"))
+        route.fallback = self._fast_route(difficulty, "fallback")
+        return self._count(route)
+
+    def reserve(self, route):
+        """Seconds to keep back from ``route`` so its fallback can still run."""
+        if route.fallback is None:
+            return 0.0
+        spec = self.fast if route.fallback.model == self.fast.name else self.reasoning
+        return self._health(spec)[0] * self.headroom
+
+    def record(self, model, latency, ok):
+        stats = self._stats.get(model)
+        if stats is not None:
+            stats.record(latency, ok)
+
+    def _count(self, route):
+        key = (route.model, route.reason)
+        with self._lock:
+            self._routes[key] = self._routes.get(key, 0) + 1
+        return route
+
+    def stats(self):
+        with self._lock:
+            routes = {f"{model}:{reason}": count for (model, reason), count in sorted(self._routes.items())}
+        return {
+            "models": {name: stats.snapshot() for name, stats in self._stats.items()},
+            "routes": routes,
+        }
@@ -0,0 +1,155 @@
+"""In-memory question banks for /get-questions.
+
+Each grade CSV is read once into a tuple of question records plus, per
+difficulty, a compact array of question ids. A bank is re-read only when its
+file's mtime changes, so sampling a test is O(k) with no pandas or filesystem
+scan on the request path.
+"""
+import csv
+import os
+import random
+import threading
+import time
+from array import array
+
+from metrics import STAGE_SECONDS
+
+REQUIRED_COLUMNS = ["Difficulty", "Question", "Answer"]
+DEFAULT_MIX = (("Easy", 2), ("Medium", 2), ("Difficult", 1))
+
+
+class QuestionBankError(Exception):
+    """Raised when a grade's question file is missing or malformed."""
+
+
+class GradeBank:
+    __slots__ = ("grade", "path", "mtime", "questions", "by_difficulty", "columns")
+
+    def __init__(self, grade, path, mtime, questions, by_difficulty, columns):
+        self.grade = grade
+        self.path = path
+        self.mtime = mtime
+        self.questions = questions
+        self.by_difficulty = by_difficulty
+        self.columns = columns
+
+    def counts(self):
+        return {level: len(ids) for level, ids in self.by_difficulty.items()}
+
+
+def load_grade_bank(grade, path):
+    mtime = os.path.getmtime(path)
+    try:
+        with open(path, newline='', encoding='utf-8') as f:
+            reader = csv.DictReader(f)
+            columns = list(reader.fieldnames or [])
+            rows = list(reader)
+    except Exception as e:
+        raise QuestionBankError(f"Error reading CSV file: {e}")
+
+    missing_columns = [col for col in REQUIRED_COLUMNS if col not in columns]
+    if missing_columns:
+        raise QuestionBankError(
+            f"Missing columns in CSV: {missing_columns}. Available columns: {columns}"
+        )
+
+    questions = tuple(rows)
+    grouped = {}
+    for question_id, row in enumerate(questions):
+        grouped.setdefault(row["Difficulty"], []).append(question_id)
+    by_difficulty = {level: array('I', ids) for level, ids in grouped.items()}
+    return GradeBank(grade, path, mtime, questions, by_difficulty, columns)
+
+
+class QuestionBank:
+    """Grade banks cached by grade and reloaded when the CSV's mtime changes."""
+
+    def __init__(self, data_dirs, check_interval=1.0):
+        self.data_dirs = data_dirs
+        self.check_interval = check_interval
+        self._banks = {}
+        self._last_checked = {}
+        self._lock = threading.Lock()
+
+    def find_file(self, grade):
+        filename = f"grade{grade}_v2.csv"
+        for data_dir in self.data_dirs:
+            path = os.path.join(data_dir, filename)
+            if os.path.exists(path):
+                return path
+
+        for data_dir in self.data_dirs:
+            if os.path.exists(data_dir):
+                available_files = os.listdir(data_dir)
+                raise QuestionBankError(
+                    f"Question file not found for grade {grade}. Available files in {data_dir}: {available_files}"
+                )
+        raise QuestionBankError(f"No data directory found. Searched paths: {self.data_dirs}")
+
+    def get(self, grade):
+        bank = self._banks.get(grade)
+        now = time.monotonic()
+        if bank is not None and now - self._last_checked.get(grade, 0) < self.check_interval:
+            return bank
+
+        with self._lock:
+            bank = self._banks.get(grade)
+            try:
+                stale = bank is None or os.path.getmtime(bank.path) != bank.mtime
+            except OSError:
+                stale = True
+            if stale:
+                path = bank.path if bank is not None and os.path.exists(bank.path) else self.find_file(grade)
+                with STAGE_SECONDS.time(stage="csv_load"):
+                    bank = load_grade_bank(grade, path)
+                self._banks[grade] = bank
+                print(f"✓ Loaded grade {grade} questions from {path}: {bank.counts()}")
+            self._last_checked[grade] = now
+        return bank
+
+    def sample(self, grade, mix=DEFAULT_MIX, total=5):
+        """Stratified sample: ``mix`` per difficulty, de-duplicated and topped up to ``total``."""
+        bank = self.get(grade)
+        questions = bank.questions
+
+        selected = []
+        seen_questions = set()
+        for level, n in mix:
+            ids = bank.by_difficulty.get(level)
+            if not ids:
+                continue
+            for question_id in random.sample(ids, min(n, len(ids))):
+                question = questions[question_id]
+                if question["Question"] not in seen_questions:
+                    seen_questions.add(question["Question"])
+                    selected.append(question)
+
+        needed = total - len(selected)
+        if needed > 0:
+            selected.extend(self._fill(questions, seen_questions, needed))
+
+        random.shuffle(selected)
+        return selected
+
+    @staticmethod
+    def _fill(questions, used_questions, needed):
+        """Pick ``needed`` questions not already used, or none if there aren't enough."""
+        picked = []
+        picked_questions = set()
+        # Rejection sampling is O(needed) while the bank is much larger than the test
+        for _ in range(needed * 20):
+            question = questions[random.randrange(len(questions))] if questions else None
+            if question is None:
+                break
+            text = question["Question"]
+            if text in used_questions or text in picked_questions:
+                continue
+            picked.append(question)
+            picked_questions.add(text)
+            if len(picked) == needed:
+                return picked
+
+        remaining = [q for q in questions if q["Question"] not in used_questions]
+        if len(remaining) < needed:
+            return []
+        return random.sample(remaining, needed)
@@ -0,0 +1,266 @@
+"""Question banks stored in Postgres (QUESTION_BANK_BACKEND=postgres).
+
+Questions live in the same database as ``users``, so banks can grow or change
+without a redeploy. Every row has two precomputed dense positions:
+
+* ``pos``, its index within its (grade, subject, difficulty) stratum;
+* ``grade_pos``, its index within the whole (grade, subject).
+
+Sampling doesn't use ``ORDER BY random()``. Random positions are drawn in
+Python, exactly as the CSV banks draw random ids, from per-stratum counts that
+are cached for QUESTION_COUNTS_TTL seconds. They are then fetched with
+``pos = ANY(...)`` lookups on the (grade, subject, difficulty, pos) index.
+A test costs one round trip that reads about 20 rows, however large the bank
+is. Each question is equally likely, which probing a random key column
+wouldn't give.
+
+The same query also fetches fill candidates by ``grade_pos``. As with the CSV
+banks, duplicate questions are dropped and a short test is topped up from the
+whole grade, or left short if the grade doesn't have enough distinct questions.
+
+Import CSVs with COPY into a staging table; duplicates are skipped and the
+positions renumbered:
+
+    python backend/question_store.py import data/grade*_v2.csv [--subject science]
+    python backend/question_store.py renumber    # after editing rows by hand
+"""
+import csv
+import io
+import json
+import os
+import random
+import re
+import threading
+import time
+
+from metrics import STAGE_SECONDS
+from question_bank import DEFAULT_MIX, REQUIRED_COLUMNS, QuestionBankError
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS questions (
+    id SERIAL PRIMARY KEY,
+    grade INT NOT NULL,
+    subject VARCHAR(50) NOT NULL DEFAULT '',
+    difficulty VARCHAR(20) NOT NULL,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    extra JSONB NOT NULL DEFAULT '{}',
+    pos INT,
+    grade_pos INT,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS questions_stratum_idx ON questions (grade, subject, difficulty, pos);
+CREATE INDEX IF NOT EXISTS questions_grade_idx ON questions (grade, subject, grade_pos);
+CREATE UNIQUE INDEX IF NOT EXISTS questions_unique_idx ON questions (grade, subject, md5(question));
+"""
+
+RENUMBER = """
+UPDATE questions q SET pos = r.pos, grade_pos = r.grade_pos
+FROM (
+    SELECT id,
+           row_number() OVER (PARTITION BY difficulty ORDER BY id) - 1 AS pos,
+           row_number() OVER (ORDER BY id) - 1 AS grade_pos
+    FROM questions WHERE grade = %s AND subject = %s
+) r
+WHERE q.id = r.id AND (q.pos IS DISTINCT FROM r.pos OR q.grade_pos IS DISTINCT FROM r.grade_pos)
+"""
+
+# Fill candidates fetched per test question, so duplicates and the questions
+# already picked can be skipped without a second round trip
+FILL_CANDIDATES = 4
+COLUMNS = "difficulty, question, answer, extra"
+_GRADE_RE = re.compile(r"grade(\d+)", re.IGNORECASE)
+
+
+def as_record(difficulty, question, answer, extra):
+    """The row in the shape the CSV banks return (CSV columns as keys)."""
+    record = dict(extra or {})
+    record.update({"Difficulty": difficulty, "Question": question, "Answer": answer})
+    return record
+
+
+class PostgresQuestionBank:
+    def __init__(self, pool, subject="", counts_ttl=60.0):
+        self.pool = pool
+        self.subject = subject
+        self.counts_ttl = counts_ttl
+        self._counts = {}  # grade -> (loaded_at, {difficulty: count})
+        self._lock = threading.Lock()
+
+    def _query(self, sql, params):
+        with STAGE_SECONDS.time(stage="db_checkout"):
+            conn = self.pool.getconn()
+        try:
+            with conn.cursor() as cursor:
+                with STAGE_SECONDS.time(stage="db_query"):
+                    cursor.execute(sql, params)
+                    return cursor.fetchall()
+        finally:
+            self.pool.putconn(conn)
+
+    def counts(self, grade):
+        """Questions per difficulty, cached for ``counts_ttl`` seconds."""
+        cached = self._counts.get(grade)
+        if cached is not None and time.monotonic() - cached[0] < self.counts_ttl:
+            return cached[1]
+        rows = self._query(
+            "SELECT difficulty, COUNT(*) FROM questions "
+            "WHERE grade = %s AND subject = %s AND pos IS NOT NULL GROUP BY difficulty",
+            (grade, self.subject),
+        )
+        counts = {level: count for level, count in rows}
+        with self._lock:
+            self._counts[grade] = (time.monotonic(), counts)
+        return counts
+
+    def sample(self, grade, mix=DEFAULT_MIX, total=5):
+        """Stratified sample: ``mix`` per difficulty, de-duplicated and topped up to ``total``."""
+        counts = self.counts(grade)
+        grade_count = sum(counts.values())
+        if not grade_count:
+            raise QuestionBankError(f"No questions found for grade {grade}; "
+                                    "import them with `python backend/question_store.py import`")
+
+        parts = []
+        params = []
+        for level, n in mix:
+            available = counts.get(level, 0)
+            if available:
+                parts.append(f"(SELECT %s, pos, {COLUMNS} FROM questions "
+                             "WHERE grade = %s AND subject = %s AND difficulty = %s AND pos = ANY(%s))")
+                params.extend([level, grade, self.subject, level, random.sample(range(available), min(n, available))])
+        fill_positions = random.sample(range(grade_count), min(grade_count, total * FILL_CANDIDATES))
+        parts.append(f"(SELECT '', grade_pos, {COLUMNS} FROM questions "
+                     "WHERE grade = %s AND subject = %s AND grade_pos = ANY(%s))")
+        params.extend([grade, self.subject, fill_positions])
+
+        by_part = {}
+        for part, position, *row in self._query(" UNION ALL ".join(parts), params):
+            by_part.setdefault(part, {})[position] = as_record(*row)
+
+        selected = []
+        seen_questions = set()
+        for level, _ in mix:
+            for question in by_part.get(level, {}).values():
+                if question["Question"] not in seen_questions:
+                    seen_questions.add(question["Question"])
+                    selected.append(question)
+
+        needed = total - len(selected)
+        if needed > 0:
+            candidates = by_part.get("", {})
+            selected.extend(self._fill([candidates[p] for p in fill_positions if p in candidates],
+                                       seen_questions, needed))
+
+        random.shuffle(selected)
+        return selected
+
+    @staticmethod
+    def _fill(candidates, used_questions, needed):
+        """Pick ``needed`` candidates not already used, or none if there aren't enough."""
+        picked = []
+        picked_questions = set()
+        for question in candidates:
+            text = question["Question"]
+            if text in used_questions or text in picked_questions:
+                continue
+            picked.append(question)
+            picked_questions.add(text)
+            if len(picked) == needed:
+                return picked
+        return []
+
+
+def read_rows(path):
+    with open(path, newline='', encoding='utf-8') as f:
+        reader = csv.DictReader(f)
+        columns = list(reader.fieldnames or [])
+        missing_columns = [col for col in REQUIRED_COLUMNS if col not in columns]
+        if missing_columns:
+            raise QuestionBankError(f"Missing columns in {path}: {missing_columns}. Available columns: {columns}")
+        for row in reader:
+            extra = {key: value for key, value in row.items() if key and key not in REQUIRED_COLUMNS}
+            yield row["Difficulty"], row["Question"], row["Answer"], extra
+
+
+def import_csv(conn, path, grade, subject="", chunk_size=10000):
+    """COPY one CSV into the questions table and renumber; returns (rows read, rows inserted)."""
+    read = inserted = 0
+    with conn.cursor() as cursor:
+        cursor.execute("CREATE TEMP TABLE IF NOT EXISTS questions_import (grade INT, subject VARCHAR(50), "
+                       "difficulty VARCHAR(20), question TEXT, answer TEXT, extra JSONB)")
+        rows = read_rows(path)
+        while True:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            count = 0
+            for difficulty, question, answer, extra in rows:
+                writer.writerow([grade, subject, difficulty, question, answer, json.dumps(extra)])
+                count += 1
+                if count == chunk_size:
+                    break
+            if count == 0:
+                break
+            buffer.seek(0)
+            cursor.execute("TRUNCATE questions_import")
+            cursor.copy_expert("COPY questions_import FROM STDIN WITH (FORMAT csv)", buffer)
+            cursor.execute(
+                "INSERT INTO questions (grade, subject, difficulty, question, answer, extra) "
+                "SELECT grade, subject, difficulty, question, answer, extra FROM questions_import "
+                "ON CONFLICT DO NOTHING"
+            )
+            read += count
+            inserted += cursor.rowcount
+        cursor.execute(RENUMBER, (grade, subject))
+    conn.commit()
+    return read, inserted
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import psycopg2
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Manage the Postgres question bank.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    importer = commands.add_parser("import", help="COPY question CSVs into the questions table")
+    importer.add_argument("paths", nargs="+")
+    importer.add_argument("--grade", type=int, help="default: the number in the file name (grade5_v2.csv -> 5)")
+    importer.add_argument("--subject", default="")
+    renumber = commands.add_parser("renumber", help="recompute sampling positions after manual edits")
+    renumber.add_argument("--subject", default="")
+    args = parser.parse_args()
+
+    conn = psycopg2.connect(
+        host=os.getenv("DB_HOST"), database=os.getenv("DB_NAME"), user=os.getenv("DB_USER"),
+        password=os.getenv("DB_PASSWORD"), port=int(os.getenv("DB_PORT", 5432)),
+    )
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute(SCHEMA)
+        conn.commit()
+
+        if args.command == "import":
+            for path in args.paths:
+                grade = args.grade
+                if grade is None:
+                    match = _GRADE_RE.search(os.path.basename(path))
+                    if match is None:
+                        raise SystemExit(f"❌ No grade in {path}; pass --grade")
+                    grade = int(match.group(1))
+                started = time.perf_counter()
+                read, inserted = import_csv(conn, path, grade, args.subject)
+                print(f"✓ {path}: grade {grade}, {read} rows read, {inserted} new "
+                      f"in {time.perf_counter() - started:.2f}s")
+        else:
+            with conn.cursor() as cursor:
+                cursor.execute("SELECT DISTINCT grade FROM questions WHERE subject = %s", (args.subject,))
+                grades = [row[0] for row in cursor.fetchall()]
+                for grade in grades:
+                    cursor.execute(RENUMBER, (grade, args.subject))
+                    print(f"✓ Grade {grade}: {cursor.rowcount} positions updated")
+            conn.commit()
+    finally:
+        conn.close()
@@ -0,0 +1,286 @@
+"""Batch scoring engine for /calculate-score and offline regrading.
+
+Scores are identical to the original per-question functions: the same
+SequenceMatcher ratios and thresholds are used. What changes is how often they
+are computed:
+
+* each answer's overall similarity is computed once and shared by the
+  question, keyword, spelling and debug stages;
+* word-to-word fuzzy comparisons look each student token up once in the
+  question's FuzzyIndex (see fuzzy_index.py) instead of comparing every
+  keyword word with every student word.
+
+Offline usage:
+
+    python backend/scoring_engine.py answers.csv -o scored.csv \\
+        --ideal-column Answer --student-column student_answer
+"""
+import csv
+from difflib import SequenceMatcher
+from functools import lru_cache
+
+IDK_PHRASES = {"i don't know", "dont know", "no idea", ""}
+
+KEYWORD_TOP_K = 10
+
+
+def _ratio(a, b):
+    return SequenceMatcher(None, a, b).ratio()
+
+
+class AnswerContext:
+    """One (ideal, student) pair with its similarities computed at most once."""
+
+    __slots__ = ("ideal_answer", "student_answer", "_keyword_lookup", "_entry",
+                 "_similarity_clean", "_similarity_lower")
+
+    def __init__(self, ideal_answer, student_answer, keyword_lookup):
+        self.ideal_answer = ideal_answer
+        self.student_answer = student_answer
+        self._keyword_lookup = keyword_lookup
+        self._entry = None
+        self._similarity_clean = None
+        self._similarity_lower = None
+
+    @property
+    def entry(self):
+        if self._entry is None:
+            self._entry = self._keyword_lookup(self.ideal_answer)
+        return self._entry
+
+    @property
+    def similarity_clean(self):
+        """Similarity of the stripped, lowercased answers (question-level thresholds)."""
+        if self._similarity_clean is None:
+            ideal_clean = self.ideal_answer.strip().lower()
+            student_clean = self.student_answer.strip().lower()
+            if self._similarity_lower is not None and ideal_clean == self.ideal_answer.lower() \
+                    and student_clean == self.student_answer.lower():
+                self._similarity_clean = self._similarity_lower
+            else:
+                self._similarity_clean = _ratio(ideal_clean, student_clean)
+        return self._similarity_clean
+
+    @property
+    def similarity_lower(self):
+        """Similarity of the lowercased answers (keyword, spelling and debug stages)."""
+        if self._similarity_lower is None:
+            ideal_lower = self.ideal_answer.lower()
+            student_lower = self.student_answer.lower()
+            if self._similarity_clean is not None and ideal_lower == ideal_lower.strip() \
+                    and student_lower == student_lower.strip():
+                self._similarity_lower = self._similarity_clean
+            else:
+                self._similarity_lower = _ratio(ideal_lower, student_lower)
+        return self._similarity_lower
+
+
+def precheck(ctx):
+    """("empty" | "correct" | None, similarity) for unambiguous answers."""
+    student_answer = ctx.student_answer
+    if not student_answer or student_answer.strip().lower() in IDK_PHRASES:
+        return "empty", 0.0
+
+    if ctx.ideal_answer.strip().lower() == student_answer.strip().lower():
+        return "correct", 1.0
+
+    similarity = ctx.similarity_clean
+    if similarity >= 0.9:
+        return "correct", similarity
+    return None, similarity
+
+
+def keyword_score(ctx):
+    """Keyword coverage (0-1 marks)."""
+    entry = ctx.entry
+    keywords = entry.keywords[:KEYWORD_TOP_K]
+    if not keywords:
+        return 1.0
+
+    student_lower = ctx.student_answer.lower()
+    if student_lower.strip() == entry.ideal_lower.strip():
+        return 1.0
+    if ctx.similarity_lower >= 0.8:
+        return 1.0
+
+    near_words = None
+    matched_keywords = 0
+    for keyword, keyword_words in zip(keywords, entry.keyword_words):
+        if keyword in student_lower:
+            matched_keywords += 1
+            continue
+
+        if len(keyword_words) > 1:
+            found_words = sum(1 for word in keyword_words if word in student_lower)
+            if found_words >= len(keyword_words) * 0.7:
+                matched_keywords += 1
+        else:
+            if near_words is None:
+                near_words = entry.fuzzy.near_any(student_lower.split(), 0.8)
+            if keyword in near_words:
+                matched_keywords += 1
+
+    coverage_ratio = matched_keywords / len(keywords)
+    if coverage_ratio >= 0.6:
+        return 1.0
+    elif coverage_ratio >= 0.3:
+        return 0.5
+    return 0.0
+
+
+def spelling_score(ctx):
+    """Spelling accuracy of the important words (0-1 marks)."""
+    entry = ctx.entry
+    if not entry.keywords[:KEYWORD_TOP_K]:
+        return 1.0
+
+    student_lower = ctx.student_answer.lower()
+    if student_lower.strip() == entry.ideal_lower.strip():
+        return 1.0
+    if ctx.similarity_lower >= 0.85:
+        return 1.0
+
+    student_words = set(student_lower.split())
+    near_words = entry.fuzzy.near_any([word for word in student_words if len(word) >= 3], 0.75)
+    spelling_errors = 0
+    total_important_words = 0
+
+    for keyword_words in entry.keyword_words[:KEYWORD_TOP_K]:
+        for word in keyword_words:
+            if len(word) < 3:
+                continue
+            total_important_words += 1
+            if word in student_words:
+                continue
+            if word not in near_words:
+                spelling_errors += 1
+
+    if total_important_words == 0:
+        return 1.0
+
+    error_ratio = spelling_errors / total_important_words
+    if error_ratio <= 0.15:
+        return 1.0
+    elif error_ratio <= 0.4:
+        return 0.5
+    return 0.0
+
+
+def question_score(ctx):
+    """Total score for a question (0-2 marks)."""
+    verdict, similarity = precheck(ctx)
+    if verdict == "empty":
+        return 0.0
+    if verdict == "correct":
+        return 2.0
+
+    if similarity >= 0.8:
+        return 1.8
+    elif similarity >= 0.7:
+        return 1.5
+
+    return round(keyword_score(ctx) + spelling_score(ctx), 1)
+
+
+class ScoreResult:
+    __slots__ = ("score", "similarity", "semantic")
+
+    def __init__(self, score, similarity, semantic=None):
+        self.score = score
+        self.similarity = similarity
+        self.semantic = semantic
+
+
+def score_batch(pairs, keyword_lookup, semantic=None):
+    """Score an iterable of (ideal_answer, student_answer) pairs.
+
+    ``similarity`` is the rounded lowercase similarity reported in debug_info.
+    With a ``semantic`` scorer (embedding_store.SemanticScorer) all pairs are
+    embedded in one batch and the cosine is blended into every score the
+    precheck doesn't settle; ``semantic`` on the result is that cosine.
+    """
+    pairs = list(pairs)
+    cosines = None
+    if semantic is not None and pairs:
+        ideal_answers, student_answers = zip(*pairs)
+        cosines = semantic.similarities(ideal_answers, student_answers)
+
+    results = []
+    for i, (ideal_answer, student_answer) in enumerate(pairs):
+        ctx = AnswerContext(ideal_answer, student_answer, keyword_lookup)
+        score = question_score(ctx)
+        cosine = None
+        if cosines is not None:
+            cosine = round(float(cosines[i]), 3)
+            if precheck(ctx)[0] is None:
+                score = semantic.blend(score, cosine)
+        results.append(ScoreResult(score, round(ctx.similarity_lower, 3), cosine))
+    return results
+
+
+def score_csv(input_path, output_path, keyword_lookup, ideal_column="Answer",
+              student_column="student_answer", score_column="score"):
+    """Regrade a CSV of answers, writing it back out with a score column."""
+    with open(input_path, newline='', encoding='utf-8') as src, \
+            open(output_path, "w", newline='', encoding='utf-8') as dst:
+        reader = csv.DictReader(src)
+        fieldnames = list(reader.fieldnames or [])
+        if score_column not in fieldnames:
+            fieldnames.append(score_column)
+        writer = csv.DictWriter(dst, fieldnames=fieldnames)
+        writer.writeheader()
+
+        count = 0
+        for row in reader:
+            ctx = AnswerContext(row.get(ideal_column) or "", row.get(student_column) or "", keyword_lookup)
+            row[score_column] = question_score(ctx)
+            writer.writerow(row)
+            count += 1
+    return count
+
+
+def offline_keyword_lookup(build=True):
+    """Keyword lookup backed by the precompiled index, parsing unknown answers with spaCy.
+
+    With ``build=False`` a missing or stale index is not rebuilt (or written):
+    pool workers use this once the parent has prepared the index.
+    """
+    from keyword_extractor import KeywordExtractor
+    from keyword_index import KeywordEntry, KeywordIndex, get_keyword_index, is_index_fresh, load_keyword_index
+
+    extractor = KeywordExtractor()
+    if build:
+        index = get_keyword_index(extractor)
+    else:
+        try:
+            index = load_keyword_index() if is_index_fresh() else KeywordIndex()
+        except Exception as e:
+            print(f"❌ Error loading keyword index: {e}")
+            index = KeywordIndex()
+
+    @lru_cache(maxsize=4096)
+    def lookup(ideal_answer):
+        entry = index.get(ideal_answer)
+        if entry is None:
+            entry = KeywordEntry(ideal_answer, extractor.extract(ideal_answer, top_k=KEYWORD_TOP_K))
+        return entry
+
+    return lookup
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Score a CSV of student answers.")
+    parser.add_argument("input")
+    parser.add_argument("-o", "--output", required=True)
+    parser.add_argument("--ideal-column", default="Answer")
+    parser.add_argument("--student-column", default="student_answer")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    rows = score_csv(args.input, args.output, offline_keyword_lookup(),
+                     ideal_column=args.ideal_column, student_column=args.student_column)
+    elapsed = time.perf_counter() - started
+    print(f"✓ Scored {rows} answers in {elapsed:.2f}s -> {args.output}")
@@ -0,0 +1,217 @@
+"""Static frontend assets served from an in-memory, content-hashed manifest.
+
+At startup (or on first use) every file under frontend/ is read once and gets:
+
+* a fingerprinted name, e.g. styles/login.3f9a1c2b7d.css, that the HTML and
+  CSS references are rewritten to, so those URLs can be cached as immutable;
+* a strong ETag from its content hash, for 304 answers to conditional requests;
+* gzip and, if the optional ``brotli`` package is installed, brotli variants
+  for compressible types, kept only when they are actually smaller.
+
+HTML pages keep their names and are served with ``no-cache`` so a deploy is
+picked up on the next load, while everything they reference is cached for a
+year under its fingerprinted name.
+
+    python backend/static_assets.py    # print the manifest
+"""
+import gzip
+import hashlib
+import mimetypes
+import os
+import posixpath
+import re
+import threading
+
+try:
+    import brotli
+except ImportError:  # optional: gzip only
+    brotli = None
+
+COMPRESSIBLE_TYPES = ("text/", "application/javascript", "application/json", "image/svg+xml")
+MIN_COMPRESS_SIZE = 512
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "no-cache"
+
+HTML_REF_RE = re.compile(r'(\b(?:href|src)=")([^"#?:]+)(")')
+CSS_URL_RE = re.compile(r'(url\(\s*[\'"]?)([^\'")#?:]+)([\'"]?\s*\))')
+
+
+class StaticAsset:
+    __slots__ = ("path", "hashed_path", "content_type", "etag", "variants")
+
+    def __init__(self, path, hashed_path, content_type, etag, variants):
+        self.path = path
+        self.hashed_path = hashed_path
+        self.content_type = content_type
+        self.etag = etag
+        self.variants = variants  # encoding ("identity", "br", "gzip") -> bytes
+
+    def to_json(self):
+        return {
+            "hashed_path": self.hashed_path,
+            "content_type": self.content_type,
+            "etag": self.etag,
+            "sizes": {encoding: len(body) for encoding, body in self.variants.items()},
+        }
+
+
+def content_type_for(path):
+    content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+    if content_type.startswith("text/") or content_type == "application/javascript":
+        content_type += "; charset=utf-8"
+    return content_type
+
+
+def fingerprint(path, digest):
+    root, ext = posixpath.splitext(path)
+    return f"{root}.{digest[:10]}{ext}"
+
+
+def compressed_variants(body, content_type):
+    variants = {"identity": body}
+    if len(body) < MIN_COMPRESS_SIZE or not content_type.startswith(COMPRESSIBLE_TYPES):
+        return variants
+    if brotli is not None:
+        compressed = brotli.compress(body, quality=11)
+        if len(compressed) < len(body):
+            variants["br"] = compressed
+    compressed = gzip.compress(body, compresslevel=9, mtime=0)
+    if len(compressed) < len(body):
+        variants["gzip"] = compressed
+    return variants
+
+
+def parse_accept_encoding(header):
+    """Encodings the client accepts (q > 0), lower-cased."""
+    accepted = set()
+    for part in (header or "").split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name and q > 0:
+            accepted.add(name.strip().lower())
+    return accepted
+
+
+class StaticAssets:
+    def __init__(self, root):
+        self.root = root
+        self._lock = threading.Lock()
+        self._by_path = None
+        self._by_hashed = None
+
+    def _read_tree(self):
+        files = {}
+        for dirpath, _, filenames in os.walk(self.root):
+            for filename in filenames:
+                full = os.path.join(dirpath, filename)
+                path = os.path.relpath(full, self.root).replace(os.sep, "/")
+                with open(full, "rb") as f:
+                    files[path] = f.read()
+        return files
+
+    def _rewrite(self, path, text, pattern, hashed_names):
+        base = posixpath.dirname(path)
+
+        def replace(match):
+            target = posixpath.normpath(posixpath.join(base, match.group(2)))
+            hashed = hashed_names.get(target)
+            if hashed is None or target.endswith(".html"):
+                return match.group(0)
+            return match.group(1) + posixpath.relpath(hashed, base or ".") + match.group(3)
+
+        return pattern.sub(replace, text)
+
+    def build(self):
+        """Read the tree and build the manifest; safe to call again to reload."""
+        files = self._read_tree()
+        # Fingerprint leaves first, then CSS (which references images), then HTML
+        order = sorted(files, key=lambda p: (p.endswith(".html"), p.endswith(".css"), p))
+        hashed_names = {}
+        by_path, by_hashed = {}, {}
+        for path in order:
+            body = files[path]
+            if path.endswith(".css"):
+                body = self._rewrite(path, body.decode("utf-8"), CSS_URL_RE, hashed_names).encode("utf-8")
+            elif path.endswith(".html"):
+                body = self._rewrite(path, body.decode("utf-8"), HTML_REF_RE, hashed_names).encode("utf-8")
+
+            digest = hashlib.sha256(body).hexdigest()
+            hashed_path = path if path.endswith(".html") else fingerprint(path, digest)
+            hashed_names[path] = hashed_path
+            content_type = content_type_for(path)
+            asset = StaticAsset(path, hashed_path, content_type, f'"{digest[:32]}"',
+                                compressed_variants(body, content_type))
+            by_path[path] = asset
+            by_hashed[hashed_path] = asset
+
+        with self._lock:
+            self._by_path, self._by_hashed = by_path, by_hashed
+        return by_path
+
+    @property
+    def manifest(self):
+        if self._by_path is None:
+            self.build()
+        return self._by_path
+
+    def lookup(self, path):
+        """(asset, fingerprinted) for a request path, or (None, False)."""
+        path = path.lstrip("/")
+        manifest = self.manifest
+        asset = self._by_hashed.get(path)
+        if asset is not None and asset.hashed_path != asset.path:
+            return asset, True
+        return manifest.get(path), False
+
+    def respond(self, path, accept_encoding=None, if_none_match=None):
+        """(status, headers, body) for a request path, or None if unknown.
+
+        ``if_none_match`` is a callable taking an ETag, e.g. request.if_none_match.contains.
+        """
+        asset, fingerprinted = self.lookup(path)
+        if asset is None:
+            return None
+
+        accepted = parse_accept_encoding(accept_encoding)
+        encoding = next((e for e in ("br", "gzip") if e in asset.variants and e in accepted), "identity")
+        etag = asset.etag if encoding == "identity" else f'{asset.etag[:-1]}-{encoding}"'
+        headers = {
+            "Content-Type": asset.content_type,
+            "ETag": etag,
+            "Cache-Control": IMMUTABLE if fingerprinted else REVALIDATE,
+        }
+        if len(asset.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+
+        if if_none_match is not None and if_none_match(etag.strip('"')):
+            return 304, headers, b""
+
+        body = asset.variants[encoding]
+        if encoding != "identity":
+            headers["Content-Encoding"] = encoding
+        headers["Content-Length"] = str(len(body))
+        return 200, headers, body
+
+    def stats(self):
+        manifest = self._by_path or {}
+        return {
+            "built": self._by_path is not None,
+            "assets": len(manifest),
+            "identity_bytes": sum(len(a.variants["identity"]) for a in manifest.values()),
+            "brotli": brotli is not None,
+        }
+
+
+if __name__ == "__main__":
+    import json
+
+    frontend_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "frontend"))
+    assets = StaticAssets(frontend_dir)
+    manifest = assets.build()
+    print(json.dumps({path: asset.to_json() for path, asset in sorted(manifest.items())}, indent=2))
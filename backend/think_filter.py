@@ -0,0 +1,68 @@
+"""Incremental removal of <think>...</think> blocks from streamed completions.
+
+``clean_response`` strips the reasoning block with a regex once the whole
+completion has arrived. ThinkFilter does the same job token by token so the
+visible part of the answer can be forwarded as soon as it is generated, even
+when a tag is split across chunks.
+"""
+
+OPEN_TAG = "<think>"
+CLOSE_TAG = "</think>"
+
+
+def _partial_tag_length(text, tag):
+    """Length of the longest suffix of ``text`` that is a proper prefix of ``tag``."""
+    for length in range(min(len(text), len(tag) - 1), 0, -1):
+        if text.endswith(tag[:length]):
+            return length
+    return 0
+
+
+class ThinkFilter:
+    def __init__(self):
+        self.inside = False
+        self.started = False  # becomes True once visible non-whitespace was emitted
+        self._buffer = ""
+
+    def feed(self, chunk):
+        """Consume a chunk of model output and return the visible part of it."""
+        self._buffer += chunk
+        visible = []
+
+        while self._buffer:
+            if self.inside:
+                end = self._buffer.find(CLOSE_TAG)
+                if end == -1:
+                    # Drop reasoning text but keep a possible partial closing tag
+                    keep = _partial_tag_length(self._buffer, CLOSE_TAG)
+                    self._buffer = self._buffer[len(self._buffer) - keep:] if keep else ""
+                    break
+                self._buffer = self._buffer[end + len(CLOSE_TAG):]
+                self.inside = False
+            else:
+                start = self._buffer.find(OPEN_TAG)
+                if start == -1:
+                    keep = _partial_tag_length(self._buffer, OPEN_TAG)
+                    cut = len(self._buffer) - keep
+                    visible.append(self._buffer[:cut])
+                    self._buffer = self._buffer[cut:]
+                    break
+                visible.append(self._buffer[:start])
+                self._buffer = self._buffer[start + len(OPEN_TAG):]
+                self.inside = True
+
+        return self._emit("".join(visible))
+
+    def flush(self):
+        """Return whatever visible text is still buffered at the end of the stream."""
+        remaining = "" if self.inside else self._buffer
+        self._buffer = ""
+        return self._emit(remaining)
+
+    def _emit(self, text):
+        # Match clean_response(): no leading whitespace before the first visible token
+        if not self.started:
+            text = text.lstrip()
+            if text:
+                self.started = True
+        return text
@@ -0,0 +1,91 @@
+"""Keyword extraction benchmark: docs/sec and peak RSS per mode.
+
+Compares the original extract_keywords (full en_core_web_sm pipeline, one
+nlp() call per text) against the trimmed, batched KeywordExtractor, optionally
+with several worker processes. Each mode runs in its own subprocess so the RSS
+numbers don't contaminate each other.
+
+    python benchmarks/bench_keywords.py [--repeat 5] [--processes 2]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.join(ROOT_DIR, "backend"))
+
+
+def load_texts(repeat):
+    from keyword_index import iter_bank_rows
+
+    answers = [answer for _, answer in iter_bank_rows(os.path.join(ROOT_DIR, "data"))]
+    return answers * repeat
+
+
+def peak_rss_mb():
+    # ru_maxrss is KiB on Linux, bytes on macOS
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_mode(mode, repeat, processes):
+    texts = load_texts(repeat)
+
+    if mode == "original":
+        import spacy
+        from keyword_index import keywords_from_doc
+
+        nlp = spacy.load("en_core_web_sm")
+        started = time.perf_counter()
+        results = [keywords_from_doc(nlp(text)) for text in texts]
+    else:
+        from keyword_extractor import KeywordExtractor
+
+        extractor = KeywordExtractor(n_process=processes if mode == "multiprocess" else 1)
+        # Load outside the timed section, like the original mode
+        if not extractor.available:
+            raise SystemExit(f"spaCy model unavailable: {extractor.load_error}")
+        started = time.perf_counter()
+        results = extractor.extract_many(texts)
+
+    elapsed = time.perf_counter() - started
+    return {
+        "mode": mode,
+        "docs": len(results),
+        "seconds": round(elapsed, 3),
+        "docs_per_sec": round(len(results) / elapsed, 1) if elapsed else None,
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="times to repeat the bundled answers")
+    parser.add_argument("--processes", type=int, default=2, help="workers for the multiprocess mode")
+    parser.add_argument("--mode", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.repeat, args.processes)))
+        return
+
+    results = []
+    for mode in ("original", "batched", "multiprocess"):
+        output = subprocess.run(
+            [sys.executable, __file__, "--mode", mode, "--repeat", str(args.repeat),
+             "--processes", str(args.processes)],
+            check=True, capture_output=True, text=True,
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"{'mode':<14}{'docs':>8}{'seconds':>10}{'docs/sec':>12}{'peak RSS MB':>14}")
+    for r in results:
+        print(f"{r['mode']:<14}{r['docs']:>8}{r['seconds']:>10}{r['docs_per_sec']:>12}{r['peak_rss_mb']:>14}")
+
+
+if __name__ == "__main__":
+    main()
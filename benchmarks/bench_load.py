@@ -0,0 +1,267 @@
+"""Macro load test: a class of students starting a test at the same time.
+
+Starts the LLM stub and a stubbed app server (bench_server.py), registers the
+students, then runs a scenario with one thread per student:
+
+* class-start    - students arrive over --ramp seconds; each logs in, fetches
+                   questions, answers all five (think time between answers,
+                   feedback after each) and submits for a score.
+* feedback-burst - every student submits an answer to the same question at
+                   once (cache, coalescing and admission under a spike).
+
+Per-endpoint p50/p95/p99 latencies go to benchmarks/results/load-<scenario>.json.
+
+    python benchmarks/bench_load.py --students 30 --ramp 10 --latency 2 --error-rate 0.02
+    python benchmarks/bench_load.py --scenario feedback-burst --students 60 --stream
+    python benchmarks/bench_load.py --base-url http://127.0.0.1:8080   # existing server
+"""
+import argparse
+import os
+import random
+import socket
+import subprocess
+import sys
+import threading
+import time
+import uuid
+
+import requests
+
+from common import answer_variants, print_table, summarize, write_results
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ANSWER_KINDS = (("exact", 0.15), ("typos", 0.25), ("partial", 0.35), ("wrong", 0.15), ("idk", 0.10))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def wait_for(url, timeout=60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(url, timeout=2).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    raise SystemExit(f"❌ {url} did not become ready within {timeout:.0f}s")
+
+
+class Recorder:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.latencies = {}
+        self.errors = {}
+        self.rejected = 0
+
+    def record(self, name, seconds, ok=True):
+        with self._lock:
+            self.latencies.setdefault(name, [])
+            self.errors.setdefault(name, 0)
+            if ok:
+                self.latencies[name].append(seconds)
+            else:
+                self.errors[name] += 1
+
+    def call(self, session, name, path, base_url, payload):
+        started = time.perf_counter()
+        try:
+            response = session.post(base_url + path, json=payload, timeout=180)
+        except requests.RequestException:
+            self.record(name, time.perf_counter() - started, ok=False)
+            return None
+        elapsed = time.perf_counter() - started
+        if response.status_code == 429:
+            with self._lock:
+                self.rejected += 1
+        self.record(name, elapsed, ok=response.ok)
+        return response.json() if response.ok else None
+
+    def stream(self, session, base_url, payload):
+        """POST to the SSE endpoint, recording time to first token and to completion."""
+        started = time.perf_counter()
+        first = None
+        try:
+            with session.post(base_url + "/generate-feedback/stream", json=payload, stream=True, timeout=180) as response:
+                if response.status_code == 429:
+                    with self._lock:
+                        self.rejected += 1
+                if not response.ok:
+                    self.record("feedback_stream_total", time.perf_counter() - started, ok=False)
+                    return
+                for line in response.iter_lines(decode_unicode=True):
+                    if first is None and line.startswith("data:") and '"token"' in line:
+                        first = time.perf_counter() - started
+        except requests.RequestException:
+            self.record("feedback_stream_total", time.perf_counter() - started, ok=False)
+            return
+        if first is not None:
+            self.record("feedback_stream_first_token", first)
+        self.record("feedback_stream_total", time.perf_counter() - started)
+
+
+def pick_answer(question, rng):
+    variants = answer_variants(question.get("Answer", ""), rng)
+    kind = rng.choices([k for k, _ in ANSWER_KINDS], weights=[w for _, w in ANSWER_KINDS])[0]
+    return variants[kind]
+
+
+def register_students(base_url, count, grades, run_id):
+    students = []
+    with requests.Session() as session:
+        for n in range(count):
+            username = f"bench-{run_id}-{n}"
+            password = f"pw-{n}"
+            response = session.post(base_url + "/register", timeout=30, json={
+                "username": username, "password": password, "grade": grades[n % len(grades)],
+            })
+            if not response.ok:
+                raise SystemExit(f"❌ Could not register {username}: {response.status_code} {response.text[:200]}")
+            students.append((username, password))
+    return students
+
+
+def feedback_request(recorder, session, base_url, args, question, answer, username):
+    payload = {"question": question["Question"], "ideal_answer": question["Answer"],
+               "student_answer": answer, "username": username}
+    if args.stream:
+        recorder.stream(session, base_url, payload)
+    else:
+        recorder.call(session, "generate_feedback", "/generate-feedback", base_url, payload)
+
+
+def class_start_student(recorder, base_url, args, student, delay, seed):
+    rng = random.Random(seed)
+    username, password = student
+    time.sleep(delay)
+    started = time.perf_counter()
+    with requests.Session() as session:
+        login = recorder.call(session, "login", "/login", base_url, {"username": username, "password": password})
+        if login is None:
+            return
+        data = recorder.call(session, "get_questions", "/get-questions", base_url, {"token": login.get("token"), "username": username})
+        if not data:
+            return
+        questions = data["questions"]
+        answers = []
+        for question in questions:
+            time.sleep(rng.uniform(0, 2 * args.think_time))
+            answer = pick_answer(question, rng)
+            answers.append(answer)
+            feedback_request(recorder, session, base_url, args, question, answer, username)
+        recorder.call(session, "calculate_score", "/calculate-score", base_url,
+                      {"questions": questions, "answers": answers})
+    recorder.record("student_session", time.perf_counter() - started)
+
+
+def feedback_burst_student(recorder, base_url, args, student, question, barrier, seed):
+    rng = random.Random(seed)
+    answer = pick_answer(question, rng)
+    with requests.Session() as session:
+        barrier.wait()
+        feedback_request(recorder, session, base_url, args, question, answer, student[0])
+
+
+def run_scenario(args, base_url, students):
+    recorder = Recorder()
+    rng = random.Random(args.seed)
+    threads = []
+    if args.scenario == "class-start":
+        for n, student in enumerate(students):
+            delay = rng.uniform(0, args.ramp)
+            threads.append(threading.Thread(target=class_start_student,
+                                            args=(recorder, base_url, args, student, delay, args.seed + n)))
+    else:
+        with requests.Session() as session:
+            username = students[0][0]
+            question = session.post(base_url + "/get-questions", json={"username": username}, timeout=30).json()["questions"][0]
+        barrier = threading.Barrier(len(students))
+        for n, student in enumerate(students):
+            threads.append(threading.Thread(target=feedback_burst_student,
+                                            args=(recorder, base_url, args, student, question, barrier, args.seed + n)))
+
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    results = {
+        name: summarize(latencies, recorder.errors.get(name, 0), elapsed)
+        for name, latencies in sorted(recorder.latencies.items())
+    }
+    return results, elapsed, recorder.rejected
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scenario", choices=("class-start", "feedback-burst"), default="class-start")
+    parser.add_argument("--students", type=int, default=30)
+    parser.add_argument("--grades", default="5,6,7")
+    parser.add_argument("--ramp", type=float, default=10.0, help="seconds over which students arrive")
+    parser.add_argument("--think-time", type=float, default=1.0, help="mean seconds between answers")
+    parser.add_argument("--stream", action="store_true", help="use /generate-feedback/stream")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--base-url", help="target a running server instead of starting one")
+    parser.add_argument("--mode", choices=("wsgi", "asgi"), default="wsgi")
+    parser.add_argument("--postgres", action="store_true")
+    # LLM stub behaviour
+    parser.add_argument("--latency", type=float, default=1.0)
+    parser.add_argument("--jitter", type=float, default=0.3)
+    parser.add_argument("--think-words", type=int, default=200)
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("-o", "--output")
+    args = parser.parse_args()
+
+    processes = []
+    stub_url = None
+    try:
+        base_url = args.base_url
+        if base_url is None:
+            stub_port, app_port = free_port(), free_port()
+            stub_url = f"http://127.0.0.1:{stub_port}"
+            processes.append(subprocess.Popen([
+                sys.executable, os.path.join(HERE, "llm_stub.py"), "--port", str(stub_port),
+                "--latency", str(args.latency), "--jitter", str(args.jitter),
+                "--think-words", str(args.think_words), "--tokens-per-second", str(args.tokens_per_second),
+                "--error-rate", str(args.error_rate), "--seed", str(args.seed),
+            ]))
+            server = [sys.executable, os.path.join(HERE, "bench_server.py"), "--port", str(app_port),
+                      "--llm-url", f"{stub_url}/v1/chat/completions", "--mode", args.mode]
+            if args.postgres:
+                server.append("--postgres")
+            processes.append(subprocess.Popen(server))
+            base_url = f"http://127.0.0.1:{app_port}"
+            wait_for(f"{stub_url}/stats")
+        wait_for(f"{base_url}/health")
+
+        grades = [int(g) for g in args.grades.split(",")]
+        students = register_students(base_url, args.students, grades, uuid.uuid4().hex[:8])
+        print(f"✓ Registered {len(students)} students, running {args.scenario}")
+
+        results, elapsed, rejected = run_scenario(args, base_url, students)
+        health = requests.get(f"{base_url}/health", timeout=10).json()
+        stub_stats = requests.get(f"{stub_url}/stats", timeout=10).json() if stub_url else None
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+    config.update({"elapsed_seconds": round(elapsed, 3), "rejected_429": rejected, "llm_stub": stub_stats,
+                   "server": {key: health.get(key) for key in ("feedback_cache", "feedback_coalescing",
+                                                                "feedback_fast_path", "llm_admission", "llm_client")}})
+    print_table(results)
+    output = write_results(f"load-{args.scenario}", config, results, args.output)
+    print(f"✓ {args.scenario}: {elapsed:.1f}s, {rejected} rejected, results -> {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Micro-benchmarks for the scoring and keyword functions in backend/app.py.
+
+Every bank row is paired with five student answers (exact, typos, partial,
+wrong, "I don't know") and each function is timed per call:
+
+* extract_keywords          - keyword lookup for the ideal answer (index hit)
+* extract_keywords_uncached - the same text parsed with spaCy
+* calculate_keyword_score / calculate_spelling_score / calculate_question_score
+
+Results go to benchmarks/results/micro.json.
+
+    python benchmarks/bench_micro.py [--repeat 3] [--limit 200]
+"""
+import argparse
+import os
+import time
+
+from common import print_table, sample_answers, summarize, write_results
+
+
+def time_calls(fn, argument_lists, repeat):
+    latencies = []
+    errors = 0
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for arguments in argument_lists:
+            call_started = time.perf_counter()
+            try:
+                fn(*arguments)
+            except Exception:
+                errors += 1
+                continue
+            latencies.append(time.perf_counter() - call_started)
+    return summarize(latencies, errors, time.perf_counter() - started)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--limit", type=int, help="only use the first N answers")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("-o", "--output")
+    args = parser.parse_args()
+
+    os.environ.setdefault("WARM_UP", "0")
+    os.environ.setdefault("SESSION_SECRET", "benchmark")
+    import app
+
+    rows = sample_answers(args.seed)[: args.limit]
+    ideal_answers = list(dict.fromkeys(ideal for _, ideal, _, _ in rows))
+    pairs = [(ideal, student) for _, ideal, student, _ in rows]
+
+    # Load the index and the model outside the timed sections
+    app.warm_up(include_db=False)
+
+    results = {
+        "extract_keywords": time_calls(app.extract_keywords, [(text,) for text in ideal_answers], args.repeat),
+        "extract_keywords_uncached": time_calls(app.KEYWORD_EXTRACTOR.extract,
+                                                [(text, 5) for text in ideal_answers], args.repeat),
+        "calculate_keyword_score": time_calls(app.calculate_keyword_score, pairs, args.repeat),
+        "calculate_spelling_score": time_calls(app.calculate_spelling_score, pairs, args.repeat),
+        "calculate_question_score": time_calls(app.calculate_question_score, pairs, args.repeat),
+    }
+
+    config = {
+        "repeat": args.repeat,
+        "answers": len(pairs),
+        "ideal_answers": len(ideal_answers),
+        "keyword_index": len(app.keyword_index()),
+        "spacy": app.KEYWORD_EXTRACTOR.loaded,
+    }
+    print_table(results)
+    output = write_results("micro", config, results, args.output)
+    print(f"✓ Results -> {output}")
+
+
+if __name__ == "__main__":
+    main()
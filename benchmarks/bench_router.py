@@ -0,0 +1,165 @@
+"""Model router under a changing upstream: a reasoning model and a fast model
+served by one multi-model LLM stub.
+
+Starts the stub and a stubbed app server (bench_server.py), then sends
+/generate-feedback requests (typo, partial and wrong answers across Easy,
+Medium and Hard) with a per-request deadline, in three phases:
+
+* normal    - both models at their configured latency;
+* slow      - the reasoning model is --slow-factor times slower (POST /configure);
+* recovered - the reasoning model is restored and, after the router's sample
+              window has aged out, gets traffic again.
+
+Per phase: p50/p95/p99 latency, deadline misses and how requests were routed
+(model:reason counts from /health). Results go to benchmarks/results/router.json.
+
+    python benchmarks/bench_router.py --requests 60 --concurrency 6
+    python benchmarks/bench_router.py --reasoning-latency 3 --slow-factor 5 --deadline-ms 8000
+"""
+import argparse
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+from bench_load import free_port, wait_for
+from common import answer_variants, bank_questions, print_table, summarize, write_results
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REASONING_MODEL = "stub-reasoning"
+FAST_MODEL = "stub-fast"
+ANSWER_KINDS = ("typos", "partial", "wrong")
+DIFFICULTIES = ("Easy", "Medium", "Hard")
+
+
+def route_counts(base_url):
+    return requests.get(f"{base_url}/health", timeout=10).json()["model_router"]["routes"]
+
+
+def run_phase(args, base_url, items, rng):
+    """Send ``args.requests`` feedback requests; returns (latencies, errors, deadline misses)."""
+    latencies = []
+    errors = 0
+    misses = 0
+    lock = threading.Lock()
+    work = [rng.choice(items) for _ in range(args.requests)]
+    deadline = args.deadline_ms / 1000
+
+    def worker():
+        nonlocal errors, misses
+        session = requests.Session()
+        while True:
+            with lock:
+                if not work:
+                    return
+                question, ideal_answer, student_answer, difficulty = work.pop()
+            payload = {"question": question, "ideal_answer": ideal_answer, "difficulty": difficulty,
+                       # A fresh answer each time, so the feedback cache can't answer it
+                       "student_answer": f"{student_answer} {rng.random():.6f}",
+                       "deadline_ms": args.deadline_ms}
+            started = time.perf_counter()
+            try:
+                ok = session.post(f"{base_url}/generate-feedback", json=payload, timeout=120).status_code == 200
+            except requests.RequestException:
+                ok = False
+            elapsed = time.perf_counter() - started
+            with lock:
+                if ok:
+                    latencies.append(elapsed)
+                    misses += elapsed > deadline
+                else:
+                    errors += 1
+
+    threads = [threading.Thread(target=worker) for _ in range(args.concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, errors, misses
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=60, help="feedback requests per phase")
+    parser.add_argument("--concurrency", type=int, default=6)
+    parser.add_argument("--deadline-ms", type=int, default=6000)
+    parser.add_argument("--reasoning-latency", type=float, default=2.0)
+    parser.add_argument("--fast-latency", type=float, default=0.3)
+    parser.add_argument("--think-words", type=int, default=300)
+    parser.add_argument("--slow-factor", type=float, default=4.0)
+    parser.add_argument("--router-max-age", type=float, default=15.0, help="ROUTER_MAX_AGE for the server")
+    parser.add_argument("--mode", choices=("wsgi", "asgi"), default="wsgi")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("-o", "--output")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    items = [(question, ideal_answer, answer_variants(ideal_answer, rng)[kind], rng.choice(DIFFICULTIES))
+             for question, ideal_answer in bank_questions() for kind in ANSWER_KINDS]
+
+    stub_port, app_port = free_port(), free_port()
+    stub_url = f"http://127.0.0.1:{stub_port}"
+    base_url = f"http://127.0.0.1:{app_port}"
+    env = dict(os.environ, MODEL_NAME=REASONING_MODEL, FAST_MODEL_NAME=FAST_MODEL,
+               MODEL_EXPECTED_LATENCY=str(args.reasoning_latency * 2),
+               FAST_MODEL_EXPECTED_LATENCY=str(args.fast_latency * 2),
+               FEEDBACK_DEADLINE=str(args.deadline_ms / 1000), ROUTER_MAX_AGE=str(args.router_max_age))
+    env.setdefault("SESSION_SECRET", "benchmark")
+    processes = []
+    results = {}
+    routing = {}
+    try:
+        processes.append(subprocess.Popen([
+            sys.executable, os.path.join(HERE, "llm_stub.py"), "--port", str(stub_port), "--seed", str(args.seed),
+            "--tokens-per-second", "2000",
+            "--model", f"{REASONING_MODEL}={args.reasoning_latency},{args.think_words}",
+            "--model", f"{FAST_MODEL}={args.fast_latency},0",
+        ]))
+        processes.append(subprocess.Popen([
+            sys.executable, os.path.join(HERE, "bench_server.py"), "--port", str(app_port),
+            "--llm-url", f"{stub_url}/v1/chat/completions", "--mode", args.mode,
+        ], env=env))
+        wait_for(f"{stub_url}/stats")
+        wait_for(f"{base_url}/health")
+
+        phases = (
+            ("normal", args.reasoning_latency, 0),
+            ("slow", args.reasoning_latency * args.slow_factor, 0),
+            ("recovered", args.reasoning_latency, args.router_max_age),
+        )
+        for name, latency, settle in phases:
+            requests.post(f"{stub_url}/configure", json={"model": REASONING_MODEL, "latency": latency}, timeout=10)
+            if settle:
+                print(f"… waiting {settle:.0f}s for the router's samples to age out", flush=True)
+                time.sleep(settle)
+            before = route_counts(base_url)
+            started = time.perf_counter()
+            latencies, errors, misses = run_phase(args, base_url, items, rng)
+            elapsed = time.perf_counter() - started
+            after = route_counts(base_url)
+            results[f"router_{name}"] = dict(summarize(latencies, errors, elapsed), deadline_misses=misses)
+            routing[name] = {route: after[route] - before.get(route, 0)
+                             for route in after if after[route] != before.get(route, 0)}
+            print(f"✓ {name}: reasoning latency {latency:.1f}s, {misses} deadline misses, routes {routing[name]}",
+                  flush=True)
+        health = requests.get(f"{base_url}/health", timeout=10).json()
+        stub_stats = requests.get(f"{stub_url}/stats", timeout=10).json()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    config = {key: value for key, value in vars(args).items() if key != "output"}
+    config.update({"routes": routing, "llm_stub": stub_stats, "model_router": health.get("model_router")})
+    print_table(results)
+    output = write_results("router", config, results, args.output)
+    print(f"✓ Router benchmark results -> {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""Run the app for load tests: LLM calls go to the local stub and the users
+table lives in SQLite (or a local Postgres with --postgres).
+
+    python benchmarks/bench_server.py --port 8090 --llm-url http://127.0.0.1:9100/v1/chat/completions
+
+bench_load.py starts this automatically; run it by hand to point other tools
+at a stubbed server.
+"""
+import argparse
+import os
+import sys
+import tempfile
+
+from common import BACKEND_DIR
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--llm-url", required=True)
+    parser.add_argument("--mode", choices=("wsgi", "asgi"), default="wsgi")
+    parser.add_argument("--postgres", action="store_true", help="use DB_HOST/DB_NAME/... instead of SQLite")
+    parser.add_argument("--sqlite-path", help="SQLite file (default: a fresh temporary file)")
+    args = parser.parse_args()
+
+    # Must be set before the app reads its configuration
+    os.environ["LLM_API_URL"] = args.llm_url
+    os.environ.setdefault("API_KEY", "stub")
+    os.environ["WARM_UP"] = "0"
+    os.environ.setdefault("SESSION_SECRET", "benchmark")
+    if not args.postgres:
+        os.environ["DB_AUTO_INIT"] = "0"
+
+    sys.path.insert(0, BACKEND_DIR)
+    import app
+    from db_pool import ConnectionPool
+
+    if args.postgres:
+        app.init_database()
+    else:
+        from sqlite_db import create_schema, executemany_insert, sqlite_connector
+
+        path = args.sqlite_path or os.path.join(tempfile.mkdtemp(prefix="bench-db-"), "bench.sqlite3")
+        create_schema(path)
+        app.DB_POOL = ConnectionPool({}, maxconn=app.DB_POOL.maxconn, timeout=app.DB_POOL.timeout,
+                                     connect=sqlite_connector(path))
+        if app.ATTEMPT_WRITER is not None:
+            app.ATTEMPT_WRITER.pool = app.DB_POOL
+            app.ATTEMPT_WRITER.insert = executemany_insert
+            app.ATTEMPT_WRITER.spool_path = path + ".attempts.spool.jsonl"
+        print(f"✓ SQLite stand-in at {path}", flush=True)
+
+    app.warm_up(include_db=args.postgres)
+
+    if args.mode == "asgi":
+        import uvicorn
+
+        sys.modules.setdefault("app", app)
+        uvicorn.run("asgi:application", host=args.host, port=args.port, app_dir=BACKEND_DIR, log_level="warning")
+    else:
+        import logging
+
+        logging.getLogger("werkzeug").setLevel(logging.WARNING)
+        app.app.run(host=args.host, port=args.port, threaded=True, debug=False)
+
+
+if __name__ == "__main__":
+    main()
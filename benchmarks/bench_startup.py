@@ -0,0 +1,74 @@
+"""Cold-start benchmark: time to import the app and answer the first /health.
+
+Each run is a fresh interpreter, so nothing is shared between samples:
+
+* import      - ``import app`` (module-level setup only)
+* health      - first GET /health through the Flask test client
+* first_score - first /calculate-score, which needs the keyword index
+* warm_up     - the background warm-up (index, spaCy, question banks), when enabled
+
+    python benchmarks/bench_startup.py [--runs 5] [--warm-up]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+
+PROBE = r"""
+import json, resource, sys, time
+started = time.perf_counter()
+import app
+imported = time.perf_counter()
+client = app.app.test_client()
+assert client.get("/health").status_code == 200
+health = time.perf_counter()
+
+result = {"import": imported - started, "health": health - started}
+if app.WARM_UP_THREAD is not None:
+    app.WARM_UP_THREAD.join()
+    result["warm_up"] = time.perf_counter() - started
+
+scored = time.perf_counter()
+client.post("/calculate-score", json={
+    "questions": [{"Answer": "Photosynthesis converts sunlight, carbon dioxide and water into glucose."}],
+    "answers": ["Plants turn sunlight and water into glucose."],
+})
+result["first_score"] = time.perf_counter() - scored
+result["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+print(json.dumps(result))
+"""
+
+WARM_UP_PROBE = PROBE.replace("import app\n", "import app\napp.start_warm_up()\n", 1)
+
+
+def run_once(warm_up):
+    env = dict(os.environ, WARM_UP="1" if warm_up else "0")
+    env.setdefault("SESSION_SECRET", "benchmark")
+    output = subprocess.run(
+        [sys.executable, "-c", WARM_UP_PROBE if warm_up else PROBE],
+        cwd=BACKEND_DIR, env=env, check=True, capture_output=True, text=True,
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--warm-up", action="store_true", help="start the background warm-up after import")
+    args = parser.parse_args()
+
+    samples = [run_once(args.warm_up) for _ in range(args.runs)]
+    print(f"{'stage':<14}{'median s':>10}{'min s':>10}{'max s':>10}")
+    for stage in ("import", "health", "warm_up", "first_score", "peak_rss_mb"):
+        values = [sample[stage] for sample in samples if stage in sample]
+        if values:
+            print(f"{stage:<14}{statistics.median(values):>10.3f}{min(values):>10.3f}{max(values):>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""Shared helpers for the benchmark scripts: latency summaries, sample
+answers built from the bundled question banks, and machine-readable output.
+
+Every script writes one JSON document with the same shape, so results from
+different commits can be diffed or fed to a regression check:
+
+    {"benchmark": ..., "timestamp": ..., "git_commit": ..., "python": ...,
+     "config": {...}, "results": {name: {"count", "errors", "p50_ms", ...}}}
+"""
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+
+ROOT_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+BACKEND_DIR = os.path.join(ROOT_DIR, "backend")
+DATA_DIR = os.path.join(ROOT_DIR, "data")
+RESULTS_DIR = os.path.join(ROOT_DIR, "benchmarks", "results")
+
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list."""
+    if not sorted_values:
+        return None
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def summarize(latencies, errors=0, elapsed=None):
+    """p50/p95/p99 (ms) and throughput for a list of latencies in seconds."""
+    values = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 3) if seconds is not None else None
+    summary = {
+        "count": len(values),
+        "errors": errors,
+        "p50_ms": ms(percentile(values, 50)),
+        "p95_ms": ms(percentile(values, 95)),
+        "p99_ms": ms(percentile(values, 99)),
+        "mean_ms": ms(sum(values) / len(values)) if values else None,
+        "max_ms": ms(values[-1]) if values else None,
+    }
+    if elapsed:
+        summary["throughput_per_sec"] = round(len(values) / elapsed, 2)
+    return summary
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def write_results(name, config, results, output=None):
+    document = {
+        "benchmark": name,
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "config": config,
+        "results": results,
+    }
+    output = output or os.path.join(RESULTS_DIR, f"{name}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(document, f, indent=2)
+    return output
+
+
+def print_table(results):
+    print(f"{'name':<34}{'count':>8}{'errors':>8}{'p50 ms':>11}{'p95 ms':>11}{'p99 ms':>11}")
+    for name, r in results.items():
+        fmt = lambda v: f"{v:>11.3f}" if v is not None else f"{'-':>11}"
+        print(f"{name:<34}{r['count']:>8}{r['errors']:>8}{fmt(r['p50_ms'])}{fmt(r['p95_ms'])}{fmt(r['p99_ms'])}")
+
+
+def bank_questions():
+    """(question, ideal_answer) for every row of the bundled banks."""
+    from keyword_index import iter_bank_rows
+
+    return list(iter_bank_rows(DATA_DIR))
+
+
+def answer_variants(ideal_answer, rng):
+    """Student answers of different quality for one ideal answer."""
+    words = ideal_answer.split()
+    typo = list(words)
+    for i in rng.sample(range(len(typo)), k=min(3, len(typo))):
+        w = typo[i]
+        if len(w) > 3:
+            j = rng.randrange(1, len(w) - 1)
+            typo[i] = w[:j] + w[j + 1] + w[j] + w[j + 2:]
+    return {
+        "exact": ideal_answer,
+        "typos": " ".join(typo),
+        "partial": " ".join(words[: max(3, len(words) // 2)]),
+        "wrong": "It happens because of gravity and magnets.",
+        "idk": "I don't know",
+    }
+
+
+def sample_answers(seed=42):
+    """[(question, ideal_answer, student_answer, kind)] covering every bank row."""
+    rng = random.Random(seed)
+    rows = []
+    for question, ideal_answer in bank_questions():
+        for kind, student_answer in answer_variants(ideal_answer, rng).items():
+            rows.append((question, ideal_answer, student_answer, kind))
+    return rows
@@ -0,0 +1,217 @@
+"""Local stand-in for the Together chat-completions API.
+
+Speaks the subset of the API the app uses: non-streaming completions and SSE
+streams of content deltas ending in [DONE]. Each reply starts with a <think>
+block, like DeepSeek-R1's, followed by short feedback. Packed batch prompts
+([[1]], [[2]], ...) get one section per marker. Replies are cut to the
+request's max_tokens (one word is one token).
+
+    python benchmarks/llm_stub.py --port 9100 --latency 2.0 --think-words 300 --error-rate 0.05
+    LLM_API_URL=http://127.0.0.1:9100/v1/chat/completions python backend/app.py
+
+--model NAME=LATENCY[,THINK_WORDS[,ERROR_RATE]] (repeatable) gives one model
+its own behaviour; THINK_WORDS=0 answers without a <think> block, like a
+non-reasoning model. Other model names use the top-level options.
+
+GET /stats returns request and error counts, in total and per model.
+POST /configure {"model": NAME, "latency": 8, "error_rate": 0.5} changes a
+model's behaviour while the stub runs (no "model" changes the defaults).
+"""
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FEEDBACK = [
+    "You're on the right track! Think about what else happens during this process.",
+    "Good effort. One important idea is missing — re-read the question carefully.",
+    "Great job! Your answer is correct.",
+    "Not quite. Review how this works and try explaining it step by step.",
+]
+MARKER_RE = re.compile(r"\[\[(\d+)\]\]")
+
+
+class StubConfig:
+    def __init__(self, latency=1.0, jitter=0.3, think_words=200, tokens_per_second=200.0,
+                 error_rate=0.0, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.think_words = think_words
+        self.tokens_per_second = tokens_per_second
+        self.error_rate = error_rate
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counts = {"requests": 0, "streams": 0, "errors": 0}
+        self.models = {}
+        self.parent = None
+
+    def add_model(self, name, latency, think_words=None, error_rate=None):
+        model = StubConfig(latency, self.jitter, self.think_words if think_words is None else think_words,
+                           self.tokens_per_second, self.error_rate if error_rate is None else error_rate,
+                           self.random.random())
+        model.parent = self
+        self.models[name] = model
+        return model
+
+    def for_model(self, name):
+        return self.models.get(name, self)
+
+    def configure(self, settings):
+        with self.lock:
+            for key in ("latency", "jitter", "think_words", "tokens_per_second", "error_rate"):
+                if key in settings:
+                    setattr(self, key, type(getattr(self, key))(settings[key]))
+
+    def count(self, name):
+        with self.lock:
+            self.counts[name] += 1
+        if self.parent is not None:
+            self.parent.count(name)
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counts)
+        if self.models:
+            stats["models"] = {name: model.stats() for name, model in self.models.items()}
+        return stats
+
+    def draw(self):
+        """(first-token delay, error status or None) for one request."""
+        with self.lock:
+            delay = self.latency * self.random.uniform(1 - self.jitter, 1 + self.jitter)
+            error = None
+            if self.random.random() < self.error_rate:
+                error = self.random.choice((429, 503))
+        return max(0.0, delay), error
+
+    def reply(self, prompt):
+        markers = sorted({int(n) for n in MARKER_RE.findall(prompt)})
+        if len(markers) > 1:
+            body = "\n".join(f"[[{n}]]\n{FEEDBACK[n % len(FEEDBACK)]}" for n in markers)
+        else:
+            body = FEEDBACK[len(prompt) % len(FEEDBACK)]
+        if not self.think_words:
+            return body
+        think = " ".join(["reasoning"] * self.think_words)
+        return f"<think>{think}</think>\n\n{body}"
+
+
+def make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _json(self, status, payload, headers=None):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            if self.path == "/stats":
+                return self._json(200, config.stats())
+            self._json(404, {"error": "not found"})
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            try:
+                payload = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                return self._json(400, {"error": "invalid JSON"})
+
+            if self.path == "/configure":
+                target = config.models.get(payload["model"]) if payload.get("model") else config
+                if target is None:
+                    return self._json(404, {"error": f"unknown model {payload['model']}"})
+                target.configure(payload)
+                return self._json(200, {"ok": True})
+
+            model = config.for_model(payload.get("model"))
+            model.count("requests")
+            delay, error = model.draw()
+            if error is not None:
+                model.count("errors")
+                time.sleep(delay / 4)
+                if error == 429:
+                    return self._json(429, {"error": "rate limited"}, {"Retry-After": "1"})
+                return self._json(503, {"error": "upstream overloaded"})
+
+            prompt = " ".join(m.get("content", "") for m in payload.get("messages", []))
+            tokens = re.findall(r"\S+\s*", model.reply(prompt))
+            if payload.get("max_tokens"):
+                tokens = tokens[:int(payload["max_tokens"])]
+            time.sleep(delay)
+
+            if not payload.get("stream"):
+                time.sleep(len(tokens) / model.tokens_per_second)
+                content = "".join(tokens)
+                return self._json(200, {"choices": [{"message": {"role": "assistant", "content": content}}]})
+
+            model.count("streams")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            self.close_connection = True
+            try:
+                for token in tokens:
+                    chunk = {"choices": [{"delta": {"content": token}}]}
+                    self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                    self.wfile.flush()
+                    time.sleep(1 / model.tokens_per_second)
+                self.wfile.write(b"data: [DONE]\n\n")
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+    return Handler
+
+
+def serve(host, port, config):
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency", type=float, default=1.0, help="seconds to the first token")
+    parser.add_argument("--jitter", type=float, default=0.3, help="latency spread, as a fraction")
+    parser.add_argument("--think-words", type=int, default=200, help="length of the <think> block")
+    parser.add_argument("--tokens-per-second", type=float, default=200.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="fraction answered 429/503")
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--model", action="append", default=[], metavar="NAME=LATENCY[,THINK_WORDS[,ERROR_RATE]]",
+                        help="per-model behaviour (repeatable)")
+    args = parser.parse_args()
+
+    config = StubConfig(args.latency, args.jitter, args.think_words, args.tokens_per_second,
+                        args.error_rate, args.seed)
+    for spec in args.model:
+        name, _, values = spec.partition("=")
+        values = values.split(",")
+        if not name or not values[0]:
+            parser.error(f"--model {spec}: expected NAME=LATENCY[,THINK_WORDS[,ERROR_RATE]]")
+        config.add_model(name, float(values[0]),
+                         int(values[1]) if len(values) > 1 else None,
+                         float(values[2]) if len(values) > 2 else None)
+    server = serve(args.host, args.port, config)
+    print(f"✓ LLM stub on http://{args.host}:{args.port}/v1/chat/completions", flush=True)
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
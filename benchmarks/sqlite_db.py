@@ -0,0 +1,115 @@
+"""SQLite stand-in for the app's PostgreSQL database.
+
+Wraps sqlite3 connections in the small part of the psycopg2 interface the app
+and db_pool use (``%s`` placeholders, cursor context managers, ``closed``), so
+a benchmark server can run without Postgres:
+
+    pool = ConnectionPool({}, connect=sqlite_connector(path))
+"""
+import sqlite3
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS users (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    username VARCHAR(50) UNIQUE NOT NULL,
+    password VARCHAR(255) NOT NULL,
+    grade INT NOT NULL,
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+);
+CREATE TABLE IF NOT EXISTS revoked_sessions (
+    jti VARCHAR(64) PRIMARY KEY,
+    expires_at DOUBLE PRECISION NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attempts (
+    attempt_id VARCHAR(32) PRIMARY KEY,
+    username VARCHAR(50),
+    grade INT,
+    total_score REAL NOT NULL,
+    max_score REAL NOT NULL,
+    percentage REAL NOT NULL,
+    letter_grade VARCHAR(2),
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS attempt_answers (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    attempt_id VARCHAR(32),
+    username VARCHAR(50),
+    source VARCHAR(16) NOT NULL,
+    question TEXT,
+    student_answer TEXT,
+    score REAL,
+    feedback TEXT,
+    created_at TEXT NOT NULL
+);
+"""
+
+
+class SQLiteCursor:
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    @property
+    def rowcount(self):
+        return self._cursor.rowcount
+
+    def execute(self, query, params=()):
+        self._cursor.execute(query.replace("%s", "?"), tuple(params))
+
+    def executemany(self, query, rows):
+        self._cursor.executemany(query.replace("%s", "?"), rows)
+
+    def fetchone(self):
+        return self._cursor.fetchone()
+
+    def fetchall(self):
+        return self._cursor.fetchall()
+
+    def close(self):
+        self._cursor.close()
+
+
+class SQLiteConnection:
+    def __init__(self, path):
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self.closed = 0
+
+    def cursor(self):
+        return SQLiteCursor(self._conn.cursor())
+
+    def commit(self):
+        self._conn.commit()
+
+    def rollback(self):
+        self._conn.rollback()
+
+    def close(self):
+        self._conn.close()
+        self.closed = 1
+
+
+def sqlite_connector(path):
+    def connect():
+        return SQLiteConnection(path)
+    return connect
+
+
+def executemany_insert(cursor, table, columns, rows):
+    """attempt_store insert for SQLite, which has no execute_values."""
+    placeholders = ", ".join(["%s"] * len(columns))
+    cursor.executemany(f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({placeholders}) ON CONFLICT DO NOTHING", rows)
+
+
+def create_schema(path, schema=SCHEMA):
+    conn = sqlite3.connect(path)
+    try:
+        conn.executescript(schema)
+        conn.commit()
+    finally:
+        conn.close()
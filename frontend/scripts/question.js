@@ -7,8 +7,9 @@ let scoreData = null; // Add this to store score data
 window.onload = async () => {
     const username = localStorage.getItem("username");
     const grade = localStorage.getItem("grade");
+    const token = localStorage.getItem("token");
 
-    if (!username || !grade) {
+    if (!username || !grade || !token) {
         alert("Missing username or grade. Please login again.");
         window.location.href = "login.html";
         return;
@@ -20,12 +21,22 @@ window.onload = async () => {
     try {
         const response = await fetch("/get-questions", {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({ username })
+            headers: {
+                "Content-Type": "application/json",
+                "Authorization": `Bearer ${token}`
+            },
+            body: JSON.stringify({})
         });
 
         const data = await response.json();
 
+        if (response.status === 401) {
+            alert(data.error || "Session expired. Please login again.");
+            localStorage.clear();
+            window.location.href = "login.html";
+            return;
+        }
+
         if (!data.questions || data.questions.length === 0) {
             document.getElementById("question-text").innerText = "❌ Failed to load questions.";
             return;
@@ -102,21 +113,35 @@ async function submitAnswer() {
     submitBtn.disabled = true;
     submitBtn.innerText = "Generating...";
 
-    const { Question, Answer } = questions[currentQuestionIndex];
+    const { Question, Answer, Difficulty } = questions[currentQuestionIndex];
+
+    const body = JSON.stringify({
+        question: Question,
+        ideal_answer: Answer,
+        student_answer: studentAnswer,
+        difficulty: Difficulty,
+        username: localStorage.getItem("username")
+    });
 
     try {
-        const response = await fetch("/generate-feedback", {
-            method: "POST",
-            headers: { "Content-Type": "application/json" },
-            body: JSON.stringify({
-                question: Question,
-                ideal_answer: Answer,
-                student_answer: studentAnswer
-            })
-        });
+        let feedback = null;
+        try {
+            feedback = await streamFeedback(body, feedbackBox);
+        } catch (streamError) {
+            console.warn("Streaming feedback failed, falling back:", streamError);
+        }
 
-        const data = await response.json();
-        feedbackBox.innerText = data.feedback || "Error getting feedback.";
+        if (feedback === null) {
+            const response = await fetch("/generate-feedback", {
+                method: "POST",
+                headers: { "Content-Type": "application/json" },
+                body
+            });
+
+            const data = await response.json();
+            feedback = data.feedback || data.error;
+        }
+        feedbackBox.innerText = feedback || "Error getting feedback.";
 
         status[currentQuestionIndex] = "answered";
         renderPalette();
@@ -134,6 +159,62 @@ async function submitAnswer() {
     }
 }
 
+// Render feedback tokens as the server streams them; returns the full text,
+// or null if streaming isn't available so the caller can fall back.
+async function streamFeedback(body, feedbackBox) {
+    const response = await fetch("/generate-feedback/stream", {
+        method: "POST",
+        headers: { "Content-Type": "application/json" },
+        body
+    });
+
+    if (response.status === 429) {
+        // Server is busy; don't retry through the non-streaming endpoint
+        const data = await response.json();
+        return data.error;
+    }
+    if (!response.ok || !response.body) {
+        return null;
+    }
+
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+    let feedback = "";
+
+    while (true) {
+        const { value, done } = await reader.read();
+        if (done) break;
+        buffer += decoder.decode(value, { stream: true });
+
+        let boundary;
+        while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+            const rawEvent = buffer.slice(0, boundary);
+            buffer = buffer.slice(boundary + 2);
+
+            let eventType = "message";
+            let data = "";
+            for (const line of rawEvent.split("\n")) {
+                if (line.startsWith("event:")) eventType = line.slice(6).trim();
+                else if (line.startsWith("data:")) data += line.slice(5).trim();
+            }
+            const payload = data ? JSON.parse(data) : {};
+
+            if (eventType === "error") {
+                return payload.error || "Error getting feedback.";
+            }
+            if (eventType === "done") {
+                return feedback.trim();
+            }
+            if (payload.token) {
+                feedback += payload.token;
+                feedbackBox.innerText = feedback;
+            }
+        }
+    }
+    return feedback.trim() || null;
+}
+
 function retryQuestion() {
     document.getElementById("feedback").innerText = "";
     document.getElementById("submit-btn").style.display = "inline-block";
@@ -183,7 +264,10 @@ async function calculateAndShowScore() {
         
         const response = await fetch("/calculate-score", {
             method: "POST",
-            headers: { "Content-Type": "application/json" },
+            headers: {
+                "Content-Type": "application/json",
+                "Authorization": `Bearer ${localStorage.getItem("token")}`
+            },
             body: JSON.stringify({
                 questions: questions,
                 answers: userAnswers
@@ -358,6 +442,15 @@ function jumpToQuestion(index) {
 }
 
 function logout() {
+    const token = localStorage.getItem("token");
+    if (token) {
+        // keepalive lets the request finish while the page navigates away
+        fetch("/logout", {
+            method: "POST",
+            headers: { "Authorization": `Bearer ${token}` },
+            keepalive: true
+        }).catch(() => {});
+    }
     localStorage.clear();
     window.location.href = "login.html";
     
@@ -0,0 +1,135 @@
+"""Shared fixtures: the backend on sys.path and a scripted local upstream.
+
+The app reads its configuration at import time, so the environment is set
+here, before any test imports it.
+"""
+import json
+import os
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+BACKEND_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", "backend"))
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ.setdefault("SESSION_SECRET", "test-secret")
+os.environ.setdefault("WARM_UP", "0")
+os.environ.setdefault("ATTEMPTS_PERSIST", "0")
+os.environ.setdefault("DB_AUTO_INIT", "0")
+os.environ.setdefault("API_KEY", "test")
+
+
+def completion(text):
+    return {"choices": [{"message": {"content": text}, "finish_reason": "stop"}]}
+
+
+class Reply:
+    def __init__(self, status=200, body=None, headers=None, tokens=None, broken=False, delay=0.0):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+        self.tokens = tokens
+        self.broken = broken
+        self.delay = delay
+
+
+class ScriptedUpstream:
+    """Chat-completions stand-in answering each POST with the next scripted Reply.
+
+    Replies added with ``model=`` only answer requests for that model; those
+    are used first, then the shared script. Once both run out every request
+    gets ``default`` (a short completion). Each request's JSON body is kept in
+    ``requests``.
+    """
+
+    def __init__(self):
+        self.script = []
+        self.model_scripts = {}
+        self.requests = []
+        self.default = Reply(body=completion("Looks good."))
+        self._lock = threading.Lock()
+        upstream = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"null")
+                upstream._record(payload)
+                upstream._serve(self, upstream._next(payload))
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}/v1/chat/completions"
+        self._thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def add(self, *replies, model=None):
+        with self._lock:
+            if model is None:
+                self.script.extend(replies)
+            else:
+                self.model_scripts.setdefault(model, []).extend(replies)
+
+    def _record(self, payload):
+        with self._lock:
+            self.requests.append(payload)
+
+    def _next(self, payload):
+        model = payload.get("model") if isinstance(payload, dict) else None
+        with self._lock:
+            script = self.model_scripts.get(model) or self.script
+            return script.pop(0) if script else self.default
+
+    @staticmethod
+    def _serve(handler, reply):
+        if reply.delay:
+            threading.Event().wait(reply.delay)
+        if reply.broken:
+            # Promise a chunked body, then send a chunk that can't be parsed
+            handler.send_response(reply.status)
+            handler.send_header("Content-Type", "application/json")
+            handler.send_header("Transfer-Encoding", "chunked")
+            handler.end_headers()
+            handler.wfile.write(b"zz\r\n{\"choices\"")
+            handler.wfile.flush()
+            handler.close_connection = True
+            return
+        if reply.tokens is not None:
+            # Like Together: text/event-stream with no charset, UTF-8 bytes
+            handler.send_response(reply.status)
+            handler.send_header("Content-Type", "text/event-stream")
+            handler.send_header("Connection", "close")
+            handler.end_headers()
+            for token in reply.tokens:
+                chunk = {"choices": [{"delta": {"content": token}}]}
+                handler.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode("utf-8"))
+                handler.wfile.flush()
+            handler.wfile.write(b"data: [DONE]\n\n")
+            handler.close_connection = True
+            return
+        body = json.dumps(reply.body if reply.body is not None else {"error": "stub"}).encode("utf-8")
+        handler.send_response(reply.status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        for name, value in reply.headers.items():
+            handler.send_header(name, value)
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def close(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def upstream():
+    server = ScriptedUpstream()
+    yield server
+    server.close()
@@ -0,0 +1,74 @@
+import asyncio
+import time
+
+import httpx
+import pytest
+
+import app as flask_app
+import asgi
+
+SLOW_SECONDS = 0.5
+SCORE_BODY = {
+    "questions": [{"Answer": "Plants make food from sunlight, water and carbon dioxide."}],
+    "answers": ["Plants use sunlight to make food."],
+}
+
+
+@pytest.fixture(autouse=True)
+def no_revocation_db(monkeypatch):
+    monkeypatch.setattr(flask_app.SESSION_REVOCATIONS, "loader", lambda: [])
+
+
+def run(coro_fn):
+    async def main():
+        transport = httpx.ASGITransport(app=asgi.application)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=10) as client:
+            return await coro_fn(client)
+
+    return asyncio.run(main())
+
+
+def test_get_questions_stays_responsive_during_slow_bridged_requests(monkeypatch):
+    score_batch = flask_app.score_batch
+
+    def slow_score_batch(*args, **kwargs):
+        time.sleep(SLOW_SECONDS)
+        return score_batch(*args, **kwargs)
+
+    monkeypatch.setattr(flask_app, "score_batch", slow_score_batch)
+    token = flask_app.SESSION_TOKENS.issue(1, "student", 5)
+
+    async def scenario(client):
+        started = time.monotonic()
+        slow = [asyncio.create_task(client.post("/calculate-score", json=SCORE_BODY)) for _ in range(4)]
+        await asyncio.sleep(0.05)
+        asked = time.monotonic()
+        questions = await client.post("/get-questions", json={"token": token})
+        questions_seconds = time.monotonic() - asked
+        scores = await asyncio.gather(*slow)
+        return questions, questions_seconds, scores, time.monotonic() - started
+
+    questions, questions_seconds, scores, total_seconds = run(scenario)
+    assert questions.status_code == 200 and questions.json()["questions"]
+    assert questions_seconds < SLOW_SECONDS
+    assert all(response.status_code == 200 for response in scores)
+    # Serialized on one thread, four slow requests would take 4 * SLOW_SECONDS
+    assert total_seconds < 2 * SLOW_SECONDS
+
+
+@pytest.mark.parametrize("path", ["/generate-feedback", "/generate-feedback/stream"])
+def test_feedback_history_uses_the_verified_session_user(monkeypatch, path):
+    recorded = []
+    monkeypatch.setattr(flask_app, "record_feedback", lambda username, *rest: recorded.append(username))
+    token = flask_app.SESSION_TOKENS.issue(1, "student", 5)
+    # "I don't know" takes the templated fast path, so no upstream call is made
+    body = {"question": "Why is the sky blue?", "ideal_answer": "Rayleigh scattering.",
+            "student_answer": "I don't know", "username": "someone-else"}
+
+    async def scenario(client):
+        await client.post(path, json=body, headers={"Authorization": f"Bearer {token}"})
+        await client.post(path, json=body)
+        await client.post(path, json=dict(body, token="forged"))
+
+    run(scenario)
+    assert recorded == ["student", None, None]
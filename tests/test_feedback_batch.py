@@ -0,0 +1,61 @@
+import time
+
+import pytest
+
+import app
+
+
+class FakeChat:
+    """Stands in for both LLM clients; records each payload and its deadline."""
+
+    def __init__(self, reply="Think about what plants need."):
+        self.reply = reply
+        self.calls = []
+
+    def __call__(self, payload, deadline=None):
+        self.calls.append((payload, deadline))
+        return self.reply
+
+
+@pytest.fixture
+def fake_chat(monkeypatch):
+    chat = FakeChat()
+    monkeypatch.setattr(app.LLM_CLIENT, "chat", chat)
+    if app.FAST_LLM_CLIENT is not None:
+        monkeypatch.setattr(app.FAST_LLM_CLIENT, "chat", chat)
+    app.FEEDBACK_CACHE.memory.clear()
+    return chat
+
+
+def item(student_answer, question="How do plants make food?"):
+    return {"question": question, "ideal_answer": "Plants make food by photosynthesis using sunlight and water.",
+            "student_answer": student_answer}
+
+
+def test_each_item_is_looked_up_once(fake_chat):
+    before_stats = dict(app.FAST_PATH_STATS)
+    before_misses = app.FEEDBACK_CACHE.misses
+    results = app.generate_feedback_batch([item("they eat dirt"), item("I don't know")])
+    assert results[0] == {"feedback": fake_chat.reply}
+    assert results[1] == {"feedback": app.FAST_PATH_FEEDBACK["empty"]}
+    assert app.FAST_PATH_STATS["escalated"] - before_stats["escalated"] == 1
+    assert app.FAST_PATH_STATS["short_circuited"] - before_stats["short_circuited"] == 1
+    assert app.FEEDBACK_CACHE.misses - before_misses == 1
+    assert len(fake_chat.calls) == 1
+
+
+def test_batch_deadline_comes_from_the_request(fake_chat):
+    client = app.app.test_client()
+    started = time.monotonic()
+    response = client.post("/generate-feedback/batch", json={"items": [item("roots drink soil")], "deadline_ms": 2000})
+    assert response.status_code == 200
+    assert response.get_json()["results"] == [{"feedback": fake_chat.reply}]
+    (_, deadline), = fake_chat.calls
+    assert 0 < deadline <= 2.0 + (time.monotonic() - started)
+
+
+def test_queued_time_counts_against_the_deadline(fake_chat):
+    # A deadline that ran out while the batch waited gets rule-based feedback without a call
+    results = app.generate_feedback_batch([item("roots drink soil")], deadline_at=time.monotonic() - 1)
+    assert results == [{"feedback": app.deterministic_feedback(item("")["ideal_answer"], "roots drink soil")}]
+    assert fake_chat.calls == []
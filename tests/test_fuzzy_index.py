@@ -0,0 +1,41 @@
+import itertools
+
+import fuzzy_index
+from fuzzy_index import FuzzyIndex, verify
+from keyword_extractor import KeywordExtractor
+from keyword_index import KeywordEntry, iter_bank_rows
+
+
+def bank_sample(count=40):
+    answers = dict.fromkeys(answer for _, answer in iter_bank_rows())
+    return list(itertools.islice(answers, count))
+
+
+def fallback_lookup():
+    # Without spaCy the keywords are the answer's first words, as in extract_keywords
+    extractor = KeywordExtractor(model="missing-model-for-tests")
+    return lambda ideal: KeywordEntry(ideal, extractor.extract(ideal, top_k=10))
+
+
+def test_indexed_scores_match_original_loops():
+    answers = bank_sample()
+    assert answers, "bundled grade banks not found"
+    mismatches, checks = verify(answers, fallback_lookup(), variants_per_answer=10)
+    assert checks == 2 * 10 * len(answers)
+    assert mismatches == 0
+
+
+def test_verify_catches_a_broken_index(monkeypatch):
+    monkeypatch.setattr(FuzzyIndex, "near", lambda self, token, threshold: frozenset())
+    mismatches, checks = verify(bank_sample(), fallback_lookup(), variants_per_answer=10)
+    assert checks and mismatches
+
+
+def test_words_similar_matches_sequence_matcher():
+    from difflib import SequenceMatcher
+
+    words = ["photosynthesis", "photosynthesys", "chlorophyll", "clorophyl", "sun", "suns", "water", "waters"]
+    for a, b in itertools.product(words, repeat=2):
+        for threshold in (0.75, 0.8):
+            expected = SequenceMatcher(None, a, b).ratio() >= threshold
+            assert fuzzy_index.words_similar(a, b, threshold) == expected
@@ -0,0 +1,200 @@
+import asyncio
+import time
+
+import pytest
+
+from conftest import Reply
+from llm_client import AsyncLLMClient, CircuitBreaker, CircuitOpenError, LLMClient, LLMError, RetryPolicy
+
+PAYLOAD = {"model": "stub", "messages": [{"role": "user", "content": "hi"}]}
+NON_ASCII = ["Great job ", "— well ", "done 👍"]
+
+
+def no_wait_policy():
+    return RetryPolicy(max_attempts=3, base_delay=0.0, max_delay=0.0, deadline=5.0)
+
+
+def test_stream_decodes_utf8_without_charset(upstream):
+    upstream.add(Reply(tokens=NON_ASCII))
+    client = LLMClient(upstream.url, {}, retry_policy=no_wait_policy())
+    assert "".join(client.stream_chat(PAYLOAD)) == "Great job — well done 👍"
+
+
+def test_async_stream_decodes_utf8_without_charset(upstream):
+    upstream.add(Reply(tokens=NON_ASCII))
+    client = AsyncLLMClient(upstream.url, {}, retry_policy=no_wait_policy())
+
+    async def collect():
+        try:
+            return "".join([token async for token in client.stream_chat(PAYLOAD)])
+        finally:
+            await client.aclose()
+
+    assert asyncio.run(collect()) == "Great job — well done 👍"
+
+
+def breaker_client(upstream, client_class=LLMClient, **breaker):
+    return client_class(upstream.url, {}, retry_policy=RetryPolicy(max_attempts=1, deadline=5.0),
+                        breaker=CircuitBreaker(**{"failure_threshold": 1, "reset_timeout": 0.05, **breaker}))
+
+
+def test_broken_body_during_half_open_probe_reopens_the_breaker(upstream):
+    client = breaker_client(upstream)
+    upstream.add(Reply(status=503), Reply(broken=True))
+    with pytest.raises(LLMError):
+        client.chat(PAYLOAD)
+    time.sleep(0.06)
+    with pytest.raises(LLMError) as probe:
+        client.chat(PAYLOAD)
+    assert probe.value.retryable
+    assert client.breaker.state == "open"
+    time.sleep(0.06)
+    assert client.chat(PAYLOAD) == "Looks good."
+    assert client.breaker.state == "closed"
+
+
+def test_async_cancelled_probe_reopens_the_breaker(upstream):
+    client = breaker_client(upstream, AsyncLLMClient)
+    upstream.add(Reply(status=503), Reply(body={"choices": []}, delay=1.0))
+
+    async def scenario():
+        try:
+            try:
+                await client.chat(PAYLOAD)
+            except Exception:
+                pass
+            await asyncio.sleep(0.06)
+            probe = asyncio.create_task(client.chat(PAYLOAD))
+            await asyncio.sleep(0.2)
+            probe.cancel()
+            try:
+                await probe
+            except asyncio.CancelledError:
+                pass
+            state_after_cancel = client.breaker.state
+            await asyncio.sleep(0.06)
+            return state_after_cancel, await client.chat(PAYLOAD)
+        finally:
+            await client.aclose()
+
+    state_after_cancel, text = asyncio.run(scenario())
+    assert state_after_cancel == "open"
+    assert text == "Looks good."
+
+
+def test_retryable_statuses_are_retried_until_success(upstream):
+    for status in (408, 429, 500, 502, 503, 504):
+        upstream.add(Reply(status=status))
+    client = LLMClient(upstream.url, {}, retry_policy=RetryPolicy(max_attempts=7, base_delay=0.0, deadline=5.0))
+    assert client.chat(PAYLOAD) == "Looks good."
+    assert len(upstream.requests) == 7
+    assert client.stats()["retries"] == 6
+    assert client.breaker.state == "closed"
+
+
+def test_non_retryable_status_fails_after_one_attempt(upstream):
+    upstream.add(Reply(status=400))
+    client = LLMClient(upstream.url, {}, retry_policy=no_wait_policy())
+    with pytest.raises(LLMError) as error:
+        client.chat(PAYLOAD)
+    assert error.value.status == 400 and not error.value.retryable
+    assert len(upstream.requests) == 1
+    # Our own bad request doesn't count against the upstream
+    assert client.breaker.stats()["consecutive_failures"] == 0
+
+
+def test_malformed_completion_is_not_retried(upstream):
+    upstream.add(Reply(body={"unexpected": True}))
+    client = LLMClient(upstream.url, {}, retry_policy=no_wait_policy())
+    with pytest.raises(LLMError, match="Malformed"):
+        client.chat(PAYLOAD)
+    assert len(upstream.requests) == 1
+
+
+def test_retry_after_is_honoured(upstream):
+    upstream.add(Reply(status=429, headers={"Retry-After": "0.3"}))
+    client = LLMClient(upstream.url, {}, retry_policy=RetryPolicy(max_attempts=2, base_delay=0.0, deadline=5.0))
+    started = time.monotonic()
+    assert client.chat(PAYLOAD) == "Looks good."
+    assert time.monotonic() - started >= 0.3
+    assert len(upstream.requests) == 2
+
+
+def test_retry_after_past_the_deadline_gives_up_at_once(upstream):
+    upstream.add(Reply(status=429, headers={"Retry-After": "5"}))
+    client = LLMClient(upstream.url, {}, retry_policy=RetryPolicy(max_attempts=3, max_delay=10.0, deadline=1.0))
+    started = time.monotonic()
+    with pytest.raises(LLMError) as error:
+        client.chat(PAYLOAD)
+    assert error.value.status == 429 and error.value.retry_after == 5.0
+    assert time.monotonic() - started < 0.5
+    assert len(upstream.requests) == 1
+
+
+def test_backoff_is_capped_full_jitter():
+    policy = RetryPolicy(base_delay=0.5, max_delay=2.0)
+    error = LLMError("boom", retryable=True)
+    for attempt in range(1, 8):
+        assert 0.0 <= policy.backoff(attempt, error) <= min(2.0, 0.5 * 2 ** (attempt - 1))
+    assert policy.backoff(1, LLMError("slow down", retryable=True, retry_after=30)) == 2.0
+
+
+def test_breaker_opens_then_half_open_probe_closes_it(upstream):
+    client = breaker_client(upstream, failure_threshold=2, reset_timeout=0.1)
+    upstream.add(Reply(status=500), Reply(status=500))
+    for _ in range(2):
+        with pytest.raises(LLMError):
+            client.chat(PAYLOAD)
+    assert client.breaker.state == "open"
+
+    with pytest.raises(CircuitOpenError):
+        client.chat(PAYLOAD)
+    assert len(upstream.requests) == 2  # short-circuited, never sent
+    assert client.stats()["short_circuited"] == 1
+
+    time.sleep(0.11)
+    assert client.breaker.state == "half_open"
+    assert client.chat(PAYLOAD) == "Looks good."
+    assert client.breaker.state == "closed"
+    assert client.breaker.stats()["opened_count"] == 1
+
+
+def test_failed_half_open_probe_reopens_and_admits_one_probe(upstream):
+    client = breaker_client(upstream, reset_timeout=0.1)
+    upstream.add(Reply(status=503), Reply(status=503))
+    with pytest.raises(LLMError):
+        client.chat(PAYLOAD)
+    time.sleep(0.11)
+    assert client.breaker.allow()  # this caller is the probe...
+    assert not client.breaker.allow()  # ...and nobody else gets through meanwhile
+    client.breaker.record_failure()
+    assert client.breaker.state == "open"
+    with pytest.raises(CircuitOpenError):
+        client.chat(PAYLOAD)
+    assert client.breaker.stats()["opened_count"] == 2
+
+
+def test_async_client_retries_and_breaks_like_the_sync_one(upstream):
+    client = breaker_client(upstream, AsyncLLMClient, failure_threshold=2, reset_timeout=30)
+    client.retry_policy = RetryPolicy(max_attempts=2, base_delay=0.0, deadline=5.0)
+    upstream.add(Reply(status=503), Reply(body={"choices": [{"message": {"content": "Retried."}}]}),
+                 Reply(status=400),
+                 Reply(status=500), Reply(status=500), Reply(status=502), Reply(status=502))
+
+    async def scenario():
+        try:
+            assert await client.chat(PAYLOAD) == "Retried."
+            with pytest.raises(LLMError) as bad_request:
+                await client.chat(PAYLOAD)
+            assert bad_request.value.status == 400
+            for _ in range(2):
+                with pytest.raises(LLMError):
+                    await client.chat(PAYLOAD)
+            with pytest.raises(CircuitOpenError):
+                await client.chat(PAYLOAD)
+        finally:
+            await client.aclose()
+
+    asyncio.run(scenario())
+    assert len(upstream.requests) == 7
+    assert client.breaker.state == "open"
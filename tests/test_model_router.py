@@ -0,0 +1,171 @@
+import time
+
+import pytest
+
+import app
+from conftest import Reply, completion
+from llm_client import LLMClient, RetryPolicy
+from model_router import ModelRouter, ModelSpec
+
+REASONING = ModelSpec("reasoning", reasoning=True, expected_latency=15,
+                      budgets={"Easy": 1000, "Medium": 1200, "default": 1500})
+FAST = ModelSpec("fast", reasoning=False, expected_latency=3, budgets={"short": 150, "default": 300})
+
+IDEAL = "Plants make food by photosynthesis using sunlight and water."
+
+
+@pytest.mark.parametrize("score, difficulty, model, reason, max_tokens", [
+    (1.8, "Hard", "fast", "near-correct", 150),
+    (1.5, None, "fast", "near-correct", 150),
+    (0.0, "Easy", "fast", "easy-question", 300),
+    (0.0, "Hard", "reasoning", "low-band", 1500),
+    (0.4, None, "reasoning", "low-band", 1500),
+    (1.0, "Easy", "reasoning", "mid-band", 1000),
+    (1.0, "Medium", "reasoning", "mid-band", 1200),
+])
+def test_routes_by_score_band_and_difficulty(score, difficulty, model, reason, max_tokens):
+    route = ModelRouter(REASONING, FAST).route(score, difficulty, deadline=30)
+    assert (route.model, route.reason, route.max_tokens) == (model, reason, max_tokens)
+    assert (route.fallback is not None) == (model == "reasoning")
+
+
+def test_without_a_fast_model_everything_goes_to_the_reasoning_model():
+    router = ModelRouter(REASONING)
+    for score, difficulty in [(2.0, "Easy"), (0.0, "Easy"), (1.0, "Medium")]:
+        route = router.route(score, difficulty, deadline=1)
+        assert (route.model, route.fallback) == ("reasoning", None)
+        assert router.reserve(route) == 0.0
+
+
+def test_tight_deadline_downgrades_to_the_fast_model():
+    router = ModelRouter(REASONING, FAST, headroom=1.2)
+    route = router.route(1.0, "Medium", deadline=17)  # 15s expected * 1.2 headroom doesn't fit
+    assert (route.model, route.reason, route.max_tokens, route.fallback) == ("fast", "degraded-latency", 300, None)
+
+    route = router.route(1.0, "Medium", deadline=19)
+    assert (route.model, route.fallback.model, route.fallback.reason) == ("reasoning", "fast", "fallback")
+    assert router.reserve(route) == pytest.approx(3 * 1.2)
+
+
+def test_recent_latency_replaces_the_expected_latency():
+    router = ModelRouter(REASONING, FAST, min_samples=5)
+    for _ in range(5):
+        router.record("reasoning", 2.0, ok=True)
+    assert router.route(1.0, "Medium", deadline=5).model == "reasoning"
+
+
+def test_error_rate_degrades_until_the_errors_age_out():
+    router = ModelRouter(REASONING, FAST, min_samples=5, max_age=0.2)
+    for ok in (False, False, True, True, True):
+        router.record("reasoning", 1.0, ok=ok)
+    route = router.route(1.0, "Medium", deadline=30)
+    assert (route.model, route.reason) == ("fast", "degraded-errors")
+
+    time.sleep(0.3)
+    assert router.route(1.0, "Medium", deadline=30).model == "reasoning"
+    assert router.stats()["routes"] == {"fast:degraded-errors": 1, "reasoning:mid-band": 1}
+
+
+@pytest.fixture
+def routed(upstream, monkeypatch):
+    """The app's router and both clients pointed at the scripted upstream, with fresh stats and breakers."""
+    if app.FAST_LLM_CLIENT is None:
+        pytest.skip("needs FAST_MODEL_NAME")
+    policy = RetryPolicy(max_attempts=1, deadline=5.0)
+    monkeypatch.setattr(app, "LLM_CLIENT", LLMClient(upstream.url, app.HEADERS, retry_policy=policy))
+    monkeypatch.setattr(app, "FAST_LLM_CLIENT", LLMClient(upstream.url, app.HEADERS, retry_policy=policy))
+    monkeypatch.setattr(app, "MODEL_ROUTER", ModelRouter(app.MODEL_ROUTER.reasoning, app.MODEL_ROUTER.fast))
+    app.FEEDBACK_CACHE.memory.clear()
+    return upstream
+
+
+def with_score(monkeypatch, score):
+    monkeypatch.setattr(app, "calculate_question_score", lambda ideal_answer, student_answer: score)
+
+
+def requested_models(upstream):
+    return [payload["model"] for payload in upstream.requests]
+
+
+def test_fast_model_takes_over_when_the_reasoning_call_fails(routed, monkeypatch):
+    with_score(monkeypatch, 1.0)
+    routed.add(Reply(status=400), model=app.MODEL_NAME)
+    routed.add(Reply(body=completion("Think about where the energy comes from.")), model=app.FAST_MODEL_NAME)
+
+    feedback = app.generate_feedback("How do plants make food?", IDEAL, "they eat dirt", difficulty="Medium")
+    assert feedback == "Think about where the energy comes from."
+    assert requested_models(routed) == [app.MODEL_NAME, app.FAST_MODEL_NAME]
+    assert routed.requests[1]["max_tokens"] == app.MODEL_ROUTER.fast.budget("Medium")
+    assert app.MODEL_ROUTER.stats()["models"][app.MODEL_NAME]["errors"] == 1
+
+
+def test_fast_model_takes_over_after_a_think_only_completion(routed, monkeypatch):
+    # The reasoning trace used up max_tokens before any visible feedback
+    with_score(monkeypatch, 1.0)
+    routed.add(Reply(body=completion("<think>The student says dirt, so")), model=app.MODEL_NAME)
+    routed.add(Reply(body=completion("Where does a plant get its energy?")), model=app.FAST_MODEL_NAME)
+
+    feedback = app.generate_feedback("How do plants make food?", IDEAL, "they eat dirt", difficulty="Medium")
+    assert feedback == "Where does a plant get its energy?"
+    assert requested_models(routed) == [app.MODEL_NAME, app.FAST_MODEL_NAME]
+
+
+def test_rule_based_feedback_when_the_fallback_fails_too(routed, monkeypatch):
+    with_score(monkeypatch, 1.0)
+    routed.add(Reply(status=400), model=app.MODEL_NAME)
+    routed.add(Reply(body=completion("<think>")), model=app.FAST_MODEL_NAME)
+
+    feedback = app.generate_feedback("How do plants make food?", IDEAL, "they eat dirt", difficulty="Medium")
+    assert feedback == app.deterministic_feedback(IDEAL, "they eat dirt")
+    assert requested_models(routed) == [app.MODEL_NAME, app.FAST_MODEL_NAME]
+
+
+def test_request_deadline_downgrades_to_the_fast_model(routed, monkeypatch):
+    with_score(monkeypatch, 1.0)
+    client = app.app.test_client()
+    response = client.post("/generate-feedback", json={
+        "question": "How do plants make food?", "ideal_answer": IDEAL, "student_answer": "they eat dirt",
+        "difficulty": "Medium", "deadline_ms": 5000,
+    })
+    assert response.get_json() == {"feedback": "Looks good."}
+    assert requested_models(routed) == [app.FAST_MODEL_NAME]
+    assert app.MODEL_ROUTER.stats()["routes"] == {f"{app.FAST_MODEL_NAME}:degraded-latency": 1}
+
+
+def pack(*student_answers, difficulty="Medium"):
+    return [{"question": f"Question {number}?", "ideal_answer": IDEAL, "student_answer": answer,
+             "difficulty": difficulty} for number, answer in enumerate(student_answers, start=1)]
+
+
+def test_packed_batch_is_one_routed_call(routed, monkeypatch):
+    with_score(monkeypatch, 1.0)
+    routed.add(Reply(body=completion("<think>two answers</think>[[1]] Close, check the inputs.\n[[2]] Not quite.")),
+               model=app.MODEL_NAME)
+
+    results = app.generate_feedback_batch(pack("they eat dirt", "from the soil"), pack=True)
+    assert results == [{"feedback": "Close, check the inputs."}, {"feedback": "Not quite."}]
+    (payload,) = routed.requests
+    assert payload["model"] == app.MODEL_NAME
+    assert payload["max_tokens"] == app.MODEL_ROUTER.reasoning.budget("Medium") + app.FEEDBACK_PACK_ITEM_TOKENS
+
+
+def test_near_correct_pack_goes_to_the_fast_model(routed, monkeypatch):
+    with_score(monkeypatch, 1.8)
+    routed.add(Reply(body=completion("[[1]] Nearly there.\n[[2]] Check one word.")), model=app.FAST_MODEL_NAME)
+
+    results = app.generate_feedback_batch(pack("they eat dirt", "from the soil", difficulty="Hard"), pack=True)
+    assert results == [{"feedback": "Nearly there."}, {"feedback": "Check one word."}]
+    (payload,) = routed.requests
+    assert payload["model"] == app.FAST_MODEL_NAME
+    assert payload["max_tokens"] == app.MODEL_ROUTER.fast.budgets["short"] + app.FEEDBACK_PACK_ITEM_TOKENS
+
+
+def test_items_missing_from_a_packed_reply_are_generated_alone(routed, monkeypatch):
+    with_score(monkeypatch, 1.0)
+    routed.add(Reply(body=completion("[[1]] Close, check the inputs.")), Reply(body=completion("Not quite.")),
+               model=app.MODEL_NAME)
+
+    results = app.generate_feedback_batch(pack("they eat dirt", "from the soil"), pack=True)
+    assert results == [{"feedback": "Close, check the inputs."}, {"feedback": "Not quite."}]
+    assert requested_models(routed) == [app.MODEL_NAME, app.MODEL_NAME]
+    assert "from the soil" in routed.requests[1]["messages"][1]["content"]